@@ -0,0 +1,127 @@
+# app/config.py
+
+import os
+
+
+def _env_int(name: str, default: int) -> int:
+    value = os.environ.get(name)
+    return int(value) if value not in (None, "") else default
+
+
+def _env_str(name: str, default: str) -> str:
+    value = os.environ.get(name)
+    return value if value not in (None, "") else default
+
+
+class Settings:
+    """Backend settings, read once from environment variables at import time."""
+
+    def __init__(self):
+        # --- DATABASE ---
+        # SQLite file backing the app (defaults to app/db/app.sqlite)
+        self.database_path = _env_str(
+            "DATABASE_PATH", os.path.join(os.path.dirname(__file__), "db", "app.sqlite")
+        )
+        # WAL journal sync level: "normal" syncs at checkpoints, "full" on every commit
+        self.sqlite_synchronous = _env_str("SQLITE_SYNCHRONOUS", "normal").upper()
+        # How long a connection waits for SQLite's write lock, e.g. held by another worker's writer
+        self.sqlite_busy_timeout_seconds = _env_int("SQLITE_BUSY_TIMEOUT_SECONDS", 30)
+
+        # --- WORKERS ---
+        # uvicorn worker processes serving the app (the Docker image passes it to --workers)
+        self.workers = _env_int("WORKERS", 1)
+        # SQLite file the workers share: current session, replacement lock and generation, checkpoint index
+        self.shared_state_path = _env_str(
+            "SHARED_STATE_PATH", os.path.splitext(self.database_path)[0] + ".shared.sqlite"
+        )
+
+        # --- WRITER ---
+        # Write units committed together by the single writer thread (group commit)
+        self.writer_batch_size = _env_int("WRITER_BATCH_SIZE", 64)
+
+        # --- LOG RETENTION ---
+        # Log rows older than this many seconds are expired (0 keeps logs forever)
+        self.log_ttl_seconds = _env_int("LOG_TTL_SECONDS", 0)
+        # How often the retention task wakes up
+        self.log_retention_interval_seconds = _env_int("LOG_RETENTION_INTERVAL_SECONDS", 300)
+        # Rows deleted per statement while expiring, keeps the write lock short
+        self.log_retention_batch_size = _env_int("LOG_RETENTION_BATCH_SIZE", 5000)
+        # "incremental" (auto_vacuum=INCREMENTAL), "full" (periodic VACUUM) or "off"
+        self.log_vacuum_mode = _env_str("LOG_VACUUM_MODE", "incremental").lower()
+        # Free pages returned to the OS per incremental vacuum pass
+        self.log_vacuum_pages = _env_int("LOG_VACUUM_PAGES", 1000)
+
+        # --- REQUEST LOGGING ---
+        # Request bodies larger than this are logged as {"truncated": true, "size": n}
+        self.log_body_max_bytes = _env_int("LOG_BODY_MAX_BYTES", 64 * 1024)
+        # How long the log writer lets HTTP_REQUEST records gather before one insert
+        self.log_writer_interval_ms = _env_int("LOG_WRITER_INTERVAL_MS", 50)
+        # "json" (payload column only) or "msgpack-zstd" (payload in logs.payload_blob)
+        self.log_payload_encoding = _env_str("LOG_PAYLOAD_ENCODING", "json").lower()
+        self.log_zstd_level = _env_int("LOG_ZSTD_LEVEL", 3)
+        # Payloads per action type a zstd dictionary is trained on, and its size in bytes
+        self.log_dict_train_samples = _env_int("LOG_DICT_TRAIN_SAMPLES", 500)
+        self.log_dict_size = _env_int("LOG_DICT_SIZE", 16 * 1024)
+
+        # --- INSTRUMENTATION ---
+        # Number of recent requests per route kept for p50/p95/p99
+        self.metrics_window = _env_int("METRICS_WINDOW", 1024)
+        # Attach a Server-Timing header (handler/serialize/db/log phases) to every response
+        self.metrics_server_timing = _env_int("METRICS_SERVER_TIMING", 0) == 1
+
+        # --- SAMPLING PROFILER ---
+        # /debug/profile answers 404 unless PROFILER_ENABLED=1
+        self.profiler_enabled = _env_int("PROFILER_ENABLED", 0) == 1
+        # When set, callers must send it in the x-profiler-token header
+        self.profiler_token = _env_str("PROFILER_TOKEN", "")
+        self.profiler_interval_ms = _env_int("PROFILER_INTERVAL_MS", 5)
+        self.profiler_max_seconds = _env_int("PROFILER_MAX_SECONDS", 60)
+
+        # --- VOTE BUFFER ---
+        # Buffer votes in memory and write them behind in batches (VOTE_BUFFER_ENABLED=1)
+        self.vote_buffer_enabled = _env_int("VOTE_BUFFER_ENABLED", 0) == 1
+        # Time between two flushes of the buffered votes
+        self.vote_buffer_interval_ms = _env_int("VOTE_BUFFER_INTERVAL_MS", 250)
+        # Clean posts/comments are forgotten after this many flushes without a vote
+        self.vote_buffer_idle_flushes = _env_int("VOTE_BUFFER_IDLE_FLUSHES", 40)
+
+        # --- TRENDING COMMUNITIES ---
+        # How often the trending job recomputes, and how many communities it keeps
+        self.trending_interval_seconds = _env_int("TRENDING_INTERVAL_SECONDS", 60)
+        self.trending_size = _env_int("TRENDING_SIZE", 10)
+        # Recent activity (short window) is compared with the community's usual pace (long window)
+        self.trending_short_window_seconds = _env_int("TRENDING_SHORT_WINDOW_SECONDS", 3600)
+        self.trending_long_window_seconds = _env_int("TRENDING_LONG_WINDOW_SECONDS", 7 * 86400)
+
+        # --- HOME FEED ---
+        # Post ids kept per user in feed_entries; older ones fall off
+        self.feed_max_entries = _env_int("FEED_MAX_ENTRIES", 500)
+        # Communities with more subscribers are not fanned out on write but merged in on read
+        self.feed_fanout_max_subscribers = _env_int("FEED_FANOUT_MAX_SUBSCRIBERS", 1000)
+
+        # --- NOTIFICATIONS ---
+        # Events coalesced into one insert transaction by the notification worker
+        self.notifications_batch_size = _env_int("NOTIFICATIONS_BATCH_SIZE", 500)
+        # How long the worker waits after the first event for more to join the batch
+        self.notifications_batch_window_ms = _env_int("NOTIFICATIONS_BATCH_WINDOW_MS", 20)
+
+        # --- CHECKPOINTS ---
+        # Environment checkpoints kept; the least recently used is dropped beyond this
+        self.checkpoint_limit = _env_int("CHECKPOINT_LIMIT", 32)
+        # Directory of the checkpoint files, readable by every worker
+        self.checkpoint_dir = _env_str(
+            "CHECKPOINT_DIR", os.path.splitext(self.database_path)[0] + ".checkpoints"
+        )
+
+        # --- SESSION POOL ---
+        # Pre-seeded environments kept ready per seed for new_session and reset (0 disables the pool)
+        self.session_pool_size = _env_int("SESSION_POOL_SIZE", 2)
+        # Seeds kept warm from startup; other seeds join the pool when first requested
+        self.session_pool_seeds = [seed.strip() for seed in _env_str("SESSION_POOL_SEEDS", "123").split(",") if seed.strip()]
+        # Seeds kept warm at once; the least recently claimed one is dropped beyond this
+        self.session_pool_max_seeds = _env_int("SESSION_POOL_MAX_SEEDS", 4)
+        # Older environments are thrown away: seeded timestamps are relative to the seeding time
+        self.session_pool_max_age_seconds = _env_int("SESSION_POOL_MAX_AGE_SECONDS", 900)
+
+
+settings = Settings()
@@ -0,0 +1,101 @@
+# app/db/audit.py
+
+from contextvars import ContextVar
+from datetime import date, datetime
+from enum import Enum
+from typing import Any, Dict
+
+from sqlalchemy import inspect, insert  # type: ignore
+
+from .log_codec import log_codec
+from .synthetic_models import ActionType, Log
+
+# Session id the current request's DB_UPDATE entries are filed under (set by LogMiddleware)
+audit_session_id: ContextVar[str] = ContextVar("audit_session_id", default="no_session")
+
+
+def _jsonable(value: Any) -> Any:
+    if isinstance(value, (datetime, date)):
+        return value.isoformat()
+    if isinstance(value, Enum):
+        return value.value
+    return value
+
+
+def _primary_key(state) -> Dict[str, Any]:
+    return {column.key: _jsonable(state.dict.get(column.key)) for column in state.mapper.primary_key}
+
+
+def _entry(state, update_type: str):
+    """(table name, update type, values) for one flushed object, or None when nothing changed.
+
+    No text is stored: app/db/log_text.py renders it from these fields when logs are read.
+    """
+    table_name = state.mapper.persist_selectable.name
+    key = _primary_key(state)
+    columns = [attr.key for attr in state.mapper.column_attrs]
+
+    if update_type != "update":
+        # Only loaded attributes: expired ones (server defaults) cannot be read back mid-flush
+        values = {column: _jsonable(state.dict[column]) for column in columns if column in state.dict}
+        return table_name, update_type, values
+
+    old, new = {}, {}
+    for column in columns:
+        history = state.attrs[column].history
+        if not history.added:
+            continue
+        previous = history.deleted[0] if history.deleted else None
+        if previous == history.added[0]:
+            continue
+        old[column] = _jsonable(previous)
+        new[column] = _jsonable(history.added[0])
+    if not new:
+        return None
+    return table_name, "update", {**key, "old": old, "new": new}
+
+
+def capture_flush(session, flush_context):
+    """after_flush hook: turn the flushed ORM changes into DB_UPDATE logs in the same transaction"""
+    if not session.info.get("audit", True):
+        return
+
+    changes = []
+    for update_type, objects in (("insert", session.new), ("update", session.dirty), ("delete", session.deleted)):
+        for obj in objects:
+            if isinstance(obj, Log):
+                continue
+            entry = _entry(inspect(obj), update_type)
+            if entry is not None:
+                changes.append(entry)
+    if not changes:
+        return
+
+    session_id, now = audit_session_id.get(), datetime.utcnow()
+    session.connection().execute(insert(Log.__table__), [
+        {
+            "timestamp": now,
+            "session_id": session_id,
+            "action_type": ActionType.DB_UPDATE,
+            **log_codec.storage_columns(
+                ActionType.DB_UPDATE, {"table_name": table_name, "update_type": update_type, "values": values}
+            ),
+        }
+        for table_name, update_type, values in changes
+    ])
+
+
+def record_change(session, table_name: str, update_type: str, text: str, values: Dict[str, Any]):
+    """DB_UPDATE log for a Core INSERT/UPDATE/DELETE the flush hook cannot see.
+
+    Added to the caller's session, so it commits (or rolls back) with the change itself.
+    """
+    if not session.info.get("audit", True):
+        return
+    entry = Log(
+        audit_session_id.get(),
+        ActionType.DB_UPDATE,
+        {"table_name": table_name, "update_type": update_type, "text": text, "values": values},
+    )
+    entry.timestamp = datetime.utcnow()
+    session.add(entry)
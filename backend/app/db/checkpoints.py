@@ -0,0 +1,180 @@
+# app/db/checkpoints.py
+
+import os
+import sqlite3
+import time
+import uuid
+from datetime import datetime
+from typing import Any, Dict, List, Optional
+
+from sqlalchemy import delete, insert, select, update  # type: ignore
+
+from ..config import settings
+from .db import db, Database
+from .shared_state import checkpoint_files, shared_state, SharedState
+from .synthetic_models import Log, LogDictionary
+from .writer import writer, Writer
+
+# Carried across a restore instead of rolled back: every branch's trajectory stays for grading.
+# Dictionaries go with the logs, so every kept payload blob can still be decoded.
+KEPT_TABLES = (LogDictionary.__table__, Log.__table__)
+
+
+def snapshot(engine, path: str = ":memory:") -> sqlite3.Connection:
+    """Copy of the database behind `engine`, in memory or in the file at `path`"""
+    image = sqlite3.connect(path, check_same_thread=False)
+    # A checkpoint file is written once: no journal, no fsync
+    image.execute("PRAGMA journal_mode = OFF")
+    image.execute("PRAGMA synchronous = OFF")
+    source = engine.raw_connection()
+    try:
+        # One step: the whole copy reads a single consistent WAL snapshot
+        source.driver_connection.backup(image)
+    finally:
+        source.close()
+    return image
+
+
+class Checkpoints:
+    """Environment checkpoints taken with SQLite's online backup API.
+
+    A checkpoint is a page copy of the whole database in a file under CHECKPOINT_DIR,
+    indexed in the shared state so that any worker can restore a checkpoint another one
+    took. Restoring copies the pages back onto the writer's connection while the writer is
+    paused and the other workers' replacements wait. The logs written since are kept
+    unless the caller asks to erase them. In-memory state derived from the database is
+    dropped first through the reset listeners, in the other workers on their next
+    request. Only the CHECKPOINT_LIMIT most recently used checkpoints are kept.
+    """
+
+    def __init__(self, db: Database, writer: Writer, shared: SharedState):
+        self.db = db
+        self.writer = writer
+        self.shared = shared
+
+    @staticmethod
+    def _path(checkpoint_id: str) -> str:
+        return os.path.join(settings.checkpoint_dir, f"{checkpoint_id}.sqlite")
+
+    def create(self, session_id: Optional[str] = None) -> Dict[str, Any]:
+        """Copy the committed state of the database; returns the checkpoint's info"""
+        start = time.perf_counter()
+        checkpoint_id = str(uuid.uuid4())
+        os.makedirs(settings.checkpoint_dir, exist_ok=True)
+        image = snapshot(self.db.engine, self._path(checkpoint_id))
+        try:
+            page_count = image.execute("PRAGMA page_count").fetchone()[0]
+            page_size = image.execute("PRAGMA page_size").fetchone()[0]
+        finally:
+            image.close()
+
+        info = {
+            "checkpoint_id": checkpoint_id,
+            "session_id": session_id,
+            "created_at": datetime.utcnow().isoformat(),
+            "size_bytes": page_count * page_size,
+        }
+        with self.shared.transaction() as conn:
+            conn.execute(insert(checkpoint_files).values(**info, used_at=time.time()))
+            evicted = conn.execute(
+                select(checkpoint_files.c.checkpoint_id)
+                .order_by(checkpoint_files.c.used_at.desc())
+                .offset(settings.checkpoint_limit)
+            ).scalars().all()
+            if evicted:
+                conn.execute(delete(checkpoint_files).where(checkpoint_files.c.checkpoint_id.in_(evicted)))
+        for evicted_id in evicted:
+            self._remove(evicted_id)
+        return {**info, "duration_ms": (time.perf_counter() - start) * 1000}
+
+    def restore(self, checkpoint_id: str, keep_logs: bool = True) -> Dict[str, Any]:
+        """Put the database back in the state of a checkpoint; KeyError when it is unknown.
+
+        The current logs are kept unless `keep_logs` is False, which rolls them back too.
+        """
+        start = time.perf_counter()
+        with self.shared.transaction() as conn:
+            row = conn.execute(
+                update(checkpoint_files)
+                .where(checkpoint_files.c.checkpoint_id == checkpoint_id)
+                .values(used_at=time.time())
+                .returning(*(column for column in checkpoint_files.c if column.name != "used_at"))
+            ).first()
+        if row is None:
+            raise KeyError(checkpoint_id)
+        try:
+            # Read-only: a file deleted meanwhile is an error rather than a new empty database
+            image = sqlite3.connect(f"file:{self._path(checkpoint_id)}?mode=ro", uri=True, check_same_thread=False)
+        except sqlite3.OperationalError:
+            raise KeyError(checkpoint_id)
+        try:
+            self.load(image, keep_logs)
+        finally:
+            image.close()
+        return {**row._asdict(), "duration_ms": (time.perf_counter() - start) * 1000}
+
+    def load(self, image: sqlite3.Connection, keep_logs: bool = False):
+        """Replace the database with the pages of `image` (a checkpoint or a pre-seeded copy).
+
+        With `keep_logs`, the KEPT_TABLES are set aside in an attached in-memory database
+        and put back over the image's rows once the pages are copied.
+        """
+        with self.shared.replacing():
+            for listener in self.db.reset_listeners:
+                listener()
+            with self.writer.paused():
+                target = self.db.write_engine.raw_connection()
+                connection = target.driver_connection
+                try:
+                    if keep_logs:
+                        connection.execute("ATTACH DATABASE ':memory:' AS kept")
+                        for table in KEPT_TABLES:
+                            connection.execute(f"CREATE TABLE kept.{table.name} AS SELECT {_columns(table)} FROM main.{table.name}")
+                    image.backup(connection)
+                    if keep_logs:
+                        connection.execute("BEGIN IMMEDIATE")
+                        try:
+                            for table in reversed(KEPT_TABLES):
+                                connection.execute(f"DELETE FROM main.{table.name}")
+                            for table in KEPT_TABLES:
+                                connection.execute(
+                                    f"INSERT INTO main.{table.name} ({_columns(table)}) SELECT {_columns(table)} FROM kept.{table.name}"
+                                )
+                            connection.execute("COMMIT")
+                        except BaseException:
+                            connection.execute("ROLLBACK")
+                            raise
+                finally:
+                    if keep_logs:
+                        connection.execute("DETACH DATABASE kept")
+                    target.close()
+
+    def list(self) -> List[Dict[str, Any]]:
+        columns = [column for column in checkpoint_files.c if column.name != "used_at"]
+        with self.shared.transaction() as conn:
+            rows = conn.execute(select(*columns).order_by(checkpoint_files.c.created_at))
+            return [row._asdict() for row in rows]
+
+    def delete(self, checkpoint_id: str) -> bool:
+        with self.shared.transaction() as conn:
+            deleted = conn.execute(
+                delete(checkpoint_files).where(checkpoint_files.c.checkpoint_id == checkpoint_id)
+            ).rowcount
+        if not deleted:
+            return False
+        self._remove(checkpoint_id)
+        return True
+
+    def _remove(self, checkpoint_id: str):
+        try:
+            os.remove(self._path(checkpoint_id))
+        except FileNotFoundError:
+            pass
+
+
+def _columns(table) -> str:
+    # Generated columns (the logs' filter columns) are computed, never inserted
+    return ", ".join(column.name for column in table.columns if column.computed is None)
+
+
+checkpoints = Checkpoints(db, writer, shared_state)
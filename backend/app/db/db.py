@@ -1,39 +1,113 @@
 # app/db/db.py
 
-from sqlalchemy import create_engine  # type: ignore
+from sqlalchemy import create_engine, event, text  # type: ignore
 from sqlalchemy.orm import sessionmaker  # type: ignore
 from faker import Faker  # type: ignore
-import os
 from contextlib import contextmanager
 
+from ..config import settings
+from .audit import capture_flush
 from .base import Base
-from .models import User, Note, Post, Comment
+from .models import User, Note, Post, Comment, Subreddit, comment_path
+from .ranking import register_sql_functions
+
+# Communities created by populate_database
+SEED_SUBREDDITS = ("general", "memes", "news", "tech")
 
 
 class Database: 
-    def __init__(self):
-        self.db_path = os.path.join(os.path.dirname(__file__), "app.sqlite")
+    def __init__(self, db_path: str = None):
+        self.db_path = db_path or settings.database_path
         self.db_url = f"sqlite:///{self.db_path}"
         self.engine = None
+        self.read_engine = None
+        self.write_engine = None
         self.SessionLocal = None
+        self.ReadSession = None
+        self.WriteSession = None
+        # Called before every reset, for in-memory state derived from the database
+        self.reset_listeners = []
+        # Called after every seeding, for snapshots of the seeded state
+        self.seed_listeners = []
 
     def create_database(self):
-        self.engine = create_engine(
+        # Schema, seeding and maintenance (retention, background reads)
+        self.engine = self._create_engine(pool_size=20, max_overflow=40)
+        # Request handlers read through their own pool; query_only makes a stray write fail loudly
+        self.read_engine = self._create_engine(pool_size=20, max_overflow=40, query_only=True)
+        # The single connection every write unit goes through, see app/db/writer.py
+        self.write_engine = self._create_engine(pool_size=1, max_overflow=0)
+        event.listen(self.write_engine, "connect", self._manual_transactions)
+        event.listen(self.write_engine, "begin", self._begin_immediate)
+
+        self.SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=self.engine)
+        self.ReadSession = sessionmaker(autocommit=False, autoflush=False, bind=self.read_engine)
+        # Units hand ORM objects back to their callers after the group commit and the session close
+        self.WriteSession = sessionmaker(autocommit=False, autoflush=False, expire_on_commit=False, bind=self.write_engine)
+        # DB_UPDATE logs for every ORM change, written in the transaction that makes it
+        event.listen(self.SessionLocal, "after_flush", capture_flush)
+        event.listen(self.WriteSession, "after_flush", capture_flush)
+        Base.metadata.create_all(bind=self.engine)
+
+    @property
+    def engines(self):
+        return self.engine, self.read_engine, self.write_engine
+
+    def dispose(self):
+        """Close every pooled connection (scratch databases, before their file is removed)"""
+        for engine in self.engines:
+            if engine is not None:
+                engine.dispose()
+
+    def _create_engine(self, pool_size: int, max_overflow: int, query_only: bool = False):
+        engine = create_engine(
             self.db_url, 
-            connect_args={"check_same_thread": False}, 
-            pool_size=20,
-            max_overflow=40,
+            connect_args={"check_same_thread": False, "timeout": settings.sqlite_busy_timeout_seconds}, 
+            pool_size=pool_size,
+            max_overflow=max_overflow,
             pool_timeout=60,
             pool_recycle=3600,
             pool_pre_ping=True 
         )
-        self.SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=self.engine)
-        Base.metadata.create_all(bind=self.engine)
+        event.listen(engine, "connect", self._set_sqlite_pragmas)
+        event.listen(engine, "connect", register_sql_functions)
+        if query_only:
+            event.listen(engine, "connect", self._query_only)
+        return engine
+
+    @staticmethod
+    def _set_sqlite_pragmas(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        # auto_vacuum only takes effect before the first table is created (or after a VACUUM),
+        # so it has to be set on every connection that might create the schema
+        if settings.log_vacuum_mode == "incremental":
+            cursor.execute("PRAGMA auto_vacuum = INCREMENTAL")
+        # Readers never block the writer (nor the writer readers)
+        cursor.execute("PRAGMA journal_mode = WAL")
+        cursor.execute(f"PRAGMA synchronous = {settings.sqlite_synchronous}")
+        cursor.close()
+
+    @staticmethod
+    def _query_only(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        cursor.execute("PRAGMA query_only = ON")
+        cursor.close()
+
+    @staticmethod
+    def _manual_transactions(dbapi_connection, connection_record):
+        # pysqlite's own transaction handling breaks SAVEPOINT; SQLAlchemy emits BEGIN instead
+        dbapi_connection.isolation_level = None
+
+    @staticmethod
+    def _begin_immediate(conn):
+        # Take the write lock when a group starts rather than upgrading on its first write
+        conn.exec_driver_sql("BEGIN IMMEDIATE")
 
     def get_db(self):
+        """Read-only session for request handlers; writes go through app.db.writer"""
         if not self.SessionLocal:
             self.create_database()
-        db = self.SessionLocal()
+        db = self.ReadSession()
         try:
             yield db
         finally:
@@ -49,18 +123,21 @@ class Database:
         finally:
             db.close()
 
-    def populate_database(self, seed: str = None):
+    def populate_database(self, seed: str = None, num_users: int = 5, notes_per_user: int = 3, posts_per_user: int = 5):
         fake = Faker()
         if seed:
             fake.seed_instance(seed)
 
         with self.get_db_context() as db:
+            # Seed rows are not user actions
+            db.info["audit"] = False
+
             # --- USERS ---
             users = []
-            for _ in range(5):
+            for _ in range(num_users):
                 user = User(
                     id=str(fake.uuid4()),
-                    username=fake.user_name(),
+                    username=fake.unique.user_name(),
                     password=fake.password()
                 )
                 db.add(user)
@@ -69,7 +146,7 @@ class Database:
 
             # --- NOTES ---
             for user in users:
-                for _ in range(3):
+                for _ in range(notes_per_user):
                     note = Note(
                         title=fake.catch_phrase(),
                         content=fake.text(max_nb_chars=200),
@@ -77,15 +154,22 @@ class Database:
                     )
                     db.add(note)
 
+            # --- SUBREDDITS ---
+            subreddits = {name: Subreddit(name=name) for name in SEED_SUBREDDITS}
+            db.add_all(subreddits.values())
+            db.flush()
+
             # --- POSTS ---
             posts = []
             for user in users:
-                for _ in range(5):
+                for _ in range(posts_per_user):
+                    subreddit = fake.random_element(elements=SEED_SUBREDDITS)
                     post = Post(
                         title=fake.sentence(nb_words=6),
                         content=fake.paragraph(nb_sentences=3),
                         votes=fake.random_int(min=-5, max=100),
-                        subreddit=fake.random_element(elements=("general", "memes", "news", "tech")),
+                        subreddit=subreddit,
+                        subreddit_id=subreddits[subreddit].id,
                         author_id=user.id
                     )
                     db.add(post)
@@ -110,6 +194,8 @@ class Database:
                     reply = create_comment(parent_comment.post_id, fake.random_element(users).id, parent_comment.id)
                     db.add(reply)
                     db.flush()
+                    reply.path = comment_path(parent_comment.path, reply.id)
+                    reply.depth = parent_comment.depth + 1
                     replies.append(reply)
                     replies += seed_replies(reply, depth + 1, max_depth)
                 return replies
@@ -119,15 +205,28 @@ class Database:
                     top_comment = create_comment(post.id, fake.random_element(users).id)
                     db.add(top_comment)
                     db.flush()
+                    top_comment.path = comment_path(None, top_comment.id)
                     replies = seed_replies(top_comment)
                     db.add_all(replies)
 
+            # --- POST ACTIVITY ---
+            db.flush()
+            db.execute(text(
+                "UPDATE posts SET "
+                "comment_count = (SELECT COUNT(*) FROM comments WHERE comments.post_id = posts.id), "
+                "last_activity_at = COALESCE("
+                "(SELECT MAX(created_at) FROM comments WHERE comments.post_id = posts.id), posts.created_at)"
+            ))
+            db.execute(text(
+                "UPDATE subreddits SET "
+                "post_count = (SELECT COUNT(*) FROM posts WHERE posts.subreddit_id = subreddits.id), "
+                "last_activity_at = COALESCE("
+                "(SELECT MAX(last_activity_at) FROM posts WHERE posts.subreddit_id = subreddits.id), subreddits.created_at)"
+            ))
             db.commit()
 
-    def reset_database(self, seed: str = None):
-        Base.metadata.drop_all(bind=self.engine)
-        Base.metadata.create_all(bind=self.engine)
-        self.populate_database(seed)
+        for listener in self.seed_listeners:
+            listener()
 
 
 # Create a singleton instance
@@ -0,0 +1,161 @@
+# app/db/log_codec.py
+
+import struct
+import threading
+from typing import Any, Dict, List, Tuple
+
+from sqlalchemy import event, insert, select  # type: ignore
+
+try:
+    import msgpack  # type: ignore
+    import zstandard  # type: ignore
+except ImportError:  # Only needed with LOG_PAYLOAD_ENCODING=msgpack-zstd
+    msgpack = zstandard = None
+
+from ..config import settings
+from .synthetic_models import ActionType, Log, LogDictionary
+
+# Payload fields the generated columns of Log extract; kept as JSON next to the blob
+INDEXED_FIELDS = ("method", "path", "status_code", "table_name", "update_type")
+
+# Blob header: format version, then the id of the zstd dictionary it was compressed with (0 = none)
+_HEADER = struct.Struct(">BI")
+_FORMAT = 1
+
+
+class LogCodec:
+    """msgpack + zstd storage encoding for Log payloads (LOG_PAYLOAD_ENCODING=msgpack-zstd).
+
+    Until an action type has LOG_DICT_TRAIN_SAMPLES payloads they are compressed without a
+    dictionary. The log writer then trains a zstd dictionary on those samples, stores it in
+    log_dictionaries in its own transaction, and only afterwards starts using it, so a blob
+    never references a dictionary that was not committed. Decoding loads dictionaries by id.
+    """
+
+    def __init__(self):
+        # zstd (de)compressors must not be used concurrently; payloads are small, one lock will do
+        self._lock = threading.Lock()
+        self._samples: Dict[ActionType, List[bytes]] = {}
+        self._compressors: Dict[ActionType, Tuple[int, Any]] = {}
+        self._decompressors: Dict[int, Any] = {}
+        self._plain = None
+
+    @property
+    def enabled(self) -> bool:
+        return settings.log_payload_encoding == "msgpack-zstd"
+
+    def check(self):
+        if self.enabled and (msgpack is None or zstandard is None):
+            raise RuntimeError("LOG_PAYLOAD_ENCODING=msgpack-zstd needs the msgpack and zstandard packages")
+
+    # --- ENCODING ---
+
+    def storage_columns(self, action_type: ActionType, payload: Dict[str, Any]) -> Dict[str, Any]:
+        """`payload` / `payload_blob` values of a logs row for the configured encoding"""
+        if not self.enabled or not isinstance(payload, dict):
+            return {"payload": payload, "payload_blob": None}
+        return {
+            "payload": {field: payload[field] for field in INDEXED_FIELDS if field in payload},
+            "payload_blob": self.encode(action_type, payload),
+        }
+
+    def encode(self, action_type: ActionType, payload: Dict[str, Any]) -> bytes:
+        raw = msgpack.packb(payload, default=str)
+        with self._lock:
+            dict_id, compressor = self._compressors.get(action_type, (0, None))
+            if compressor is None:
+                compressor = self._plain_compressor()
+                samples = self._samples.setdefault(action_type, [])
+                if len(samples) < settings.log_dict_train_samples:
+                    samples.append(raw)
+            blob = compressor.compress(raw)
+        return _HEADER.pack(_FORMAT, dict_id) + blob
+
+    def _plain_compressor(self):
+        if self._plain is None:
+            self._plain = zstandard.ZstdCompressor(level=settings.log_zstd_level)
+        return self._plain
+
+    def train_pending(self, writer) -> int:
+        """Train and store a dictionary for every action type with enough samples.
+
+        Called by the log writer outside of any write unit: each dictionary is its own unit
+        and is only used once committed. Returns the number trained.
+        """
+        if not self.enabled:
+            return 0
+        with self._lock:
+            ready = {
+                action_type: samples
+                for action_type, samples in self._samples.items()
+                if len(samples) >= settings.log_dict_train_samples and action_type not in self._compressors
+            }
+            for action_type in ready:
+                self._samples[action_type] = []
+
+        trained = 0
+        for action_type, samples in ready.items():
+            try:
+                dictionary = zstandard.train_dictionary(settings.log_dict_size, samples)
+                statement = (
+                    insert(LogDictionary)
+                    .values(action_type=action_type, data=dictionary.as_bytes())
+                    .returning(LogDictionary.id)
+                )
+                dict_id = writer.run(lambda session: session.execute(statement).scalar())
+            except Exception as e:
+                # Too few distinct samples, or a reset dropped the table: collect a new set
+                print(f"Log dictionary training failed for {action_type.value}: {e}")
+                continue
+            with self._lock:
+                self._compressors[action_type] = (
+                    dict_id, zstandard.ZstdCompressor(level=settings.log_zstd_level, dict_data=dictionary)
+                )
+                self._decompressors[dict_id] = zstandard.ZstdDecompressor(dict_data=dictionary)
+            trained += 1
+        return trained
+
+    # --- DECODING ---
+
+    def decode(self, blob: bytes, connection) -> Dict[str, Any]:
+        """Full payload from payload_blob; `connection` (or session) loads dictionaries not seen yet"""
+        if msgpack is None or zstandard is None:
+            raise RuntimeError("Decoding msgpack-zstd log payloads needs the msgpack and zstandard packages")
+        _, dict_id = _HEADER.unpack_from(blob)
+        with self._lock:
+            decompressor = self._decompressors.get(dict_id)
+        if decompressor is None:
+            decompressor = self._load_decompressor(dict_id, connection)
+        with self._lock:
+            raw = decompressor.decompress(blob[_HEADER.size:])
+        return msgpack.unpackb(raw)
+
+    def _load_decompressor(self, dict_id: int, connection):
+        if dict_id == 0:
+            decompressor = zstandard.ZstdDecompressor()
+        else:
+            data = connection.execute(select(LogDictionary.data).where(LogDictionary.id == dict_id)).scalar()
+            if data is None:
+                raise LookupError(f"Log dictionary {dict_id} not found")
+            decompressor = zstandard.ZstdDecompressor(dict_data=zstandard.ZstdCompressionDict(data))
+        with self._lock:
+            self._decompressors[dict_id] = decompressor
+        return decompressor
+
+    def discard(self):
+        """Forget dictionaries and samples (the database is being reset underneath us)"""
+        with self._lock:
+            self._samples.clear()
+            self._compressors.clear()
+            self._decompressors.clear()
+
+
+log_codec = LogCodec()
+
+
+@event.listens_for(Log, "before_insert")
+def _encode_log(mapper, connection, target: Log):
+    """Log objects added through the ORM (log_action, record_change, ...) are encoded here"""
+    if log_codec.enabled and target.payload_blob is None:
+        columns = log_codec.storage_columns(target.action_type, target.payload)
+        target.payload, target.payload_blob = columns["payload"], columns["payload_blob"]
@@ -0,0 +1,66 @@
+# app/db/log_text.py
+
+from typing import Any, Callable, Dict
+
+from .base import Base
+from .synthetic_models import ActionType
+
+# A renderer turns a stored payload into its natural-language `text`
+Renderer = Callable[[Dict[str, Any]], str]
+
+_renderers: Dict[ActionType, Renderer] = {}
+
+
+def renders(action_type: ActionType):
+    """Register the text renderer of one action type"""
+    def register(render: Renderer) -> Renderer:
+        _renderers[action_type] = render
+        return render
+    return register
+
+
+def with_text(action_type: ActionType, payload: Dict[str, Any]) -> Dict[str, Any]:
+    """`payload` with its `text`; rendered on read when the row was stored without one.
+
+    Rows written before texts were deferred, and entries whose text says more than the
+    structured fields (record_change, vote and notification logs), keep their stored text.
+    """
+    if not isinstance(payload, dict) or payload.get("text") is not None:
+        return payload
+    render = _renderers.get(action_type)
+    if render is None:
+        return payload
+    return {**payload, "text": render(payload)}
+
+
+# --- RENDERERS ---
+
+@renders(ActionType.HTTP_REQUEST)
+def http_request_text(payload: Dict[str, Any]) -> str:
+    text = f"{payload['method']} request sent to {payload['url']}"
+    if payload.get("query_params"):
+        text += f" with query params {payload['query_params']}"
+    else:
+        text += " with no query params"
+    if payload.get("request_body"):
+        text += f" with body {payload['request_body']}"
+    else:
+        text += " with no body"
+    return text + f" with status code {payload['status_code']}"
+
+
+def _row_key(table_name: str, values: Dict[str, Any]) -> Dict[str, Any]:
+    table = Base.metadata.tables.get(table_name)
+    names = [column.name for column in table.primary_key.columns] if table is not None else ["id"]
+    return {name: values.get(name) for name in names}
+
+
+@renders(ActionType.DB_UPDATE)
+def db_update_text(payload: Dict[str, Any]) -> str:
+    table_name, update_type, values = payload["table_name"], payload["update_type"], payload["values"]
+    row = ", ".join(f"{name} {value}" for name, value in _row_key(table_name, values).items())
+    if update_type == "insert":
+        return f"Inserted into {table_name} the row with {row}"
+    if update_type == "delete":
+        return f"Deleted from {table_name} the row with {row}"
+    return f"Updated {', '.join(values.get('new', {}))} of the {table_name} row with {row}"
@@ -1,6 +1,6 @@
 from datetime import datetime
 import uuid
-from sqlalchemy import Column, Integer, String, DateTime, ForeignKey, Text, UniqueConstraint # type: ignore
+from sqlalchemy import Column, Integer, String, DateTime, ForeignKey, Index, Text, UniqueConstraint # type: ignore
 from sqlalchemy.sql import func # type: ignore
 from sqlalchemy.orm import relationship # type: ignore
 from .base import Base
@@ -42,6 +42,24 @@ class User(Base):
     saved_comments = relationship("SavedComment", back_populates="user", cascade="all, delete-orphan")
 
     
+# ----------------
+# Subreddits Table
+# ----------------
+class Subreddit(Base):
+    __tablename__ = "subreddits"
+
+    id = Column(Integer, primary_key=True, index=True, autoincrement=True)
+    name = Column(String, unique=True, index=True, nullable=False)
+    created_at = Column(DateTime, default=datetime.utcnow)
+    # Maintained by create_post/delete_post/create_comment, so listings never GROUP BY posts
+    post_count = Column(Integer, nullable=False, default=0, server_default="0")
+    last_activity_at = Column(DateTime, default=datetime.utcnow)
+    # Maintained by subscribe/unsubscribe; decides between fan-out on write and on read
+    subscriber_count = Column(Integer, nullable=False, default=0, server_default="0")
+
+    posts = relationship("Post", back_populates="community")
+
+
 # ----------------
 # Posts Table
 # ----------------
@@ -53,9 +71,24 @@ class Post(Base):
     content = Column(String, nullable=False)
     votes = Column(Integer, default=0)
     subreddit = Column(String, default="general")
+    subreddit_id = Column(Integer, ForeignKey("subreddits.id"))
     author_id = Column(String, ForeignKey("users.id"))
+    created_at = Column(DateTime, default=datetime.utcnow, index=True)
+    # Maintained by create_comment/delete_comment so listings never count comments per post
+    comment_count = Column(Integer, nullable=False, default=0, server_default="0")
+    last_activity_at = Column(DateTime, default=datetime.utcnow)
+
+    __table_args__ = (
+        Index("ix_posts_last_activity", "last_activity_at", "id"),
+        Index("ix_posts_comment_count", "comment_count", "id"),
+        # Per-community feeds: filter on subreddit_id, then walk the sort key in index order
+        Index("ix_posts_subreddit_id", "subreddit_id", "id"),
+        Index("ix_posts_subreddit_activity", "subreddit_id", "last_activity_at", "id"),
+        Index("ix_posts_subreddit_comment_count", "subreddit_id", "comment_count", "id"),
+    )
 
     author = relationship("User", back_populates="posts")
+    community = relationship("Subreddit", back_populates="posts")
     votes_relation = relationship("Vote", back_populates="post", cascade="all, delete-orphan")
 
     comments = relationship("Comment", back_populates="post", cascade="all, delete-orphan")
@@ -80,16 +113,36 @@ class Vote(Base):
     post = relationship("Post", back_populates="votes_relation")
 
 
+# Width of one zero-padded id in Comment.path, so paths sort like the tree
+COMMENT_PATH_WIDTH = 10
+
+def comment_path(parent_path, comment_id: int) -> str:
+    """Materialized path of a comment: its ancestors' ids and its own, zero-padded and joined by '/'"""
+    segment = str(comment_id).zfill(COMMENT_PATH_WIDTH)
+    return f"{parent_path}/{segment}" if parent_path else segment
+
+def subtree_bounds(path: str):
+    """(low, high) such that low < p < high for exactly the descendants' paths; '0' follows '/'"""
+    return f"{path}/", f"{path}0"
+
+
 class Comment(Base):
     __tablename__ = "comments"
 
     id = Column(Integer, primary_key=True, index=True)
     content = Column(Text, nullable=False)
-    created_at = Column(DateTime, default=datetime.utcnow)
+    created_at = Column(DateTime, default=datetime.utcnow, index=True)
 
-    post_id = Column(Integer, ForeignKey("posts.id"), nullable=False)
+    post_id = Column(Integer, ForeignKey("posts.id"), nullable=False, index=True)
     author_id = Column(String, ForeignKey("users.id"), nullable=False)
-    parent_id = Column(Integer, ForeignKey("comments.id"), nullable=True)
+    parent_id = Column(Integer, ForeignKey("comments.id"), nullable=True, index=True)
+    # Hierarchy kept on write (see comment_path): subtrees are one range scan on this index
+    path = Column(String, index=True)
+    depth = Column(Integer, nullable=False, default=0, server_default="0")
+
+    # Kept in step with comment_votes on every vote, so ranking never aggregates
+    upvotes = Column(Integer, nullable=False, default=0, server_default="0")
+    downvotes = Column(Integer, nullable=False, default=0, server_default="0")
 
     author = relationship("User", back_populates="comments")
     post = relationship("Post", back_populates="comments")
@@ -116,6 +169,69 @@ class CommentVote(Base):
     user = relationship("User")
     comment = relationship("Comment", back_populates="votes") 
 
+# ----------------
+# Subscriptions, Follows and Home Feeds
+# ----------------
+class Subscription(Base):
+    __tablename__ = "subscriptions"
+
+    id = Column(Integer, primary_key=True, index=True)
+    user_id = Column(String, ForeignKey("users.id"), nullable=False)
+    subreddit_id = Column(Integer, ForeignKey("subreddits.id"), nullable=False, index=True)
+    created_at = Column(DateTime, default=datetime.utcnow)
+
+    __table_args__ = (
+        UniqueConstraint("user_id", "subreddit_id", name="unique_user_subscription"),
+    )
+
+
+class Follow(Base):
+    __tablename__ = "follows"
+
+    id = Column(Integer, primary_key=True, index=True)
+    follower_id = Column(String, ForeignKey("users.id"), nullable=False)
+    followee_id = Column(String, ForeignKey("users.id"), nullable=False, index=True)
+    created_at = Column(DateTime, default=datetime.utcnow)
+
+    __table_args__ = (
+        UniqueConstraint("follower_id", "followee_id", name="unique_follow"),
+    )
+
+
+class FeedEntry(Base):
+    """A post pushed into a user's home feed; each user keeps at most FEED_MAX_ENTRIES of them"""
+    __tablename__ = "feed_entries"
+
+    user_id = Column(String, ForeignKey("users.id"), primary_key=True)
+    post_id = Column(Integer, ForeignKey("posts.id"), primary_key=True, index=True)
+    created_at = Column(DateTime, default=datetime.utcnow)
+
+
+# ----------------
+# Notifications
+# ----------------
+class Notification(Base):
+    """Inbox entry written in batches by the notification worker (app/utils/notifications.py)"""
+    __tablename__ = "notifications"
+
+    id = Column(Integer, primary_key=True, index=True)
+    user_id = Column(String, ForeignKey("users.id"), nullable=False)
+    # "comment_reply", "post_reply", "mention" or "follow"
+    type = Column(String, nullable=False)
+    actor_id = Column(String, ForeignKey("users.id"))
+    post_id = Column(Integer, ForeignKey("posts.id"))
+    comment_id = Column(Integer, ForeignKey("comments.id"), index=True)
+    created_at = Column(DateTime, default=datetime.utcnow)
+    read_at = Column(DateTime)
+
+    __table_args__ = (
+        # Inbox pages newest first by id
+        Index("ix_notifications_user_id", "user_id", "id"),
+        # Only unread rows are indexed, so the unread count never touches read ones
+        Index("ix_notifications_unread", "user_id", sqlite_where=read_at.is_(None)),
+    )
+
+
 class SavedPost(Base):
     __tablename__ = "saved_posts"
     id = Column(Integer, primary_key=True, index=True)
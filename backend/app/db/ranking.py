@@ -0,0 +1,39 @@
+# app/db/ranking.py
+
+import math
+
+# z for an 80% confidence interval, the value reddit uses for "best"
+WILSON_Z = 1.281551565545
+
+
+def wilson_lower_bound(upvotes: int, downvotes: int) -> float:
+    """Lower bound of the Wilson score interval for the share of upvotes"""
+    n = (upvotes or 0) + (downvotes or 0)
+    if n == 0:
+        return 0.0
+    z2 = WILSON_Z * WILSON_Z
+    phat = upvotes / n
+    return (phat + z2 / (2 * n) - WILSON_Z * math.sqrt((phat * (1 - phat) + z2 / (4 * n)) / n)) / (1 + z2 / n)
+
+
+def controversy(upvotes: int, downvotes: int) -> float:
+    """Vote magnitude weighted by how evenly it is split: many votes, close to 50/50, ranks first"""
+    upvotes, downvotes = upvotes or 0, downvotes or 0
+    if upvotes <= 0 or downvotes <= 0:
+        return 0.0
+    balance = downvotes / upvotes if upvotes > downvotes else upvotes / downvotes
+    return float(upvotes + downvotes) ** balance
+
+
+def vote_count_deltas(old_value: int, new_value: int) -> dict:
+    """Change to a comment's upvotes/downvotes when a user's vote goes from old_value to new_value (0 = none)"""
+    return {
+        "upvotes": (new_value == 1) - (old_value == 1),
+        "downvotes": (new_value == -1) - (old_value == -1),
+    }
+
+
+def register_sql_functions(dbapi_connection, connection_record=None):
+    """Expose the scores to SQL so ORDER BY can rank comments without a Python pass"""
+    dbapi_connection.create_function("wilson_lower_bound", 2, wilson_lower_bound, deterministic=True)
+    dbapi_connection.create_function("controversy", 2, controversy, deterministic=True)
@@ -0,0 +1,185 @@
+# app/db/shared_state.py
+
+import os
+import threading
+from contextlib import contextmanager
+from typing import Optional
+
+from sqlalchemy import Column, Float, Integer, MetaData, String, Table, create_engine, event, insert, update  # type: ignore
+
+from ..config import settings
+from .db import db, Database
+
+# Not part of Base: the shared state outlives every reset of the app database
+metadata = MetaData()
+
+# A single row: the current session and how many times the database has been replaced
+environment = Table(
+    "environment",
+    metadata,
+    Column("id", Integer, primary_key=True),
+    Column("session_id", String, nullable=True),
+    Column("generation", Integer, nullable=False, default=0),
+    # Supervisor (or process) id of the launch that seeded the database
+    Column("launch_id", Integer, nullable=True),
+)
+
+# Index of the checkpoint files in CHECKPOINT_DIR, see app/db/checkpoints.py
+checkpoint_files = Table(
+    "checkpoints",
+    metadata,
+    Column("checkpoint_id", String, primary_key=True),
+    Column("session_id", String, nullable=True),
+    Column("created_at", String, nullable=False),
+    Column("size_bytes", Integer, nullable=False),
+    Column("used_at", Float, nullable=False),
+)
+
+
+class SharedState:
+    """State every uvicorn worker has to agree on, in a small SQLite file next to the database.
+
+    The current session lives here instead of in process memory. Resets, restores and forks
+    replace the database inside replacing(), which holds this file's write lock, so one
+    worker replaces it at a time, and bumps a generation counter on the way out. Every
+    request, and every pass of the log, vote and notification flushers, starts with sync().
+    It reads PRAGMA data_version on a dedicated connection, which only changes when another
+    connection committed, and runs the reset listeners when another worker replaced the
+    database since. Caches and queued writes captured against the old one are dropped.
+    """
+
+    def __init__(self, db: Database, path: Optional[str] = None):
+        self.db = db
+        self.path = path or settings.shared_state_path
+        self.engine = None
+        self._lock = threading.Lock()
+        # Dedicated connection polled by sync() and session()
+        self._watch = None
+        self._data_version = None
+        self._session_id = None
+        # Generation last read from the file, and the one this worker's caches belong to
+        self._latest = 0
+        self._generation = 0
+
+    # --- CONNECTING ---
+
+    def open(self):
+        with self._lock:
+            if self.engine is not None:
+                return
+            engine = create_engine(
+                f"sqlite:///{self.path}",
+                # Replacements queue behind each other: a miss seeds for a second or two
+                connect_args={"check_same_thread": False, "timeout": 60},
+            )
+            event.listen(engine, "connect", self._set_sqlite_pragmas)
+            event.listen(engine, "begin", self._begin_immediate)
+            with engine.begin() as conn:
+                metadata.create_all(conn)
+                conn.execute(insert(environment).prefix_with("OR IGNORE").values(id=1, generation=0))
+            self._watch = engine.raw_connection()
+            self.engine = engine
+            self._refresh()
+            self._generation = self._latest
+
+    @staticmethod
+    def _set_sqlite_pragmas(dbapi_connection, connection_record):
+        # Manual transactions, so BEGIN IMMEDIATE below is what SQLite sees
+        dbapi_connection.isolation_level = None
+        cursor = dbapi_connection.cursor()
+        cursor.execute("PRAGMA journal_mode = WAL")
+        cursor.execute(f"PRAGMA synchronous = {settings.sqlite_synchronous}")
+        cursor.close()
+
+    @staticmethod
+    def _begin_immediate(conn):
+        conn.exec_driver_sql("BEGIN IMMEDIATE")
+
+    @contextmanager
+    def transaction(self):
+        """A write transaction on the shared file; other workers' transactions wait for it"""
+        self.open()
+        with self.engine.begin() as conn:
+            yield conn
+
+    def close(self):
+        with self._lock:
+            if self.engine is None:
+                return
+            self._watch.close()
+            self.engine.dispose()
+            self._watch = self.engine = None
+            self._data_version = None
+
+    # --- SYNCING ---
+
+    def _refresh(self):
+        """Re-read the row when another connection committed since the last look (holds _lock)"""
+        connection = self._watch.driver_connection
+        data_version = connection.execute("PRAGMA data_version").fetchone()[0]
+        if data_version == self._data_version:
+            return
+        self._data_version = data_version
+        self._session_id, self._latest = connection.execute(
+            "SELECT session_id, generation FROM environment WHERE id = 1"
+        ).fetchone()
+
+    def sync(self):
+        """Drop this worker's caches if another worker replaced the database since"""
+        self.open()
+        with self._lock:
+            self._refresh()
+            stale = self._latest != self._generation
+            self._generation = self._latest
+        if stale:
+            for listener in self.db.reset_listeners:
+                listener()
+
+    @contextmanager
+    def replacing(self):
+        """Replace the database while every other worker's replacement waits, then tell them"""
+        with self.transaction() as conn:
+            yield conn
+            generation = conn.execute(
+                update(environment)
+                .where(environment.c.id == 1)
+                .values(generation=environment.c.generation + 1)
+                .returning(environment.c.generation)
+            ).scalar()
+        # This worker's caches were dropped by the replacement itself
+        with self._lock:
+            self._generation = max(self._generation, generation)
+
+    @contextmanager
+    def startup(self):
+        """Yields True in the first worker of a launch, which seeds; the others wait for it.
+
+        Workers started by one `uvicorn --workers N` share their parent's pid. A single
+        worker (the default, or --reload) always seeds, as before.
+        """
+        launch_id = os.getppid() if settings.workers > 1 else os.getpid()
+        with self.transaction() as conn:
+            seeding = conn.execute(
+                update(environment)
+                .where(environment.c.id == 1, environment.c.launch_id.is_distinct_from(launch_id))
+                .values(launch_id=launch_id, session_id=None, generation=environment.c.generation + 1)
+            ).rowcount == 1
+            yield seeding
+        with self._lock:
+            self._refresh()
+            self._generation = self._latest
+
+    # --- SESSION ---
+
+    def session(self) -> Optional[str]:
+        self.open()
+        with self._lock:
+            self._refresh()
+            return self._session_id
+
+    def set_session(self, session_id: Optional[str]):
+        with self.transaction() as conn:
+            conn.execute(update(environment).where(environment.c.id == 1).values(session_id=session_id))
+
+
+shared_state = SharedState(db)
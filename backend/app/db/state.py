@@ -0,0 +1,196 @@
+# app/db/state.py
+
+import hashlib
+import json
+from collections import defaultdict
+from typing import Any, Dict, List, Optional, Tuple
+
+from sqlalchemy import delete, func, insert, select, tuple_  # type: ignore
+
+from .base import Base
+from .db import db, Database
+from .synthetic_models import StateDirtyRow, StateSeedRow, StateSeedTable
+from .writer import writer, Writer
+
+# Bookkeeping tables that are not part of the environment state
+UNTRACKED = {"logs", "log_dictionaries", "state_seed_rows", "state_seed_tables", "state_dirty_rows"}
+
+# Dirty keys looked up per statement
+KEY_CHUNK = 500
+
+# (row hash, row) of one version of a row
+Version = Tuple[int, Dict[str, Any]]
+
+
+def tracked_tables():
+    return [table for table in Base.metadata.sorted_tables if table.name not in UNTRACKED]
+
+
+def _row_key_sql(table, prefix: str) -> str:
+    return f"json_array({', '.join(f'{prefix}.{column.name}' for column in table.primary_key.columns)})"
+
+
+def _triggers(table) -> List[str]:
+    """Triggers recording the key of every row an INSERT, UPDATE or DELETE touches.
+
+    NOT EXISTS rather than INSERT OR IGNORE: an upsert's own conflict clause would override it.
+    """
+    def mark(*prefixes: str) -> str:
+        keys = " UNION ".join(f"SELECT {_row_key_sql(table, prefix)} AS row_key" for prefix in prefixes)
+        return (
+            f"INSERT INTO state_dirty_rows (table_name, row_key) SELECT '{table.name}', changed.row_key FROM ({keys}) AS changed "
+            f"WHERE NOT EXISTS (SELECT 1 FROM state_dirty_rows AS dirty "
+            f"WHERE dirty.table_name = '{table.name}' AND dirty.row_key = changed.row_key);"
+        )
+
+    return [
+        f"CREATE TRIGGER IF NOT EXISTS state_{table.name}_{operation} AFTER {operation.upper()} ON {table.name} "
+        f"BEGIN {mark(*prefixes)} END"
+        for operation, prefixes in (("insert", ("NEW",)), ("update", ("OLD", "NEW")), ("delete", ("OLD",)))
+    ]
+
+
+def _version(row) -> Version:
+    values = json.loads(json.dumps(
+        {name: value for name, value in row._mapping.items() if name != "state_row_key"}, default=str
+    ))
+    canonical = json.dumps(values, sort_keys=True, separators=(",", ":"))
+    return int.from_bytes(hashlib.blake2b(canonical.encode(), digest_size=16).digest(), "big"), values
+
+
+def _hex(digest: int) -> str:
+    return f"{digest:032x}"
+
+
+class StateTracker:
+    """Order-independent digests of the environment state, and its diff against the seed.
+
+    A table's digest is the XOR of the hashes of its rows. Right after seeding, every row's
+    hash and values are stored with the digest of each table. From then on, SQLite triggers
+    record the primary key of every row an INSERT, UPDATE or DELETE touches. Core statements
+    and upserts are caught as well as ORM flushes. The current digest is the seed digest
+    with the seed and current hashes of the dirty rows XORed in, so state and diff cost is
+    proportional to the rows written since the seed, not to the size of the database.
+    """
+
+    def __init__(self, db: Database, writer: Writer):
+        self.db = db
+        self.writer = writer
+        db.seed_listeners.append(self.capture_seed)
+
+    def capture_seed(self, engine=None):
+        """Store the seeded state and start tracking writes from here.
+
+        `engine` defaults to the app database; the session pool seeds scratch databases too.
+        """
+        with (engine or self.db.engine).begin() as conn:
+            for table in tracked_tables():
+                for trigger in _triggers(table):
+                    conn.exec_driver_sql(trigger)
+            for model in (StateSeedRow, StateSeedTable, StateDirtyRow):
+                conn.execute(delete(model))
+
+            for table in tracked_tables():
+                rows, digest = [], 0
+                for row in conn.execute(self._select(table)):
+                    row_hash, values = _version(row)
+                    digest ^= row_hash
+                    rows.append({
+                        "table_name": table.name, "row_key": row.state_row_key, "row_hash": _hex(row_hash), "row": values,
+                    })
+                if rows:
+                    conn.execute(insert(StateSeedRow), rows)
+                conn.execute(
+                    insert(StateSeedTable).values(table_name=table.name, row_count=len(rows), digest=_hex(digest))
+                )
+
+    @staticmethod
+    def _select(table):
+        key = func.json_array(*table.primary_key.columns).label("state_row_key")
+        return select(key, *table.c)
+
+    # --- READING ---
+
+    def _changes(self, table_name: Optional[str] = None) -> Dict[str, List[Tuple[str, Optional[Version], Optional[Version]]]]:
+        """table -> [(row key, seed version, current version)] of every row written since the seed"""
+        tables = {table.name: table for table in tracked_tables()}
+        changes = defaultdict(list)
+        # No write may land between reading the dirty keys and the rows they point to
+        with self.writer.paused(), self.db.engine.connect() as conn:
+            query = select(StateDirtyRow.table_name, StateDirtyRow.row_key)
+            if table_name is not None:
+                query = query.where(StateDirtyRow.table_name == table_name)
+            dirty = defaultdict(list)
+            for name, row_key in conn.execute(query):
+                if name in tables:
+                    dirty[name].append(row_key)
+
+            for name, keys in dirty.items():
+                table = tables[name]
+                primary_key = list(table.primary_key.columns)
+                for start in range(0, len(keys), KEY_CHUNK):
+                    chunk = keys[start:start + KEY_CHUNK]
+                    seed = {
+                        row_key: (int(row_hash, 16), row)
+                        for row_key, row_hash, row in conn.execute(
+                            select(StateSeedRow.row_key, StateSeedRow.row_hash, StateSeedRow.row)
+                            .where(StateSeedRow.table_name == name, StateSeedRow.row_key.in_(chunk))
+                        )
+                    }
+                    values = [json.loads(row_key) for row_key in chunk]
+                    if len(primary_key) == 1:
+                        where = primary_key[0].in_([value[0] for value in values])
+                    else:
+                        where = tuple_(*primary_key).in_([tuple(value) for value in values])
+                    current = {row.state_row_key: _version(row) for row in conn.execute(self._select(table).where(where))}
+                    changes[name] += [(row_key, seed.get(row_key), current.get(row_key)) for row_key in chunk]
+        return changes
+
+    def state(self) -> Dict[str, Any]:
+        """Row count and digest of every tracked table, and a root digest over all of them"""
+        changes = self._changes()
+        with self.db.engine.connect() as conn:
+            seeded = {
+                name: (row_count, int(digest, 16))
+                for name, row_count, digest in conn.execute(
+                    select(StateSeedTable.table_name, StateSeedTable.row_count, StateSeedTable.digest)
+                )
+            }
+
+        tables = {}
+        for table in tracked_tables():
+            row_count, digest = seeded.get(table.name, (0, 0))
+            for _, before, after in changes.get(table.name, ()):
+                if before is not None:
+                    row_count, digest = row_count - 1, digest ^ before[0]
+                if after is not None:
+                    row_count, digest = row_count + 1, digest ^ after[0]
+            tables[table.name] = {"rows": row_count, "digest": _hex(digest)}
+
+        root = hashlib.blake2b(digest_size=16)
+        for name in sorted(tables):
+            root.update(f"{name}:{tables[name]['rows']}:{tables[name]['digest']}\n".encode())
+        return {
+            "root": root.hexdigest(),
+            "changed_rows": sum(len(rows) for rows in changes.values()),
+            "tables": tables,
+        }
+
+    def diff(self, table_name: Optional[str] = None) -> Dict[str, Dict[str, List[Dict[str, Any]]]]:
+        """Rows inserted, updated and deleted since the seed, per table with any change"""
+        result = {}
+        for name, rows in sorted(self._changes(table_name).items()):
+            inserted, updated, deleted = [], [], []
+            for _, before, after in rows:
+                if before is None and after is not None:
+                    inserted.append(after[1])
+                elif before is not None and after is None:
+                    deleted.append(before[1])
+                elif before is not None and before[0] != after[0]:
+                    updated.append({"before": before[1], "after": after[1]})
+            if inserted or updated or deleted:
+                result[name] = {"inserted": inserted, "updated": updated, "deleted": deleted}
+        return result
+
+
+state_tracker = StateTracker(db, writer)
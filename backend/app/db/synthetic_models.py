@@ -1,8 +1,8 @@
 from enum import Enum as PyEnum
-from sqlalchemy import Column, Integer, String, DateTime, JSON, Enum
+from sqlalchemy import Column, Computed, Index, Integer, LargeBinary, String, DateTime, JSON, Enum
 from sqlalchemy.sql import func
 from pydantic import BaseModel
-from typing import Dict, Any, Literal, Union
+from typing import Dict, Any, Literal, Optional, Union
 from .base import Base
 
 # Action types: these are the actions can be logged
@@ -21,16 +21,19 @@ class ActionType(PyEnum):
     CUSTOM = "custom" # For custom actions
 
 class HttpRequestPayload(BaseModel):
-    text: str # Natural language description of the request
+    text: Optional[str] = None # Natural language description of the request, rendered on read when absent
     method: str
     url: str
+    path: Optional[str] = None # url without scheme, host and query string
     query_params: Dict[str, str]
     request_body: Dict[str, Any]
     status_code: int
     response_time: float
+    started_at: Optional[float] = None # Epoch seconds when the request arrived (used for replay pacing)
+    headers: Dict[str, str] = {} # Replay-relevant request headers (x-session-id, x-user-id)
 
 class DbUpdatePayload(BaseModel):
-    text: str # Natural language description of the update
+    text: Optional[str] = None # Natural language description of the update, rendered on read when absent
     table_name: str
     update_type: Literal["insert", "update", "delete"]
     values: Dict[str, Any]
@@ -105,10 +108,30 @@ class Log(Base):
     __tablename__ = "logs"
 
     id = Column(Integer, primary_key=True, index=True)
-    timestamp = Column(DateTime(timezone=True), server_default=func.now())
-    session_id = Column(String, index=True)
+    timestamp = Column(DateTime(timezone=True), server_default=func.now(), index=True)
+    session_id = Column(String)
     action_type = Column(Enum(ActionType), index=True)
     payload = Column(JSON)
+    # With LOG_PAYLOAD_ENCODING=msgpack-zstd the full payload is stored here (see app/db/log_codec.py)
+    # and `payload` only keeps the fields the generated columns below extract
+    payload_blob = Column(LargeBinary)
+
+    # --- QUERYABLE FIELDS ---
+    # Virtual generated columns: computed from payload, so writers never set them, and indexed
+    # so /_synthetic/logs filters in SQL. NULL for the action types that lack the field.
+    method = Column(String, Computed("json_extract(payload, '$.method')", persisted=False))
+    url_path = Column(String, Computed("json_extract(payload, '$.path')", persisted=False))
+    status_code = Column(Integer, Computed("json_extract(payload, '$.status_code')", persisted=False))
+    table_name = Column(String, Computed("json_extract(payload, '$.table_name')", persisted=False))
+    update_type = Column(String, Computed("json_extract(payload, '$.update_type')", persisted=False))
+
+    __table_args__ = (
+        # One session's logs in id order, also serving the keyset cursor
+        Index("ix_logs_session_id", "session_id", "id"),
+        Index("ix_logs_url_path", "url_path", "method", "status_code"),
+        Index("ix_logs_status_code", "status_code"),
+        Index("ix_logs_table_name", "table_name", "update_type"),
+    )
 
     def __init__(self, session_id: str, action_type: ActionType, payload: Dict[str, Any]):
         self.session_id = session_id
@@ -153,3 +176,36 @@ class Log(Base):
                 "validation_error": str(e)
             }
 
+class LogDictionary(Base):
+    """zstd dictionary trained on one action type's payloads; referenced by id from payload_blob"""
+    __tablename__ = "log_dictionaries"
+
+    id = Column(Integer, primary_key=True)
+    action_type = Column(Enum(ActionType), nullable=False)
+    data = Column(LargeBinary, nullable=False)
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+
+class StateSeedRow(Base):
+    """One row of the seeded state, compared against by /_synthetic/diff"""
+    __tablename__ = "state_seed_rows"
+
+    table_name = Column(String, primary_key=True)
+    # JSON array of the row's primary key values, as SQLite's json_array renders it
+    row_key = Column(String, primary_key=True)
+    row_hash = Column(String, nullable=False)
+    row = Column(JSON, nullable=False)
+
+class StateSeedTable(Base):
+    """Row count and XOR digest of one table right after seeding"""
+    __tablename__ = "state_seed_tables"
+
+    table_name = Column(String, primary_key=True)
+    row_count = Column(Integer, nullable=False)
+    digest = Column(String, nullable=False)
+
+class StateDirtyRow(Base):
+    """Key of a row written since the seed; recorded by the triggers of app/db/state.py"""
+    __tablename__ = "state_dirty_rows"
+
+    table_name = Column(String, primary_key=True)
+    row_key = Column(String, primary_key=True)
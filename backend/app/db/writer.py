@@ -0,0 +1,197 @@
+# app/db/writer.py
+
+import contextvars
+import functools
+from contextlib import contextmanager
+import inspect
+import threading
+import time
+from collections import deque
+from concurrent.futures import Future
+from typing import Any, Callable, Dict, List, Optional
+
+from sqlalchemy.orm import Session  # type: ignore
+
+from ..config import settings
+from .db import db, Database
+
+# A write unit: runs against the writer's session and returns the caller's result
+Unit = Callable[[Session], Any]
+
+
+class Writer:
+    """Single writer thread with group commit.
+
+    Every mutation is submitted as a unit. The writer takes whatever units are queued (up
+    to WRITER_BATCH_SIZE), runs each inside its own SAVEPOINT on one connection, commits
+    them together and then resolves every caller's future: one BEGIN IMMEDIATE and one
+    commit for the whole group instead of threads fighting over SQLite's write lock. A unit
+    that raises only rolls back its savepoint and the exception is re-raised to its caller.
+
+    Units run in a copy of the caller's context, so the audit session id and per-request
+    metrics follow them onto the writer thread. Callbacks registered with after_commit run
+    in the caller's thread once its unit is committed. Without a running writer (scripts,
+    one-off tools) units run and commit inline.
+
+    The writer is per process: with several uvicorn workers, their writers still take turns
+    on SQLite's write lock, waiting up to SQLITE_BUSY_TIMEOUT_SECONDS for it.
+    """
+
+    def __init__(self, db: Database):
+        self.db = db
+        self._units: deque = deque()
+        self._ready = threading.Condition()
+        self._thread: Optional[threading.Thread] = None
+        self._stopping = False
+        # Session of the group being written, for units submitted from inside a unit
+        self._session: Optional[Session] = None
+        # Held while a group (or an inline unit) writes; see paused()
+        self._write_lock = threading.Lock()
+        self.groups = 0
+        self.units = 0
+        self.last_group: Dict[str, Any] = {}
+
+    @property
+    def running(self) -> bool:
+        return self._thread is not None
+
+    def start(self):
+        if self._thread is None:
+            self._stopping = False
+            self._thread = threading.Thread(target=self._loop, name="db-writer", daemon=True)
+            self._thread.start()
+
+    def stop(self):
+        """Write out the queued units and stop the thread"""
+        thread = self._thread
+        if thread is None:
+            return
+        with self._ready:
+            self._stopping = True
+            self._ready.notify()
+        thread.join()
+        self._thread = None
+
+    # --- SUBMITTING ---
+
+    def run(self, unit: Unit) -> Any:
+        """Run `unit` in the next group commit and return its result once committed"""
+        if threading.current_thread() is self._thread:
+            if self._session is not None:
+                # Submitted from inside a unit: it simply joins the current transaction
+                return unit(self._session)
+            return self._run_inline(unit)
+        if self._thread is None or self._stopping:
+            return self._run_inline(unit)
+
+        future: Future = Future()
+        with self._ready:
+            self._units.append((unit, contextvars.copy_context(), future))
+            self._ready.notify()
+        result, callbacks = future.result()
+        _run_callbacks(callbacks)
+        return result
+
+    @contextmanager
+    def paused(self):
+        """Hold off every write unit, e.g. while the database file is replaced underneath"""
+        with self._write_lock:
+            yield
+
+    def _run_inline(self, unit: Unit) -> Any:
+        with self._write_lock:
+            session = self.db.WriteSession()
+            try:
+                result = unit(session)
+                session.commit()
+                callbacks = session.info.pop("after_commit", [])
+            except BaseException:
+                session.rollback()
+                raise
+            finally:
+                session.close()
+        _run_callbacks(callbacks)
+        return result
+
+    # --- WRITING ---
+
+    def _loop(self):
+        while True:
+            with self._ready:
+                while not self._units and not self._stopping:
+                    self._ready.wait()
+                if not self._units:
+                    return
+                group = []
+                while self._units and len(group) < settings.writer_batch_size:
+                    group.append(self._units.popleft())
+            with self._write_lock:
+                self._write(group)
+
+    def _write(self, group: List):
+        start = time.perf_counter()
+        outcomes = []
+        session = self.db.WriteSession()
+        self._session = session
+        try:
+            for unit, context, future in group:
+                try:
+                    result = context.run(self._apply, session, unit)
+                    outcomes.append((future, result, session.info.pop("after_commit", []), None))
+                except BaseException as e:
+                    session.info.pop("after_commit", None)
+                    outcomes.append((future, None, None, e))
+            session.commit()
+        except BaseException as e:
+            # The group did not commit: every unit fails with the commit's error
+            session.rollback()
+            outcomes = [(future, None, None, error or e) for future, _, _, error in outcomes]
+        finally:
+            self._session = None
+            session.close()
+
+        for future, result, callbacks, error in outcomes:
+            if error is not None:
+                future.set_exception(error)
+            else:
+                future.set_result((result, callbacks))
+        self.groups += 1
+        self.units += len(group)
+        self.last_group = {"units": len(group), "duration": time.perf_counter() - start}
+
+    @staticmethod
+    def _apply(session: Session, unit: Unit) -> Any:
+        # The savepoint's flush runs here too, inside the caller's context (audit hook, metrics)
+        with session.begin_nested():
+            return unit(session)
+
+
+def _run_callbacks(callbacks):
+    for callback, args in callbacks:
+        callback(*args)
+
+
+def after_commit(session: Session, callback: Callable, *args):
+    """Call `callback(*args)` in the submitting thread once the unit using `session` is committed"""
+    session.info.setdefault("after_commit", []).append((callback, args))
+
+
+writer = Writer(db)
+
+
+def writes(route):
+    """Route decorator: the body runs as one write unit, with the writer's session as `db`.
+
+    FastAPI sees the route's signature without `db`. The body does not commit; the writer
+    commits its group and the route returns the body's result afterwards.
+    """
+    signature = inspect.signature(route)
+
+    @functools.wraps(route)
+    def endpoint(*args, **kwargs):
+        return writer.run(lambda session: route(*args, db=session, **kwargs))
+
+    endpoint.__signature__ = signature.replace(
+        parameters=[parameter for name, parameter in signature.parameters.items() if name != "db"]
+    )
+    return endpoint
@@ -1,20 +1,65 @@
-from fastapi import FastAPI # type : ignore
+from fastapi import FastAPI, HTTPException, Query, Request # type : ignore
 from fastapi.middleware.cors import CORSMiddleware # type : ignore
-from contextlib import asynccontextmanager
-from .routes import posts, vote, synthetic, notes, users, comments, messages, search
+from fastapi.responses import ORJSONResponse, PlainTextResponse, Response # type : ignore
+from contextlib import asynccontextmanager, suppress
+import asyncio
+import threading
+from .routes import posts, vote, synthetic, notes, users, comments, messages, search, subreddits, feed, notifications
 
 from .db.db import db
-from .utils.logger import LogMiddleware
+from .db.log_codec import log_codec
+from .db.shared_state import shared_state
+from .db.writer import writer
+from .utils.logger import LogMiddleware, logger
+from .utils.log_retention import log_retention
+from .utils.metrics import metrics
+from .utils.profiler import profiler, ProfilerBusy
+from .utils.vote_buffer import vote_buffer
+from .utils.trending import trending
+from .utils.notifications import notifications as notification_service
+from .utils.session_pool import session_pool
+from .config import settings
 
 @asynccontextmanager 
 async def lifespan(app: FastAPI):
     # Startup 
-    db.create_database() 
-    db.populate_database(seed = "123")
+    log_codec.check()
+    # With several workers, one creates and seeds the database while the others wait
+    with shared_state.startup() as seeding:
+        db.create_database() 
+        for engine in db.engines:
+            metrics.attach_engine(engine)
+        metrics.instrument_routes(app)
+        if seeding:
+            db.populate_database(seed = "123")
+    writer.start()
+    retention_task = asyncio.create_task(log_retention.run_forever()) if log_retention.enabled else None
+    vote_flush_task = asyncio.create_task(vote_buffer.run_forever()) if vote_buffer.enabled else None
+    trending_task = asyncio.create_task(trending.run_forever())
+    notification_task = asyncio.create_task(notification_service.run_forever())
+    log_writer_task = asyncio.create_task(logger.run_forever())
+    pool_task = asyncio.create_task(session_pool.run_forever()) if session_pool.enabled else None
     yield
     # Shutdown 
+    for task in (retention_task, vote_flush_task, trending_task, notification_task, log_writer_task, pool_task):
+        if task:
+            task.cancel()
+            with suppress(asyncio.CancelledError):
+                await task
+    # Buffered votes are only in memory: write them out before the process goes away
+    if vote_buffer.enabled:
+        await asyncio.to_thread(vote_buffer.flush)
+    await asyncio.to_thread(notification_service.flush)
+    await asyncio.to_thread(logger.flush)
+    await asyncio.to_thread(writer.stop)
+    session_pool.discard()
+    shared_state.close()
 
-app = FastAPI(title="Synthetic App Template (FastAPI)", lifespan=lifespan)
+app = FastAPI(
+    title="Synthetic App Template (FastAPI)",
+    lifespan=lifespan,
+    default_response_class=ORJSONResponse,
+)
 
 app.add_middleware(
     CORSMiddleware,
@@ -22,10 +67,11 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["X-Next-Cursor"],
 ) 
 
 # Attach logging middleware
-app.middleware("http")(LogMiddleware())
+app.add_middleware(LogMiddleware)
 
 # Routers
 app.include_router(synthetic.router, prefix="/_synthetic", tags=["synthetic"])
@@ -45,6 +91,12 @@ app.include_router(messages.router)
 
 app.include_router(search.router) 
 
+app.include_router(subreddits.router)
+
+app.include_router(feed.router)
+
+app.include_router(notifications.router)
+
 @app.get("/") 
 def read_root():
     return {"message": "Backend is running."} 
@@ -52,3 +104,39 @@ def read_root():
 @app.get("/debug/routes")
 def list_routes():
     return [route.path for route in app.routes]
+
+@app.get("/debug/metrics", response_class=PlainTextResponse)
+def get_metrics():
+    """Per-route latency histograms, phase timings and SQL statement counts in Prometheus text format"""
+    return PlainTextResponse(
+        metrics.render_prometheus() + session_pool.render_prometheus(), media_type="text/plain; version=0.0.4"
+    )
+
+@app.get("/debug/profile")
+async def capture_profile(
+    request: Request,
+    seconds: float = Query(5, gt=0),
+    format: str = Query("collapsed", pattern="^(collapsed|pstats)$"),
+    idle: bool = Query(False),
+):
+    """Sample every thread's stack for `seconds` and return collapsed stacks or a pstats dump"""
+    if not settings.profiler_enabled:
+        raise HTTPException(status_code=404, detail="Not Found")
+    if settings.profiler_token and request.headers.get("x-profiler-token") != settings.profiler_token:
+        raise HTTPException(status_code=403, detail="Invalid profiler token")
+    if seconds > settings.profiler_max_seconds:
+        raise HTTPException(status_code=400, detail=f"seconds must be <= {settings.profiler_max_seconds}")
+
+    try:
+        # Sample from a dedicated thread so the event loop keeps serving (and being sampled)
+        stacks = await asyncio.to_thread(profiler.sample, seconds, threading.get_ident(), idle)
+    except ProfilerBusy as e:
+        raise HTTPException(status_code=409, detail=str(e))
+
+    if format == "pstats":
+        return Response(
+            profiler.pstats(stacks),
+            media_type="application/octet-stream",
+            headers={"Content-Disposition": "attachment; filename=profile.pstats"},
+        )
+    return PlainTextResponse(profiler.collapsed(stacks))
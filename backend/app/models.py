@@ -25,6 +25,10 @@ class CommentCreate(BaseModel):
     author_id: str
     parent_id: Optional[int] = None
 
+class CommentMore(BaseModel):
+    cursor: str  # pass to /comments/{id}/children?cursor= to load the hidden replies
+    remaining: int
+
 class CommentResponse(BaseModel):
     id: int
     content: str
@@ -34,6 +38,7 @@ class CommentResponse(BaseModel):
     post_id: int  # <-- Add this
     children: List["CommentResponse"] = Field(default_factory=list)
     votes: int  # <-- Add this line
+    more: Optional[CommentMore] = None  # set when replies were cut off by paging
     class Config:
         orm_mode = True
         
@@ -75,5 +80,73 @@ class MessageResponse(BaseModel):
 class PostUpdate(BaseModel):
     title: str
     content: str
+
+# Slim response schemas: only public columns, built straight from row tuples
+class AuthorSummary(BaseModel):
+    id: Optional[str] = None
+    username: Optional[str] = None
+
+class PostSummary(BaseModel):
+    id: int
+    title: str
+    content: str
+    votes: Optional[int] = None
+    subreddit: Optional[str] = None
+    author_id: Optional[str] = None
+
+class PostListItem(BaseModel):
+    id: int
+    title: str
+    content: str
+    votes: Optional[int] = None
+    author: AuthorSummary
+    subreddit: Optional[str] = None
+    comment_count: int = 0
+    last_activity_at: Optional[datetime] = None
+
+class PostDetail(PostListItem):
+    userID: Optional[str] = None
+
+class SubredditSummary(BaseModel):
+    id: int
+    name: str
+    post_count: int
+    subscriber_count: int = 0
+    last_activity_at: Optional[datetime] = None
+
+class SubscriptionPayload(BaseModel):
+    user_id: str
+
+class FollowPayload(BaseModel):
+    follower_id: str
+
+class NotificationItem(BaseModel):
+    id: int
+    type: str
+    actor: AuthorSummary
+    post_id: Optional[int] = None
+    comment_id: Optional[int] = None
+    created_at: Optional[datetime] = None
+    read: bool = False
+
+class NotificationsRead(BaseModel):
+    user_id: str
+    # Mark only these notifications read; all of the user's when omitted
+    ids: Optional[List[int]] = None
+
+class TrendingSubreddit(BaseModel):
+    id: int
+    name: str
+    score: float
+    recent_posts: int
+    recent_comments: int
+
+class CommentSummary(BaseModel):
+    id: int
+    post_id: int
+    parent_id: Optional[int] = None
+    content: str
+    created_at: Optional[datetime] = None
+    author_id: str
     
 CommentResponse.update_forward_refs()
@@ -1,63 +1,204 @@
 # app/routes/comments.py
 
 import random
-from typing import List
-from fastapi import APIRouter, Depends, HTTPException, Request # type: ignore
+from typing import List, Optional
+from fastapi import APIRouter, Depends, HTTPException, Query # type: ignore
+from fastapi.responses import ORJSONResponse # type: ignore
 from sqlalchemy.orm import Session, joinedload # type: ignore
-from sqlalchemy import func # type: ignore
+from sqlalchemy import select, text, update # type: ignore
+from ..db.audit import audit_session_id, record_change
 from ..db.db import db as database
-from ..db.models import Comment, User, Post, CommentVote
+from ..db.models import Comment, User, Post, CommentVote, Notification, SavedComment, Subreddit, comment_path, subtree_bounds
+from ..db.ranking import vote_count_deltas
+from ..db.writer import after_commit, writer, writes
 from ..models import CommentCreate, CommentResponse
 
-from ..utils.logger import logger
-from ..db.synthetic_models import ActionType
+from ..utils.cursors import decode_cursor, encode_cursor, paged_response
+from ..utils.notifications import notifications
+from ..utils.vote_buffer import vote_buffer
 
 router = APIRouter()
 
-def build_comment_tree(comments, parent_id=None, db=None):
-    """Build comment tree with actual vote counts"""
-    tree = []
-    for comment in comments: 
-        if comment.parent_id == parent_id: 
-            children = build_comment_tree(comments, comment.id, db)
-            
-            # Calculate actual vote count from database
-            vote_sum = db.query(func.sum(CommentVote.value)).filter(CommentVote.comment_id == comment.id).scalar() or 0
-            
-            tree.append(CommentResponse(
-                id=comment.id,
-                content=comment.content,
-                created_at=comment.created_at,
-                author_username=comment.author.username,
-                parent_id=comment.parent_id,
-                post_id=comment.post_id,
-                children=children, 
-                votes=vote_sum  # Use actual vote count instead of random
-            )) 
-    return tree 
+# Sibling order for each ?sort=, evaluated by SQLite (see app/db/ranking.py for the scores)
+COMMENT_SORTS = {
+    "best": "wilson_lower_bound(comments.upvotes, comments.downvotes) DESC",
+    "top": "(comments.upvotes - comments.downvotes) DESC",
+    "new": "comments.created_at DESC",
+    "controversial": "controversy(comments.upvotes, comments.downvotes) DESC",
+}
+
+# Defaults once a request asks for paging
+COMMENT_PAGE_LIMIT = 20
+COMMENT_CHILDREN_LIMIT = 5
+COMMENT_PAGE_DEPTH = 3
+
+# One page of a comment tree: `limit` siblings under the starting parent (from `offset`),
+# then the first `children_limit` replies of every returned comment, `depth` levels down.
+# The subtree is a single range scan on the materialized path index, so expanding a
+# branch never touches the rest of the post.
+COMMENT_PAGE_SQL = """
+WITH RECURSIVE subtree(id, depth) AS (
+    SELECT comments.id, comments.depth - :base_depth FROM comments
+    WHERE {subtree} AND comments.depth BETWEEN :base_depth AND :base_depth + :depth
+),
+ranked AS (
+    SELECT comments.id, comments.parent_id, subtree.depth,
+           ROW_NUMBER() OVER (PARTITION BY comments.parent_id ORDER BY {order_by}, comments.id) AS position,
+           COUNT(*) OVER (PARTITION BY comments.parent_id) AS siblings
+    FROM subtree JOIN comments ON comments.id = subtree.id
+),
+page(id) AS (
+    SELECT id FROM ranked WHERE depth = 0 AND position > :offset AND position <= :offset + :limit
+    UNION ALL
+    SELECT ranked.id FROM ranked JOIN page ON ranked.parent_id = page.id WHERE ranked.position <= :children_limit
+)
+SELECT comments.id, comments.content, comments.created_at, comments.parent_id, comments.post_id,
+       comments.upvotes, comments.downvotes, users.username AS author_username,
+       ranked.depth, ranked.position, ranked.siblings,
+       (SELECT COUNT(*) FROM comments AS replies WHERE replies.parent_id = comments.id) AS replies
+FROM page
+JOIN ranked ON ranked.id = page.id
+JOIN comments ON comments.id = page.id
+JOIN users ON users.id = comments.author_id
+ORDER BY ranked.depth, ranked.position
+"""
+
+def build_comment_tree(rows, root_parent_id=None, children_limit=None, sort="best"):
+    """Build the comment tree as plain dicts in one pass (siblings keep query order).
+
+    With `children_limit`, comments whose replies were cut off get a `more` cursor.
+    """
+    nodes = {}
+    roots = []
+    for row in rows:
+        nodes[row.id] = {
+            "id": row.id,
+            "content": row.content,
+            "created_at": row.created_at,
+            "author_username": row.author_username,
+            "parent_id": row.parent_id,
+            "post_id": row.post_id,
+            "children": [],
+            "votes": row.upvotes - row.downvotes,
+            "more": None,
+        }
+    for row in rows:
+        if row.parent_id == root_parent_id:
+            roots.append(nodes[row.id])
+        elif row.parent_id in nodes:
+            nodes[row.parent_id]["children"].append(nodes[row.id])
+    if children_limit is not None:
+        for row in rows:
+            node = nodes[row.id]
+            shown = len(node["children"])
+            if row.replies > shown:
+                node["more"] = {
+                    "cursor": encode_cursor(post=row.post_id, parent=row.id, offset=shown, sort=sort),
+                    "remaining": row.replies - shown,
+                }
+    return roots
+
+def comment_page(db: Session, post_id: int, parent, offset: int, limit: Optional[int],
+                 children_limit: Optional[int], depth: Optional[int], sort: str):
+    """One page of the tree under `parent` (a Comment, or None for the post's top level) and the cursor to the next one"""
+    parent_id = parent.id if parent is not None else None
+    low, high = subtree_bounds(parent.path) if parent is not None else (None, None)
+    limit = COMMENT_PAGE_LIMIT if limit is None else limit
+    children_limit = COMMENT_CHILDREN_LIMIT if children_limit is None else children_limit
+    depth = COMMENT_PAGE_DEPTH if depth is None else depth
+    order_by = COMMENT_SORTS.get(sort, COMMENT_SORTS["best"])
+    rows = db.execute(
+        text(COMMENT_PAGE_SQL.format(
+            order_by=order_by,
+            subtree="comments.path > :low AND comments.path < :high" if parent is not None else "comments.post_id = :post_id",
+        )),
+        {
+            "post_id": post_id,
+            "low": low,
+            "high": high,
+            "base_depth": parent.depth + 1 if parent is not None else 0,
+            "offset": offset,
+            "limit": limit,
+            "children_limit": children_limit,
+            "depth": depth,
+        },
+    ).all()
+    tree = build_comment_tree(rows, parent_id, children_limit, sort)
+    top_level = [row for row in rows if row.depth == 0]
+    next_cursor = None
+    if top_level and top_level[-1].position < top_level[-1].siblings:
+        next_cursor = encode_cursor(post=post_id, parent=parent_id, offset=top_level[-1].position, sort=sort)
+    return tree, next_cursor
 
 @router.get("/posts/{post_id}/comments", response_model=List[CommentResponse])
-def get_comments(post_id: int, db: Session = Depends(database.get_db)):
-    """Get all comments for a post with actual vote counts"""
-    comments = db.query(Comment)\
-        .options(joinedload(Comment.author), joinedload(Comment.votes))\
-        .filter(Comment.post_id == post_id)\
-        .all()
-    return build_comment_tree(comments, db=db)
+def get_comments(
+    post_id: int,
+    sort: str = Query("best"),
+    limit: Optional[int] = Query(None, ge=1, le=500),
+    children_limit: Optional[int] = Query(None, ge=0, le=500),
+    depth: Optional[int] = Query(None, ge=0, le=50),
+    cursor: Optional[str] = Query(None),
+    db: Session = Depends(database.get_db),
+):
+    """Get the comments of a post, siblings ordered by best, top, new or controversial.
+
+    Without paging parameters the whole tree is returned. With any of them, only `limit`
+    top-level comments and `children_limit` replies per comment come back, truncated
+    comments carry a `more` cursor and the next top-level page is in `X-Next-Cursor`.
+    """
+    if limit is None and children_limit is None and depth is None and cursor is None:
+        rows = db.query(
+            Comment.id, Comment.content, Comment.created_at, Comment.parent_id, Comment.post_id,
+            Comment.upvotes, Comment.downvotes, User.username.label("author_username"),
+        ).join(User, Comment.author_id == User.id)\
+            .filter(Comment.post_id == post_id)\
+            .order_by(text(COMMENT_SORTS.get(sort, COMMENT_SORTS["best"])), Comment.id)\
+            .all()
+        return ORJSONResponse(build_comment_tree(rows))
+
+    offset = 0
+    if cursor is not None:
+        position = decode_cursor(cursor, post=int, parent=(int, None), offset=int, sort=str)
+        if position["post"] != post_id or position["parent"] is not None:
+            raise HTTPException(status_code=400, detail="Cursor does not belong to this post")
+        offset, sort = position["offset"], position["sort"]
+    return paged_response(*comment_page(db, post_id, None, offset, limit, children_limit, depth, sort))
+
+@router.get("/comments/{comment_id}/children", response_model=List[CommentResponse])
+def get_comment_children(
+    comment_id: int,
+    sort: str = Query("best"),
+    limit: Optional[int] = Query(None, ge=1, le=500),
+    children_limit: Optional[int] = Query(None, ge=0, le=500),
+    depth: Optional[int] = Query(None, ge=0, le=50),
+    cursor: Optional[str] = Query(None),
+    db: Session = Depends(database.get_db),
+):
+    """Expand one branch: the replies of a comment, paged like /posts/{post_id}/comments"""
+    parent = db.query(Comment.id, Comment.post_id, Comment.path, Comment.depth).filter(Comment.id == comment_id).first()
+    if parent is None:
+        raise HTTPException(status_code=404, detail="Comment not found")
+
+    offset = 0
+    if cursor is not None:
+        position = decode_cursor(cursor, post=int, parent=(int, None), offset=int, sort=str)
+        if position["parent"] != comment_id:
+            raise HTTPException(status_code=400, detail="Cursor does not belong to this comment")
+        offset, sort = position["offset"], position["sort"]
+    return paged_response(*comment_page(db, parent.post_id, parent, offset, limit, children_limit, depth, sort))
 
 @router.get("/comments/{comment_id}", response_model=CommentResponse)
 def get_comment(comment_id: int, db: Session = Depends(database.get_db)):
     """Get a single comment by ID with its current vote count"""
     comment = db.query(Comment)\
-        .options(joinedload(Comment.author), joinedload(Comment.votes))\
+        .options(joinedload(Comment.author))\
         .filter(Comment.id == comment_id)\
         .first()
     
     if not comment:
         raise HTTPException(status_code=404, detail="Comment not found")
     
-    # Calculate actual vote count from the database
-    vote_sum = db.query(func.sum(CommentVote.value)).filter(CommentVote.comment_id == comment_id).scalar() or 0
+    vote_sum = comment.upvotes - comment.downvotes
     
     return CommentResponse(
         id=comment.id,
@@ -71,7 +212,8 @@ def get_comment(comment_id: int, db: Session = Depends(database.get_db)):
     )
 
 @router.post("/comments/", response_model=CommentResponse)
-def create_comment(comment: CommentCreate, db: Session = Depends(database.get_db)):
+@writes
+def create_comment(comment: CommentCreate, db: Session):
     print("Received comment:", comment)
     user = db.query(User).filter(User.id == comment.author_id).first()
     post = db.query(Post).filter(Post.id == comment.post_id).first()
@@ -79,17 +221,44 @@ def create_comment(comment: CommentCreate, db: Session = Depends(database.get_db
     if not user or not post:
         raise HTTPException(status_code=404, detail="User or Post not found")
 
+    parent = None
+    if comment.parent_id is not None:
+        parent = db.query(Comment.path, Comment.depth)\
+            .filter(Comment.id == comment.parent_id, Comment.post_id == comment.post_id)\
+            .first()
+        if not parent:
+            raise HTTPException(status_code=404, detail="Parent comment not found")
+
     db_comment = Comment( 
         content=comment.content,
         post_id=comment.post_id,
         author_id=comment.author_id,
-        parent_id=comment.parent_id
+        parent_id=comment.parent_id,
+        depth=parent.depth + 1 if parent else 0,
     )
 
     db.add(db_comment)
-    db.commit()
+    db.flush()
+    db_comment.path = comment_path(parent.path if parent else None, db_comment.id)
+    db.execute(
+        update(Post)
+        .where(Post.id == comment.post_id)
+        .values(comment_count=Post.comment_count + 1, last_activity_at=db_comment.created_at)
+    )
+    db.execute(
+        update(Subreddit)
+        .where(Subreddit.id == select(Post.subreddit_id).where(Post.id == comment.post_id).scalar_subquery())
+        .values(last_activity_at=db_comment.created_at)
+    )
+    db.flush()
     db.refresh(db_comment) 
 
+    # Reply and mention recipients are resolved by the notification worker, off the request path
+    after_commit(
+        db, notifications.comment_created,
+        db_comment.id, db_comment.post_id, db_comment.parent_id, db_comment.author_id, db_comment.content,
+    )
+
     return CommentResponse(
         id=db_comment.id,
         content=db_comment.content,
@@ -102,8 +271,9 @@ def create_comment(comment: CommentCreate, db: Session = Depends(database.get_db
     )
 
 @router.post("/comments/{comment_id}/vote")
-def vote_on_comment(comment_id: int, vote: dict, request: Request, db: Session = Depends(database.get_db)):
-    session_id = request.headers.get("x-session-id", "no_session")
+def vote_on_comment(comment_id: int, vote: dict):
+    # The same session as the request's other DB_UPDATE logs: header, query parameter or current session
+    session_id = audit_session_id.get()
 
     user_id = vote.get("user_id")
     value = vote.get("value")  # should be 1 (upvote), -1 (downvote), or 0 (neutral/remove)
@@ -111,107 +281,66 @@ def vote_on_comment(comment_id: int, vote: dict, request: Request, db: Session =
     if value not in [1, -1, 0]:
         raise HTTPException(status_code=400, detail="Invalid vote value")
 
+    if vote_buffer.enabled:
+        if vote_buffer.record("comment_votes", comment_id, user_id, value, session_id) is None:
+            raise HTTPException(status_code=404, detail="Comment not found")
+        return {"status": "vote removed" if value == 0 else "vote recorded"}
+
+    return writer.run(lambda db: write_comment_vote(db, comment_id, user_id, value))
+
+
+def write_comment_vote(db: Session, comment_id: int, user_id: str, value: int):
     comment = db.query(Comment).filter(Comment.id == comment_id).first()
     if not comment:
         raise HTTPException(status_code=404, detail="Comment not found")
 
     existing_vote = db.query(CommentVote).filter_by(user_id=user_id, comment_id=comment_id).first()
 
+    old_value = existing_vote.value if existing_vote else 0
+    if old_value != value:
+        db.execute(
+            update(Comment)
+            .where(Comment.id == comment_id)
+            .values({column: getattr(Comment, column) + delta for column, delta in vote_count_deltas(old_value, value).items()})
+        )
+
     if value == 0:
         if existing_vote:
             db.delete(existing_vote)
-            db.commit()
-
-            logger.log_action(
-                session_id,
-                ActionType.DB_UPDATE,
-                {
-                    "table_name": "comment_votes",
-                    "update_type": "delete",
-                    "text": f"User {user_id} removed vote from Comment {comment_id}",
-                    "values": {
-                        "comment_id": comment_id,
-                        "user_id": user_id,
-                        "old_value": existing_vote.value
-                    }
-                }
-            )
+
         return {"status": "vote removed"}
 
     # Upvote or downvote
     if existing_vote:
-        old_value = existing_vote.value
         existing_vote.value = value
         update_type = "update"
     else:
         new_vote = CommentVote(user_id=user_id, comment_id=comment_id, value=value)
         db.add(new_vote)
-        old_value = None
         update_type = "insert"
 
-    db.commit()
-
-    logger.log_action(
-        session_id,
-        ActionType.DB_UPDATE,
-        {
-            "table_name": "comment_votes",
-            "update_type": update_type,
-            "text": (
-                f"User {user_id} {'updated' if update_type == 'update' else 'cast'} vote "
-                f"on Comment {comment_id} with value {value}"
-            ),
-            "values": {
-                "comment_id": comment_id,
-                "user_id": user_id,
-                "old_value": old_value,
-                "new_value": value
-            }
-        }
-    )
-
     return {"status": "vote recorded"}
- 
 
     # # Return updated vote count
     # vote_sum = db.query(func.sum(CommentVote.value)).filter(CommentVote.comment_id == comment_id).scalar() or 0
     # return {"message": "Vote recorded", "votes": vote_sum} 
 
 @router.put("/comments/{comment_id}", response_model=CommentResponse)
+@writes
 def update_comment(
     comment_id: int,
     updated_data: CommentCreate,
-    request: Request,
-    db: Session = Depends(database.get_db)
+    db: Session
 ):
-    session_id = request.headers.get("x-session-id", "no_session")
-
     comment = db.query(Comment).filter(Comment.id == comment_id).first()
     if not comment:
         raise HTTPException(status_code=404, detail="Comment not found")
 
-    old_content = comment.content
     comment.content = updated_data.content
-    db.commit()
+    db.flush()
     db.refresh(comment)
 
-    vote_sum = db.query(func.sum(CommentVote.value)).filter(CommentVote.comment_id == comment_id).scalar() or 0
-
-    logger.log_action(
-        session_id,
-        ActionType.DB_UPDATE,
-        {
-            "table_name": "comments",
-            "update_type": "update",
-            "text": f"User updated comment {comment_id}",
-            "values": {
-                "comment_id": comment.id,
-                "old_content": old_content,
-                "new_content": comment.content,
-                "votes": vote_sum,
-            },
-        }
-    )
+    vote_sum = comment.upvotes - comment.downvotes
 
     return CommentResponse(
         id=comment.id,
@@ -225,29 +354,36 @@ def update_comment(
     )
 
 @router.delete("/comments/{comment_id}")
-def delete_comment(comment_id: int, request: Request, db: Session = Depends(database.get_db)):
-    session_id = request.headers.get("x-session-id", "no_session")
-
+@writes
+def delete_comment(comment_id: int, db: Session):
     comment = db.query(Comment).filter(Comment.id == comment_id).first()
     if not comment:
         raise HTTPException(status_code=404, detail="Comment not found")
 
+    # The comment and all its replies are one path range; their votes and saves go with them
+    low, high = subtree_bounds(comment.path)
+    in_subtree = db.query(Comment.id).filter(
+        (Comment.id == comment_id) | ((Comment.path > low) & (Comment.path < high))
+    ).scalar_subquery()
+    db.query(CommentVote).filter(CommentVote.comment_id.in_(in_subtree)).delete(synchronize_session=False)
+    db.query(SavedComment).filter(SavedComment.comment_id.in_(in_subtree)).delete(synchronize_session=False)
+    db.query(Notification).filter(Notification.comment_id.in_(in_subtree)).delete(synchronize_session=False)
+    deleted_replies = db.query(Comment)\
+        .filter((Comment.path > low) & (Comment.path < high))\
+        .delete(synchronize_session=False)
+    if deleted_replies:
+        # A bulk delete never reaches the flush hook; the comment itself is logged when it is flushed
+        record_change(
+            db, "comments", "delete", f"Deleted the {deleted_replies} replies under comment {comment_id}",
+            {"comment_id": comment_id, "deleted_replies": deleted_replies},
+        )
+    post_id = comment.post_id
     db.delete(comment)
-    db.commit()
-
-    logger.log_action(
-        session_id,
-        ActionType.DB_UPDATE,
-        {
-            "table_name": "comments",
-            "update_type": "delete",
-            "text": f"User deleted comment {comment_id}",
-            "values": {
-                "comment_id": comment_id,
-                "post_id": comment.post_id,
-                "author_id": comment.author_id,
-            }, 
-        }
+    # last_activity_at is left alone: the thread was still active at that time
+    db.execute(
+        update(Post)
+        .where(Post.id == post_id)
+        .values(comment_count=Post.comment_count - 1 - deleted_replies)
     )
 
     return {"message": "Comment deleted"}
@@ -0,0 +1,106 @@
+# app/routes/feed.py
+
+from typing import List, Optional
+
+from fastapi import APIRouter, Depends, HTTPException, Query  # type: ignore
+from sqlalchemy import delete, update  # type: ignore
+from sqlalchemy.dialects.sqlite import insert  # type: ignore
+from sqlalchemy.orm import Session  # type: ignore
+
+from ..config import settings
+from ..db.audit import record_change
+from ..db.db import db as database
+from ..db.models import Follow, Post, Subreddit, Subscription, User
+from ..db.writer import after_commit, writes
+from ..models import FollowPayload, PostListItem, SubscriptionPayload
+from ..utils import home_feed
+from ..utils.cursors import decode_cursor, encode_cursor, paged_response
+from ..utils.notifications import notifications
+from .posts import post_card, query_post_cards
+
+router = APIRouter(tags=["Feed"])
+
+
+def _require_user(db: Session, user_id: str):
+    if db.query(User.id).filter(User.id == user_id).scalar() is None:
+        raise HTTPException(status_code=404, detail="User not found")
+
+
+@router.post("/subreddits/{subreddit}/subscribe")
+@writes
+def toggle_subscription(subreddit: str, payload: SubscriptionPayload, db: Session):
+    """Subscribe to a community, or unsubscribe when already subscribed"""
+    subreddit_id = db.query(Subreddit.id).filter(Subreddit.name == subreddit).scalar()
+    if subreddit_id is None:
+        raise HTTPException(status_code=404, detail="Subreddit not found")
+    _require_user(db, payload.user_id)
+
+    removed = db.execute(
+        delete(Subscription).where(Subscription.user_id == payload.user_id, Subscription.subreddit_id == subreddit_id)
+    ).rowcount
+    if removed:
+        update_type, delta = "delete", -1
+        home_feed.remove(db, payload.user_id, subreddit_id=subreddit_id)
+    else:
+        update_type, delta = "insert", 1
+        db.execute(insert(Subscription).values(user_id=payload.user_id, subreddit_id=subreddit_id))
+    subscriber_count = db.execute(
+        update(Subreddit)
+        .where(Subreddit.id == subreddit_id)
+        .values(subscriber_count=Subreddit.subscriber_count + delta)
+        .returning(Subreddit.subscriber_count)
+    ).scalar()
+    # Posts of communities too big to fan out to are merged in when the feed is read
+    if not removed and subscriber_count <= settings.feed_fanout_max_subscribers:
+        home_feed.backfill(db, payload.user_id, subreddit_id=subreddit_id)
+    record_change(
+        db, "subscriptions", update_type,
+        f"User {payload.user_id} {'unsubscribed from' if removed else 'subscribed to'} r/{subreddit}",
+        {"user_id": payload.user_id, "subreddit_id": subreddit_id, "subscriber_count": subscriber_count},
+    )
+
+    return {"status": "unsubscribed" if removed else "subscribed", "subscriber_count": subscriber_count}
+
+
+@router.post("/users/{user_id}/follow")
+@writes
+def toggle_follow(user_id: str, payload: FollowPayload, db: Session):
+    """Follow a user, or unfollow when already following"""
+    if payload.follower_id == user_id:
+        raise HTTPException(status_code=400, detail="Users cannot follow themselves")
+    _require_user(db, user_id)
+    _require_user(db, payload.follower_id)
+
+    removed = db.execute(
+        delete(Follow).where(Follow.follower_id == payload.follower_id, Follow.followee_id == user_id)
+    ).rowcount
+    if removed:
+        home_feed.remove(db, payload.follower_id, author_id=user_id)
+    else:
+        db.execute(insert(Follow).values(follower_id=payload.follower_id, followee_id=user_id))
+        home_feed.backfill(db, payload.follower_id, author_id=user_id)
+    record_change(
+        db, "follows", "delete" if removed else "insert",
+        f"User {payload.follower_id} {'unfollowed' if removed else 'followed'} User {user_id}",
+        {"follower_id": payload.follower_id, "followee_id": user_id},
+    )
+    if not removed:
+        after_commit(db, notifications.user_followed, payload.follower_id, user_id)
+
+    return {"status": "unfollowed" if removed else "followed"}
+
+
+@router.get("/feed", response_model=List[PostListItem])
+def get_feed(
+    user_id: str = Query(...),
+    limit: int = Query(25, ge=1, le=100),
+    cursor: Optional[str] = Query(None),
+    db: Session = Depends(database.get_db),
+):
+    """Newest posts from a user's subscriptions and follows; the next page's cursor is in X-Next-Cursor"""
+    before = decode_cursor(cursor, before=int)["before"] if cursor is not None else None
+    post_ids, next_before = home_feed.page(db, user_id, before, limit)
+
+    cards = {row.id: post_card(row) for row in query_post_cards(db).filter(Post.id.in_(post_ids))} if post_ids else {}
+    next_cursor = encode_cursor(before=next_before) if next_before is not None else None
+    return paged_response([cards[post_id] for post_id in post_ids if post_id in cards], next_cursor)
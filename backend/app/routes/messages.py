@@ -1,16 +1,21 @@
 # routes/messages.py
 
 from fastapi import APIRouter, Depends, HTTPException, status, Query
+from fastapi.responses import ORJSONResponse
 from sqlalchemy.orm import Session
 
 from app.db.models import User
 from ..db.db import db as database
 from ..db.models import Message, User  # include User if not already
+from ..db.writer import writes
 from app.models import MessageCreate, MessageResponse, MessageRead
 # from .database import SessionLocal
 
 router = APIRouter() 
 
+# Columns of MessageRead, selected as row tuples for the list endpoints
+MESSAGE_COLUMNS = (Message.id, Message.sender_id, Message.receiver_id, Message.content, Message.timestamp)
+
 # Use the shared get_db function
 
 # Correct: Use the get_db from your shared database module
@@ -29,14 +34,16 @@ def get_messages_between_users(
     user2: str = Query(...),
     db: Session = Depends(get_db)
 ):
-    return db.query(Message).filter(
+    rows = db.query(*MESSAGE_COLUMNS).filter(
         ((Message.sender_id == user1) & (Message.receiver_id == user2)) |
         ((Message.sender_id == user2) & (Message.receiver_id == user1))
     ).order_by(Message.timestamp.asc()).all()
+    return ORJSONResponse([row._asdict() for row in rows])
 
 
 @router.post("/messages", response_model=MessageResponse)
-def send_message(message: MessageCreate, db: Session = Depends(get_db)):
+@writes
+def send_message(message: MessageCreate, db: Session):
     print("Received message:", message)
 
     new_message = Message(
@@ -46,7 +53,7 @@ def send_message(message: MessageCreate, db: Session = Depends(get_db)):
     )
 
     db.add(new_message)
-    db.commit()
+    db.flush()
     db.refresh(new_message) 
     
     print("Saved message:", new_message)
@@ -54,32 +61,35 @@ def send_message(message: MessageCreate, db: Session = Depends(get_db)):
     return new_message
 
 
-@router.get("/messages/{user_id}", response_model=list[MessageRead])
-def get_messages(user_id: str, current_user: User = Depends(get_current_user), db: Session = Depends(database.get_db)):
-    return db.query(Message).filter(
-        ((Message.sender_id == current_user.id) & (Message.receiver_id == user_id)) |
-        ((Message.sender_id == user_id) & (Message.receiver_id == current_user.id))
-    ).order_by(Message.timestamp.asc()).all()
-
-@router.get("/users/id-from-username/")
-def get_user_id_by_username(username: str, db: Session = Depends(get_db)):
-    user = db.query(User).filter(User.username == username).first()
-    if not user: 
-        raise HTTPException(status_code=404, detail="User not found")
-    return {"id": user.id} 
- 
+# Static paths must be registered before /messages/{user_id}, which would capture them
 @router.get("/messages/thread", response_model=list[MessageRead])
 def get_messages_between_users(
     user1: str = Query(...),
     user2: str = Query(...),
     db: Session = Depends(get_db)
 ): 
-    return db.query(Message).filter(
+    rows = db.query(*MESSAGE_COLUMNS).filter(
         ((Message.sender_id == user1) & (Message.receiver_id == user2)) |
         ((Message.sender_id == user2) & (Message.receiver_id == user1))
     ).order_by(Message.timestamp.asc()).all()
+    return ORJSONResponse([row._asdict() for row in rows])
     
-@router.get("/messages/all")
+@router.get("/messages/all", response_model=list[MessageRead])
 def get_all_messages(db: Session = Depends(get_db)):
-    messages = db.query(Message).all()
-    return messages
\ No newline at end of file
+    rows = db.query(*MESSAGE_COLUMNS).order_by(Message.timestamp.asc()).all()
+    return ORJSONResponse([row._asdict() for row in rows])
+
+@router.get("/messages/{user_id}", response_model=list[MessageRead])
+def get_messages(user_id: str, current_user: User = Depends(get_current_user), db: Session = Depends(database.get_db)):
+    rows = db.query(*MESSAGE_COLUMNS).filter(
+        ((Message.sender_id == current_user.id) & (Message.receiver_id == user_id)) |
+        ((Message.sender_id == user_id) & (Message.receiver_id == current_user.id))
+    ).order_by(Message.timestamp.asc()).all()
+    return ORJSONResponse([row._asdict() for row in rows])
+
+@router.get("/users/id-from-username/")
+def get_user_id_by_username(username: str, db: Session = Depends(get_db)):
+    user = db.query(User).filter(User.username == username).first()
+    if not user: 
+        raise HTTPException(status_code=404, detail="User not found")
+    return {"id": user.id}
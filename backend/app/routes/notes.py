@@ -3,10 +3,10 @@ from typing import List, Optional
 from sqlalchemy.orm import Session # type: ignore
 from ..db.synthetic_models import ActionType
 from ..db.db import db
+from ..db.writer import writes
 from ..db.models import User, Note, SavedComment, SavedPost
 from ..models import UserIn, NoteIn
 from ..utils.logger import logger
-from ..utils.session_manager import session_manager 
 from pydantic import BaseModel
 
 router = APIRouter()
@@ -27,12 +27,10 @@ def get_current_user(request: Request):
     return user
 
 @router.post("/register")
-def register(user_in: UserIn, request: Request):
-    session_id = request.query_params.get("session_id", "no_session")
-    db_session = next(db.get_db())
-
+@writes
+def register(user_in: UserIn, request: Request, db: Session):
     # Check if username already exists
-    existing_user = db_session.query(User).filter(User.username == user_in.username).first()
+    existing_user = db.query(User).filter(User.username == user_in.username).first()
     if existing_user:
         raise HTTPException(status_code=400, detail="Username already exists")
     
@@ -41,25 +39,9 @@ def register(user_in: UserIn, request: Request):
         username=user_in.username,
         password=user_in.password  # In production, hash this password
     )
-    db_session.add(new_user)
-    db_session.commit()
-    db_session.refresh(new_user)
-    logger.log_action(
-        session_id, 
-        ActionType.DB_UPDATE, 
-        {
-            "table_name": "users", 
-            "update_type": "insert", 
-            "text": f"User {new_user.username} created in database with id {new_user.id}, username {new_user.username}, password {new_user.password}",
-            "values": {
-                "id": new_user.id,
-                "username": new_user.username,
-                "password": new_user.password,
-                "created_at": new_user.created_at.isoformat() if new_user.created_at else None,
-                "updated_at": new_user.updated_at.isoformat() if new_user.updated_at else None
-            }
-        }
-    )
+    db.add(new_user)
+    db.flush()
+    db.refresh(new_user)
 
     return {"userId": new_user.id, "username": new_user.username}
 
@@ -90,36 +72,17 @@ def login(user_in: UserIn, request: Request):
     return {"userId": user.id}
 
 @router.post("/notes", response_model=dict)
-def create_note(note_in: NoteIn, request: Request, user: User = Depends(get_current_user)):
-    session_id = session_manager.get_session()
-    db_session = next(db.get_db())
-
+@writes
+def create_note(note_in: NoteIn, request: Request, db: Session, user: User = Depends(get_current_user)):
     new_note = Note(
         title=note_in.title,
         content=note_in.content,
         user_id=user.id
     )
-    db_session.add(new_note)
-    db_session.commit()
-    db_session.refresh(new_note)
+    db.add(new_note)
+    db.flush()
+    db.refresh(new_note)
 
-    logger.log_action(
-        session_id, 
-        ActionType.DB_UPDATE, 
-        {
-            "table_name": "notes", 
-            "update_type": "insert", 
-            "text": f"Note {new_note.title} created in database with id {new_note.id}, title {new_note.title}, content {new_note.content}",
-            "values": {
-                "id": new_note.id,
-                "title": new_note.title,
-                "content": new_note.content,
-                "created_at": new_note.created_at.isoformat() if new_note.created_at else None,
-                "updated_at": new_note.updated_at.isoformat() if new_note.updated_at else None
-            }
-        }
-    )
-    
     return {
         "id": new_note.id,
         "title": new_note.title,
@@ -143,59 +106,27 @@ def get_note(note_id: int):
     return {"id": note.id, "title": note.title, "content": note.content}
 
 @router.put("/notes/{note_id}", response_model=dict)
-def update_note(note_id: int, note_in: NoteIn, request: Request, user: User = Depends(get_current_user)):
-    session_id = session_manager.get_session()
-    db_session = next(db.get_db())
-
-    note = db_session.query(Note).filter(Note.id == note_id).first()
+@writes
+def update_note(note_id: int, note_in: NoteIn, request: Request, db: Session, user: User = Depends(get_current_user)):
+    note = db.query(Note).filter(Note.id == note_id).first()
     if not note:
         raise HTTPException(status_code=404, detail="Note not found")
     
     note.title = note_in.title
     note.content = note_in.content
-    db_session.commit()
-    db_session.refresh(note)
+    db.flush()
+    db.refresh(note)
 
-    logger.log_action(
-        session_id,
-        ActionType.DB_UPDATE,
-        {
-            "table_name": "notes",
-            "update_type": "update",
-            "text": f"Note {note.title} updated in database with id {note.id}, title {note.title}, content {note.content}",
-            "values": {
-                "id": note.id,
-                "title": note.title,
-                "content": note.content,
-                "created_at": note.created_at.isoformat() if note.created_at else None,
-                "updated_at": note.updated_at.isoformat() if note.updated_at else None
-            }
-        }
-    )
 
 @router.delete("/notes/{note_id}")
-def delete_note(note_id: int, request: Request, user: User = Depends(get_current_user)):
-    session_id = session_manager.get_session()
-    db_session = next(db.get_db())
-    
-    note = db_session.query(Note).filter(Note.id == note_id).first()
+@writes
+def delete_note(note_id: int, request: Request, db: Session, user: User = Depends(get_current_user)):
+    note = db.query(Note).filter(Note.id == note_id).first()
     if not note:
         raise HTTPException(status_code=404, detail="Note not found")
     
-    db_session.delete(note)
-    db_session.commit()
+    db.delete(note)
 
-    logger.log_action(
-        session_id,
-        ActionType.DB_UPDATE,
-        {
-            "table_name": "notes",
-            "update_type": "delete",
-            "text": f"Note {note.title} deleted from database with id {note.id}",
-            "values": {"noteId": note_id}
-        }
-    )
-    
     return {"status": "deleted"}
 
 
@@ -204,89 +135,29 @@ class SavePayload(BaseModel):
     user_id: str  # or UUID if you're using UUIDs
 
 @router.post("/save_post/{post_id}")
-def save_post(post_id: int, request: Request, payload: SavePayload, db: Session = Depends(db.get_db)):
-    session_id = request.headers.get("x-session-id", "no_session")
+@writes
+def save_post(post_id: int, request: Request, payload: SavePayload, db: Session):
     exists = db.query(SavedPost).filter_by(user_id=payload.user_id, post_id=post_id).first()
 
     if exists:
         db.delete(exists)
-        db.commit()
-
-        logger.log_action(
-            session_id,
-            ActionType.DB_UPDATE, 
-            {
-                "table_name": "saved_posts",
-                "update_type": "delete",
-                "text": f"User {payload.user_id} unsaved Post {post_id}",
-                "values": {
-                    "user_id": payload.user_id,
-                    "post_id": post_id
-                }
-            }
-        )
 
         return {"status": "unsaved"}
 
     db.add(SavedPost(user_id=payload.user_id, post_id=post_id))
-    db.commit()
-
-    logger.log_action(
-        session_id,
-        ActionType.DB_UPDATE,
-        {
-            "table_name": "saved_posts",
-            "update_type": "insert",
-            "text": f"User {payload.user_id} saved Post {post_id}",
-            "values": {
-                "user_id": payload.user_id,
-                "post_id": post_id
-            }
-        }
-    )
 
     return {"status": "saved"}
 
 @router.post("/save_comment/{comment_id}")
-def save_comment(comment_id: int, request: Request, payload: SavePayload, db: Session = Depends(db.get_db)):
-    session_id = request.headers.get("x-session-id", "no_session")
+@writes
+def save_comment(comment_id: int, request: Request, payload: SavePayload, db: Session):
 
     exists = db.query(SavedComment).filter_by(user_id=payload.user_id, comment_id=comment_id).first()
     if exists:
         db.delete(exists)
-        db.commit() 
- 
-        logger.log_action(  
-            session_id,
-            ActionType.DB_UPDATE,
-            {
-                "table_name": "saved_comments",
-                "update_type": "delete",
-                "text": f"User {payload.user_id} unsaved Comment {comment_id}",
-                "values": {
-                    "user_id": payload.user_id,
-                    "comment_id": comment_id
-                }
-            }
-        )
 
         return {"status": "unsaved"}
 
     db.add(SavedComment(user_id=payload.user_id, comment_id=comment_id))
-    db.commit()
-
-    logger.log_action(
-        session_id,
-        ActionType.DB_UPDATE,
-        {
-            "table_name": "saved_comments",
-            "update_type": "insert",
-            "text": f"User {payload.user_id} saved Comment {comment_id}",
-            "values": {
-                "user_id": payload.user_id,
-                "comment_id": comment_id
-            }
-        }
-    )
 
     return {"status": "saved"}
\ No newline at end of file
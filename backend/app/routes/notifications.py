@@ -0,0 +1,75 @@
+# app/routes/notifications.py
+
+from datetime import datetime
+from typing import List, Optional
+
+from fastapi import APIRouter, Depends, Query  # type: ignore
+from sqlalchemy import func, select, update  # type: ignore
+from sqlalchemy.orm import Session  # type: ignore
+
+from ..db.audit import record_change
+from ..db.db import db as database
+from ..db.models import Notification, User
+from ..db.writer import writes
+from ..models import NotificationItem, NotificationsRead
+from ..utils.cursors import decode_cursor, encode_cursor, paged_response
+
+router = APIRouter(tags=["Notifications"])
+
+
+@router.get("/notifications", response_model=List[NotificationItem])
+def get_notifications(
+    user_id: str = Query(...),
+    limit: int = Query(25, ge=1, le=100),
+    cursor: Optional[str] = Query(None),
+    db: Session = Depends(database.get_db),
+):
+    """A user's inbox, newest first; the next page's cursor is in X-Next-Cursor"""
+    query = select(
+        Notification.id, Notification.type, Notification.actor_id, User.username,
+        Notification.post_id, Notification.comment_id, Notification.created_at, Notification.read_at,
+    ).outerjoin(User, Notification.actor_id == User.id).where(Notification.user_id == user_id)
+    if cursor is not None:
+        query = query.where(Notification.id < decode_cursor(cursor, before=int)["before"])
+    # One extra row tells whether another page follows
+    rows = db.execute(query.order_by(Notification.id.desc()).limit(limit + 1)).all()
+
+    next_cursor = encode_cursor(before=rows[limit - 1].id) if len(rows) > limit else None
+    return paged_response([
+        {
+            "id": row.id,
+            "type": row.type,
+            "actor": {"id": row.actor_id, "username": row.username},
+            "post_id": row.post_id,
+            "comment_id": row.comment_id,
+            "created_at": row.created_at,
+            "read": row.read_at is not None,
+        }
+        for row in rows[:limit]
+    ], next_cursor)
+
+
+@router.get("/notifications/unread_count")
+def unread_count(user_id: str = Query(...), db: Session = Depends(database.get_db)):
+    """Counted off the partial ix_notifications_unread index"""
+    count = db.execute(
+        select(func.count()).where(Notification.user_id == user_id, Notification.read_at.is_(None))
+    ).scalar()
+    return {"unread": count}
+
+
+@router.post("/notifications/read")
+@writes
+def mark_read(payload: NotificationsRead, db: Session):
+    statement = update(Notification).where(Notification.user_id == payload.user_id, Notification.read_at.is_(None))
+    if payload.ids is not None:
+        statement = statement.where(Notification.id.in_(payload.ids))
+    updated = db.execute(statement.values(read_at=datetime.utcnow())).rowcount
+    if updated:
+        record_change(
+            db, "notifications", "update",
+            f"User {payload.user_id} marked {updated} notification(s) as read",
+            {"user_id": payload.user_id, "ids": payload.ids},
+        )
+
+    return {"updated": updated}
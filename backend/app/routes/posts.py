@@ -1,116 +1,156 @@
-from app.models import PostCreate, PostUpdate
-from fastapi import APIRouter, Depends, HTTPException, Path, status, Request  # type: ignore
+from datetime import datetime
+from typing import List, Optional
+from app.models import PostCreate, PostUpdate, PostListItem, PostDetail
+from fastapi import APIRouter, Depends, HTTPException, Path, status  # type: ignore
+from fastapi.responses import ORJSONResponse  # type: ignore
 from faker import Faker  # type: ignore
 
+from sqlalchemy import delete, select, update  # type: ignore
+from sqlalchemy.dialects.sqlite import insert  # type: ignore
 from sqlalchemy.orm import Session  # type: ignore
 from pydantic import BaseModel  # type: ignore
+from ..db.audit import record_change
 from ..db.db import db as database
-from ..db.models import Post, User
-from ..utils.logger import logger
-from ..db.synthetic_models import ActionType
+from ..db.models import FeedEntry, Post, Subreddit, User
+from ..db.writer import writer, writes
+from ..utils.cursors import decode_cursor, encode_cursor, paged_response
+from ..utils import home_feed
 
 from fastapi import Query  # type: ignore
 
 router = APIRouter()
 fake = Faker()
 
-@router.get("/posts")
+# Columns needed to render a post card; selected as plain rows instead of ORM objects
+POST_CARD_COLUMNS = (
+    Post.id, Post.title, Post.content, Post.votes, Post.subreddit,
+    Post.author_id, User.username.label("author_username"),
+    Post.comment_count, Post.last_activity_at,
+)
+
+# ORDER BY for each ?sort= (ties keep ascending id); active and comments are served by indexes
+POST_SORTS = {
+    "top": (Post.votes.desc(), Post.id),
+    "new": (Post.id.desc(),),  # assuming higher id = newer
+    "active": (Post.last_activity_at.desc(), Post.id.desc()),
+    "comments": (Post.comment_count.desc(), Post.id.desc()),
+    # "hot" or default: can be based on votes or mixed logic
+    "hot": ((Post.votes + Post.id).desc(), Post.id),
+}
+
+def post_card(row) -> dict:
+    return {
+        "id": row.id,
+        "title": row.title,
+        "content": row.content,
+        "votes": row.votes,
+        "author": {"id": row.author_id, "username": row.author_username},
+        "subreddit": row.subreddit,
+        "comment_count": row.comment_count,
+        "last_activity_at": row.last_activity_at,
+    }
+
+def query_post_cards(db: Session):
+    return db.query(*POST_CARD_COLUMNS).outerjoin(User, Post.author_id == User.id)
+
+def list_post_cards(db: Session, sort: str, limit: Optional[int] = None, cursor: Optional[str] = None, subreddit_id: int = None):
+    """Post cards sorted in SQL, optionally one page at a time; returns (cards, cursor of the next page)"""
+    offset = 0
+    if cursor is not None:
+        position = decode_cursor(cursor, offset=int, sort=str)
+        offset, sort = position["offset"], position["sort"]
+
+    query = query_post_cards(db)
+    if subreddit_id is not None:
+        query = query.filter(Post.subreddit_id == subreddit_id)
+    query = query.order_by(*POST_SORTS.get(sort, POST_SORTS["hot"]))
+    if limit is None:
+        return [post_card(row) for row in query.offset(offset).all()], None
+
+    # One extra row tells whether another page follows
+    rows = query.offset(offset).limit(limit + 1).all()
+    next_cursor = encode_cursor(offset=offset + limit, sort=sort) if len(rows) > limit else None
+    return [post_card(row) for row in rows[:limit]], next_cursor
+
+def get_or_create_subreddit(db: Session, name: str) -> int:
+    """Id of the community called `name`, created on first use"""
+    created_id = db.execute(
+        insert(Subreddit)
+        .values(name=name, created_at=datetime.utcnow())
+        .on_conflict_do_nothing(index_elements=["name"])
+        .returning(Subreddit.id)
+    ).scalar()
+    if created_id is None:
+        return db.execute(select(Subreddit.id).where(Subreddit.name == name)).scalar()
+    record_change(db, "subreddits", "insert", f"Created r/{name} with id {created_id}", {"id": created_id, "name": name})
+    return created_id
+
+def add_fake_posts(db: Session):
+    Faker.seed(0)
+    for _ in range(15):
+        post = Post(
+            id=fake.unique.random_int(min=1, max=1000),
+            title=fake.sentence(nb_words=6),
+            content=fake.paragraph(nb_sentences=5),
+            votes=fake.random_int(min=-5, max=100),
+            author=fake.user_name(),
+            subreddit=fake.random_element(elements=("general", "memes", "news", "tech")),
+        )
+        db.add(post)
+
+@router.get("/posts", response_model=List[PostListItem])
 def get_fake_posts(
     sort: str = Query("hot"),  # default to 'hot'
+    limit: Optional[int] = Query(None, ge=1, le=500),
+    cursor: Optional[str] = Query(None),
     db: Session = Depends(database.get_db)
     ):
-    """Fetches posts from the database, sorts them based on the specified criteria, and returns a list of posts.
+    """Fetches posts from the database sorted by hot, top, new, active or comments, and returns a list of posts.
+    With `limit`, one page is returned and the next page's cursor is in X-Next-Cursor.
     If no posts exist, it generates fake posts using Faker and returns them sorted. """
-    posts = db.query(Post).all()
-
-    if not posts:
-        Faker.seed(0)
-        for _ in range(15):
-            post = Post(
-                id=fake.unique.random_int(min=1, max=1000),
-                title=fake.sentence(nb_words=6),
-                content=fake.paragraph(nb_sentences=5),
-                votes=fake.random_int(min=-5, max=100),
-                author=fake.user_name(),
-                subreddit=fake.random_element(elements=("general", "memes", "news", "tech")),
-            )
-            db.add(post)
-        db.commit()
-        posts = db.query(Post).all()
-
-    if sort == "top":
-        posts.sort(key=lambda p: p.votes, reverse=True)
-    elif sort == "new":
-        posts.sort(key=lambda p: p.id, reverse=True)  # assuming higher id = newer
-    else:
-        # Fallback to "hot" or default: can be based on votes or mixed logic
-        posts.sort(key=lambda p: (p.votes + p.id), reverse=True)
-
-    return [
-        {
-            "id": post.id,
-            "title": post.title,
-            "content": post.content,
-            "votes": post.votes,
-            "author": post.author,
-            "subreddit": post.subreddit,
-        }
-        for post in posts
-    ]  
-
-@router.get("/posts/{postId}")
+    posts, next_cursor = list_post_cards(db, sort, limit, cursor)
+
+    if not posts and cursor is None:
+        writer.run(add_fake_posts)
+        posts, next_cursor = list_post_cards(db, sort, limit, cursor)
+
+    return paged_response(posts, next_cursor)
+
+@router.get("/posts/{postId}", response_model=PostDetail)
 def get_post(postId: int = Path(...), db: Session = Depends(database.get_db)):
-    post = db.query(Post).filter(Post.id == postId).first()
+    post = query_post_cards(db).filter(Post.id == postId).first()
       
     if not post:
         raise HTTPException(status_code=404, detail="Post not found")
   
-    return {
-        "id": post.id,
-        "title": post.title,
-        "content": post.content,
-        "votes": post.votes,
-        "author": post.author,
-        "subreddit": post.subreddit,
-        "userID": post.author_id,
-    }
+    return ORJSONResponse({**post_card(post), "userID": post.author_id})
     
 
 @router.post("/posts/create")
-def create_post(post: PostCreate, request: Request, db: Session = Depends(database.get_db)):
-    session_id = request.headers.get("x-session-id", "no_session")
-
+@writes
+def create_post(post: PostCreate, db: Session):
     user = db.query(User).filter(User.id == post.user_id).first()
     if not user:
         raise HTTPException(status_code=404, detail="User not found")
 
+    subreddit_id = get_or_create_subreddit(db, post.subreddit)
     new_post = Post(
         title=post.title,
         content=post.content,
         subreddit=post.subreddit,
+        subreddit_id=subreddit_id,
         author_id=user.id,
     )
     db.add(new_post)
-    db.commit()
-    db.refresh(new_post)
- 
-    logger.log_action(
-        session_id,
-        ActionType.DB_UPDATE,
-        {
-            "table_name": "posts",
-            "update_type": "insert",
-            "text": f"User {user.username} created a post with id {new_post.id}",
-            "values": {
-                "id": new_post.id,
-                "title": new_post.title,
-                "content": new_post.content,
-                "subreddit": new_post.subreddit,
-                "votes": new_post.votes,
-                "author_id": new_post.author_id,
-            }
-        }
+    db.execute(
+        update(Subreddit)
+        .where(Subreddit.id == subreddit_id)
+        .values(post_count=Subreddit.post_count + 1, last_activity_at=datetime.utcnow())
     )
+    db.flush()
+    # Followers and subscribers see the post in their home feed as soon as it is committed
+    home_feed.fan_out(db, new_post.id, user.id, subreddit_id)
+    db.refresh(new_post)
 
     return {
         "id": new_post.id,
@@ -122,76 +162,44 @@ def create_post(post: PostCreate, request: Request, db: Session = Depends(databa
     }
 
 @router.delete("/posts/{post_id}", status_code=status.HTTP_204_NO_CONTENT)
-def delete_post(post_id: int, request: Request, db: Session = Depends(database.get_db)):
-    session_id = request.headers.get("x-session-id", "no_session")
-
+@writes
+def delete_post(post_id: int, db: Session):
     post = db.query(Post).filter(Post.id == post_id).first()
     if not post:
         raise HTTPException(status_code=404, detail="Post not found")
 
+    if post.subreddit_id is not None:
+        db.execute(
+            update(Subreddit).where(Subreddit.id == post.subreddit_id).values(post_count=Subreddit.post_count - 1)
+        )
+    db.execute(delete(FeedEntry).where(FeedEntry.post_id == post_id))
     db.delete(post)
-    db.commit()
-
-    logger.log_action(
-        session_id,
-        ActionType.DB_UPDATE,
-        {
-            "table_name": "posts",
-            "update_type": "delete",
-            "text": f"Post with id {post_id} was deleted",
-            "values": {
-                "post_id": post_id
-            }
-        }
-    )
 
     return {"message": "Post deleted successfully"}
 
 @router.put("/posts/{post_id}")
+@writes
 def update_post(
     post_id: int,
     post_update: PostUpdate,
-    request: Request,
-    db: Session = Depends(database.get_db)
+    db: Session
 ):
-    session_id = request.headers.get("x-session-id", "no_session")
-
     post = db.query(Post).filter(Post.id == post_id).first()
     if not post:
         raise HTTPException(status_code=404, detail="Post not found")
 
-    old_title = post.title
-    old_content = post.content
-
     post.title = post_update.title
     post.content = post_update.content
-    db.commit()
+    db.flush()
     db.refresh(post)
 
-    logger.log_action(
-        session_id,
-        ActionType.DB_UPDATE,
-        {
-            "table_name": "posts",
-            "update_type": "update",
-            "text": f"Post {post_id} was updated",
-            "values": {
-                "post_id": post_id,
-                "old_title": old_title,
-                "new_title": post.title,
-                "old_content": old_content,
-                "new_content": post.content
-            }
-        }
-    )
-
     return {
         "id": post.id,
         "title": post.title,
         "content": post.content,
         "subreddit": post.subreddit,
         "votes": post.votes,
-        "author": post.author,
+        "author": {"id": post.author_id, "username": post.author.username if post.author else None},
         "author_id": post.author_id
     } 
   
\ No newline at end of file
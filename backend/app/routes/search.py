@@ -1,16 +1,23 @@
 # app/routes/search.py
 
+from typing import List
 from fastapi import APIRouter, Depends, HTTPException # type: ignore
+from fastapi.responses import ORJSONResponse # type: ignore
 
 from sqlalchemy.orm import Session # type: ignore
 from pydantic import BaseModel # type: ignore
 from ..db.db import db as database
 from ..db.models import Post, Vote, User  # Import your models
+from ..models import PostSummary
 
 router = APIRouter()
 
 # FastAPI route
-@router.get("/search")
+@router.get("/search", response_model=List[PostSummary])
 def search(q: str, db: Session = Depends(database.get_db)):
-    return db.query(Post).filter(Post.title.contains(q)).limit(10).all()
+    rows = db.query(Post.id, Post.title, Post.content, Post.votes, Post.subreddit, Post.author_id)\
+        .filter(Post.title.contains(q))\
+        .limit(10)\
+        .all()
+    return ORJSONResponse([row._asdict() for row in rows])
 
@@ -0,0 +1,57 @@
+# app/routes/subreddits.py
+
+from typing import List, Optional
+
+from fastapi import APIRouter, Depends, HTTPException, Query  # type: ignore
+from fastapi.responses import ORJSONResponse  # type: ignore
+from sqlalchemy.orm import Session  # type: ignore
+
+from ..db.db import db as database
+from ..db.models import Subreddit
+from ..models import PostListItem, SubredditSummary, TrendingSubreddit
+from ..utils.cursors import paged_response
+from ..utils.trending import trending
+from .posts import list_post_cards
+
+router = APIRouter(tags=["Subreddits"])
+
+
+@router.get("/subreddits", response_model=List[SubredditSummary])
+def list_subreddits(db: Session = Depends(database.get_db)):
+    """Every community with its stored counters, biggest first"""
+    rows = db.query(
+        Subreddit.id, Subreddit.name, Subreddit.post_count, Subreddit.subscriber_count, Subreddit.last_activity_at
+    )\
+        .order_by(Subreddit.post_count.desc(), Subreddit.name)\
+        .all()
+    return ORJSONResponse([
+        {
+            "id": row.id,
+            "name": row.name,
+            "post_count": row.post_count,
+            "subscriber_count": row.subscriber_count,
+            "last_activity_at": row.last_activity_at,
+        }
+        for row in rows
+    ])
+
+
+@router.get("/subreddits/trending", response_model=List[TrendingSubreddit])
+def trending_subreddits(limit: int = Query(5, ge=1, le=50)):
+    """Fast-growing communities, from the background trending job's last run"""
+    return ORJSONResponse(trending.get(limit))
+
+
+@router.get("/r/{subreddit}", response_model=List[PostListItem])
+def subreddit_feed(
+    subreddit: str,
+    sort: str = Query("hot"),
+    limit: int = Query(25, ge=1, le=100),
+    cursor: Optional[str] = Query(None),
+    db: Session = Depends(database.get_db),
+):
+    """One page of a community's posts; the next page's cursor is in X-Next-Cursor"""
+    subreddit_id = db.query(Subreddit.id).filter(Subreddit.name == subreddit).scalar()
+    if subreddit_id is None:
+        raise HTTPException(status_code=404, detail="Subreddit not found")
+    return paged_response(*list_post_cards(db, sort, limit, cursor, subreddit_id=subreddit_id))
@@ -1,21 +1,81 @@
-from fastapi import APIRouter, Request, Body, Query
+from fastapi import APIRouter, Request, Body, HTTPException, Query
 from fastapi.responses import JSONResponse
 import uuid
-from typing import Any, Dict
+from datetime import datetime, timezone
+from typing import Any, Dict, Optional
 
 from ..db.synthetic_models import ActionType
-from ..db.db import db
+from ..db.checkpoints import checkpoints
+from ..db.state import state_tracker, tracked_tables
+from ..utils.cursors import decode_cursor, encode_cursor, paged_response
 from ..utils.logger import logger
 from ..utils.session_manager import session_manager
+from ..utils.log_retention import log_retention
+from ..utils.vote_buffer import vote_buffer
+from ..utils.notifications import notifications
+from ..utils.session_pool import session_pool
 
 router = APIRouter()
 
 
+def log_session_seed(session_id: str, seed: str, custom_action: str):
+    """Record the seed a session started from, so its trajectory can be replayed"""
+    logger.log_action(
+        session_id,
+        ActionType.CUSTOM,
+        {
+            "custom_action": custom_action,
+            "text": f"Environment for session {session_id} seeded with {seed}",
+            "data": {"seed": seed},
+        }
+    )
+
+
+def log_session_checkpoint(session_id: str, checkpoint_id: str, custom_action: str):
+    """Record the checkpoint a session continued from"""
+    logger.log_action(
+        session_id,
+        ActionType.CUSTOM,
+        {
+            "custom_action": custom_action,
+            "text": f"Environment for session {session_id} restored from checkpoint {checkpoint_id}",
+            "data": {"checkpoint_id": checkpoint_id},
+        }
+    )
+
+
+def flush_pending():
+    """Write out state still held in memory (buffered votes, queued notifications and logs)"""
+    if vote_buffer.enabled:
+        vote_buffer.flush()
+    notifications.flush()
+    logger.flush()
+
+
+def seed_environment(seed: Optional[str]):
+    """Load a pre-seeded environment from the pool, or seed one from scratch"""
+    if not session_pool.claim(seed):
+        session_pool.load_fresh(seed)
+
+
+def session_response(session_id: str) -> JSONResponse:
+    resp = JSONResponse({"session_id": session_id})
+    resp.set_cookie(
+        key="session_id",
+        value=session_id,
+        httponly=False,        # allow JS‐side reading
+        samesite="Lax",
+        max_age=60 * 60 * 24   # 1 day
+    )
+    return resp
+
+
 @router.post("/reset")
 def reset_environment(session_id: str = Query(...), seed: str = Query(None)):
     """Reset the environment for a specific session"""
-    db.reset_database()
+    seed_environment(seed)
     session_manager.clear_session(session_id)  # ✅ Now passing session_id
+    log_session_seed(session_id, seed, "environment_reset")
     return {"status": "ok", "seed": seed, "session_id": session_id}
 
 @router.post("/new_session")
@@ -24,17 +84,63 @@ def new_session(seed: str = Query(None)):
     session_id = str(uuid.uuid4())
     session_manager.create_session(session_id)
     # 2) Clear logs & reset state
-    db.reset_database(seed)
+    seed_environment(seed)
+    log_session_seed(session_id, seed, "session_start")
     # 3) Return + set cookie
-    resp = JSONResponse({"session_id": session_id})
-    resp.set_cookie(
-        key="session_id",
-        value=session_id,
-        httponly=False,        # allow JS‐side reading
-        samesite="Lax",
-        max_age=60 * 60 * 24   # 1 day
-    )
-    return resp
+    return session_response(session_id)
+
+@router.get("/pool")
+def get_pool():
+    """Claims served from the pre-seeded pool (hits) or seeded on the spot (misses), and what is ready"""
+    return session_pool.stats()
+
+# --- CHECKPOINTS ---
+
+@router.post("/checkpoint")
+def create_checkpoint(session_id: str = Query(None)):
+    """Capture the current environment state; restore or fork from the returned id"""
+    flush_pending()
+    return checkpoints.create(session_id)
+
+@router.post("/restore")
+def restore_checkpoint(checkpoint_id: str = Query(...), session_id: str = Query(...), erase_logs: bool = Query(False)):
+    """Put the environment back in a checkpoint's state and continue the session from there.
+
+    Logs written since the checkpoint are kept unless `erase_logs` is set.
+    """
+    if not erase_logs:
+        # Queued logs land before the copy, so they are kept too
+        flush_pending()
+    try:
+        info = checkpoints.restore(checkpoint_id, keep_logs=not erase_logs)
+    except KeyError:
+        raise HTTPException(status_code=404, detail="Checkpoint not found")
+    log_session_checkpoint(session_id, checkpoint_id, "environment_restore")
+    return {"status": "ok", "session_id": session_id, **info}
+
+@router.post("/fork")
+def fork_checkpoint(checkpoint_id: str = Query(...), erase_logs: bool = Query(False)):
+    """Start a new session from a checkpoint's state; logs are kept as on restore"""
+    if not erase_logs:
+        flush_pending()
+    try:
+        checkpoints.restore(checkpoint_id, keep_logs=not erase_logs)
+    except KeyError:
+        raise HTTPException(status_code=404, detail="Checkpoint not found")
+    session_id = str(uuid.uuid4())
+    session_manager.create_session(session_id)
+    log_session_checkpoint(session_id, checkpoint_id, "session_fork")
+    return session_response(session_id)
+
+@router.get("/checkpoints")
+def list_checkpoints():
+    return checkpoints.list()
+
+@router.delete("/checkpoints/{checkpoint_id}")
+def delete_checkpoint(checkpoint_id: str):
+    if not checkpoints.delete(checkpoint_id):
+        raise HTTPException(status_code=404, detail="Checkpoint not found")
+    return {"status": "deleted", "checkpoint_id": checkpoint_id}
 
 @router.post("/log_event")
 def log_event(request: Request, content: Dict[str, Any] = Body(...)):
@@ -59,6 +165,85 @@ def log_event(request: Request, content: Dict[str, Any] = Body(...)):
     logger.log_action(session_id, action_type, action_payload)
     return {"status": "logged"}
 
+
+# --- STATE ---
+
+@router.get("/state")
+def get_state():
+    """Per-table row counts and row-hash digests, with a root digest over every table"""
+    flush_pending()
+    return state_tracker.state()
+
+@router.get("/diff")
+def get_diff(table: Optional[str] = Query(None, description="Only this table")):
+    """Rows inserted, updated and deleted since the environment was seeded"""
+    if table is not None and table not in {t.name for t in tracked_tables()}:
+        raise HTTPException(status_code=404, detail="Unknown table")
+    flush_pending()
+    return state_tracker.diff(table)
+
+
+def _status_range(status: Optional[str]):
+    """"404" -> (404, 404), "4xx" -> (400, 499)"""
+    if status is None:
+        return None
+    if status.endswith("xx"):
+        return int(status[0]) * 100, int(status[0]) * 100 + 99
+    return int(status), int(status)
+
+
+def _utc(moment: Optional[datetime]) -> Optional[datetime]:
+    """Log timestamps are stored as naive UTC"""
+    if moment is None or moment.tzinfo is None:
+        return moment
+    return moment.astimezone(timezone.utc).replace(tzinfo=None)
+
+
 @router.get("/logs")
-def get_logs(session_id: str = None):
-    return logger.get_logs(session_id)
+def get_logs(
+    session_id: str = None,
+    action_type: Optional[ActionType] = None,
+    method: Optional[str] = None,
+    path: Optional[str] = Query(None, description="Exact request path, e.g. /vote"),
+    path_prefix: Optional[str] = Query(None, description="Request path prefix, e.g. /posts/"),
+    status: Optional[str] = Query(None, pattern=r"^[1-5]([0-9]{2}|xx)$", description="404, or a class such as 4xx"),
+    table_name: Optional[str] = None,
+    update_type: Optional[str] = None,
+    since: Optional[datetime] = Query(None, description="Logs at or after this time (UTC)"),
+    until: Optional[datetime] = Query(None, description="Logs before this time (UTC)"),
+    limit: Optional[int] = Query(None, ge=1, le=10000),
+    cursor: Optional[str] = Query(None),
+):
+    """Filtered logs in id order; with `limit`, the next page's cursor is in X-Next-Cursor"""
+    # Buffered votes and queued notifications carry DB_UPDATE logs that should be visible right away
+    flush_pending()
+    logs = logger.get_logs(
+        session_id,
+        action_type=action_type,
+        method=method,
+        path=path,
+        path_prefix=path_prefix,
+        status_range=_status_range(status),
+        table_name=table_name,
+        update_type=update_type,
+        since=_utc(since),
+        until=_utc(until),
+        after=decode_cursor(cursor, after=int)["after"] if cursor is not None else None,
+        # One extra row tells whether another page follows
+        limit=limit + 1 if limit is not None else None,
+    )
+    next_cursor = None
+    if limit is not None and len(logs) > limit:
+        logs = logs[:limit]
+        next_cursor = encode_cursor(after=logs[-1]["id"])
+    return paged_response(logs, next_cursor)
+
+@router.delete("/logs")
+def clear_logs(session_id: str = None):
+    """Drop the logs of one session, or every log when no session_id is given"""
+    return {"status": "ok", "deleted": logger.clear_logs(session_id)}
+
+@router.post("/logs/retention")
+def run_log_retention():
+    """Run one retention pass (TTL expiry + vacuum) immediately"""
+    return log_retention.run_once()
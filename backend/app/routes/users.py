@@ -1,8 +1,10 @@
 from fastapi import APIRouter, Depends, HTTPException
+from fastapi.responses import ORJSONResponse
 from sqlalchemy.orm import Session
-from typing import Optional
+from typing import List, Optional
 from ..db.db import db as database
 from ..db.models import User, Post, Comment, SavedComment, SavedPost
+from ..models import PostSummary, CommentSummary
 
 router = APIRouter(prefix="/users", tags=["Users"])
 
@@ -58,27 +60,30 @@ def get_user_posts(user_id: str, db: Session = Depends(database.get_db)):
 
 @router.get("/{user_id}/comments", summary="Get all comments by user")
 def get_user_comments(user_id: str, db: Session = Depends(database.get_db)):
-    user = db.query(User).filter(User.id == user_id).first()
-    if not user:
+    if not db.query(User.id).filter(User.id == user_id).first():
         raise HTTPException(status_code=404, detail="User not found")
+
+    rows = db.query(Comment.id, Comment.content, Comment.post_id, Post.title.label("post_title"), Comment.created_at)\
+        .outerjoin(Post, Comment.post_id == Post.id)\
+        .filter(Comment.author_id == user_id)\
+        .order_by(Comment.id)\
+        .all()
+    return ORJSONResponse([row._asdict() for row in rows])
     
-    return [
-        {
-            "id": comment.id,
-            "content": comment.content,
-            "post_id": comment.post_id,
-            "post_title": comment.post.title if comment.post else None,
-            "created_at": comment.created_at.isoformat() if comment.created_at else None,
-        }
-        for comment in user.comments
-    ]
-    
-@router.get("/{user_id}/saved_posts")
+@router.get("/{user_id}/saved_posts", response_model=List[PostSummary])
 def get_saved_posts(user_id: str, db: Session = Depends(database.get_db)):
-    saved = db.query(SavedPost).filter_by(user_id=user_id).all()
-    return [s.post for s in saved] 
+    rows = db.query(Post.id, Post.title, Post.content, Post.votes, Post.subreddit, Post.author_id)\
+        .join(SavedPost, SavedPost.post_id == Post.id)\
+        .filter(SavedPost.user_id == user_id)\
+        .order_by(SavedPost.id)\
+        .all()
+    return ORJSONResponse([row._asdict() for row in rows])
 
-@router.get("/{user_id}/saved_comments")
+@router.get("/{user_id}/saved_comments", response_model=List[CommentSummary])
 def get_saved_comments(user_id: str, db: Session = Depends(database.get_db)):
-    saved = db.query(SavedComment).filter_by(user_id=user_id).all()
-    return [s.comment for s in saved]
+    rows = db.query(Comment.id, Comment.post_id, Comment.parent_id, Comment.content, Comment.created_at, Comment.author_id)\
+        .join(SavedComment, SavedComment.comment_id == Comment.id)\
+        .filter(SavedComment.user_id == user_id)\
+        .order_by(SavedComment.id)\
+        .all()
+    return ORJSONResponse([row._asdict() for row in rows])
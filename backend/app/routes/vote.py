@@ -1,14 +1,18 @@
 # app/routes/posts.py
 
-from fastapi import APIRouter, Depends, HTTPException, Request  # type: ignore
+import uuid
+
+from fastapi import APIRouter, HTTPException  # type: ignore
+from sqlalchemy import delete, select, update  # type: ignore
+from sqlalchemy.dialects.sqlite import insert  # type: ignore
 from sqlalchemy.orm import Session  # type: ignore
 from pydantic import BaseModel  # type: ignore
 
-from ..db.db import db as database
+from ..db.audit import audit_session_id
 from ..db.models import Post, Vote
-from ..utils.logger import logger
+from ..db.writer import writer
 from ..utils.session_manager import session_manager
-from ..db.synthetic_models import ActionType
+from ..utils.vote_buffer import vote_buffer, vote_log
 
 router = APIRouter()
 
@@ -17,86 +21,80 @@ class VoteRequest(BaseModel):
     user_id: str
     vote: str  # "up", "down", "neutral"
 
+
+def apply_vote(db: Session, post_id: int, user_id: str, new_value: int):
+    """Upsert the user's vote and return (update_type, delta) without reading the old row first.
+
+    update_type is "insert", "update", "delete" or None when nothing changed.
+    """
+    if new_value == 0:
+        removed = db.execute(
+            delete(Vote)
+            .where(Vote.post_id == post_id, Vote.user_id == user_id)
+            .returning(Vote.value)
+        ).scalar()
+        return ("delete", -removed) if removed is not None else (None, 0)
+
+    vote_id = str(uuid.uuid4())
+    statement = insert(Vote).values(id=vote_id, user_id=user_id, post_id=post_id, value=new_value)
+    statement = statement.on_conflict_do_update(
+        index_elements=[Vote.user_id, Vote.post_id],
+        set_={"value": statement.excluded.value},
+        where=Vote.value != statement.excluded.value,
+    ).returning(Vote.id)
+    written_id = db.execute(statement).scalar()
+
+    if written_id is None:
+        return None, 0
+    if written_id == vote_id:
+        return "insert", new_value
+    # Votes are +1/-1, so a changed vote always swings the score by twice its value
+    return "update", 2 * new_value
+
+
 @router.post("/vote")
-def vote_on_post(vote_data: VoteRequest, request: Request, db: Session = Depends(database.get_db)):
-    session_id = request.headers.get("x-session-id", "no_session")
+def vote_on_post(vote_data: VoteRequest):
+    # The same session as the request's other DB_UPDATE logs: header, query parameter or current session
+    session_id = audit_session_id.get()
+    new_value = {"up": 1, "down": -1}.get(vote_data.vote, 0)
 
-    post = db.query(Post).filter(Post.id == vote_data.post_id).first()
-    if not post:
-        raise HTTPException(status_code=404, detail="Post not found")
+    if vote_buffer.enabled:
+        buffered = vote_buffer.record("votes", vote_data.post_id, vote_data.user_id, new_value, session_id)
+        if buffered is None:
+            raise HTTPException(status_code=404, detail="Post not found")
+        update_type, projected_votes = buffered
+        if update_type is None and new_value != 0:
+            return {"message": "Vote unchanged", "new_votes": projected_votes}
+        return {"message": "Vote recorded", "new_votes": projected_votes}
+
+    # Buffered votes stay in memory; only unbuffered ones are a write unit
+    return writer.run(lambda db: write_vote(db, vote_data, new_value, session_id))
 
-    existing_vote = (
-        db.query(Vote)
-        .filter(Vote.post_id == vote_data.post_id, Vote.user_id == vote_data.user_id)
-        .first()
-    )
-
-    if vote_data.vote == "neutral":
-        if existing_vote:
-            db.delete(existing_vote)
-            post.votes -= existing_vote.value
-
-            logger.log_action(
-                session_id,
-                ActionType.DB_UPDATE,
-                {
-                    "table_name": "votes",
-                    "update_type": "delete",
-                    "text": f"User {vote_data.user_id} removed their vote on Post {vote_data.post_id}",
-                    "values": {
-                        "post_id": vote_data.post_id,
-                        "user_id": vote_data.user_id,
-                        "removed_value": existing_vote.value,
-                        "new_total_votes": post.votes
-                    }
-                }
-            )
 
+def write_vote(db: Session, vote_data: VoteRequest, new_value: int, session_id: str):
+    # Writes come first so the transaction takes SQLite's write lock up front instead of
+    # upgrading from a read lock, and the counter moves in SQL rather than in Python
+    update_type, delta = apply_vote(db, vote_data.post_id, vote_data.user_id, new_value)
+    if delta:
+        total_votes = db.execute(
+            update(Post)
+            .where(Post.id == vote_data.post_id)
+            .values(votes=Post.votes + delta)
+            .returning(Post.votes)
+        ).scalar()
     else:
-        new_value = 1 if vote_data.vote == "up" else -1
-        if existing_vote:
-            if existing_vote.value == new_value:
-                return {"message": "Vote unchanged", "new_votes": post.votes}
-
-            post.votes += new_value - existing_vote.value
-
-            logger.log_action(
-                session_id,
-                ActionType.DB_UPDATE,
-                {
-                    "table_name": "votes",
-                    "update_type": "update",
-                    "text": f"User {vote_data.user_id} changed vote on Post {vote_data.post_id}",
-                    "values": {
-                        "post_id": vote_data.post_id,
-                        "user_id": vote_data.user_id,
-                        "old_value": existing_vote.value,
-                        "new_value": new_value,
-                        "new_total_votes": post.votes
-                    }
-                }
-            )
-            existing_vote.value = new_value
-        else:
-            new_vote = Vote(user_id=vote_data.user_id, post_id=vote_data.post_id, value=new_value)
-            db.add(new_vote)
-            post.votes += new_value
-
-            logger.log_action(
-                session_id,
-                ActionType.DB_UPDATE,
-                {
-                    "table_name": "votes",
-                    "update_type": "insert",
-                    "text": f"User {vote_data.user_id} cast a new vote on Post {vote_data.post_id}",
-                    "values": {
-                        "post_id": vote_data.post_id,
-                        "user_id": vote_data.user_id,
-                        "value": new_value,
-                        "new_total_votes": post.votes
-                    }
-                }
-            )
-
-    db.commit()
-    return {"message": "Vote recorded", "new_votes": post.votes}
+        total_votes = db.execute(select(Post.votes).where(Post.id == vote_data.post_id)).scalar()
+
+    if total_votes is None:
+        # Raising rolls back this unit's savepoint, including the vote written above
+        raise HTTPException(status_code=404, detail="Post not found")
+    if update_type is not None:
+        # Same entry the vote buffer writes, committed together with the vote
+        old_value = {"delete": -delta, "update": -new_value}.get(update_type, 0)
+        db.add(vote_log(
+            "votes", vote_data.post_id, vote_data.user_id, update_type, old_value, new_value, total_votes, session_id,
+        ))
+
+    if update_type is None and new_value != 0:
+        return {"message": "Vote unchanged", "new_votes": total_votes}
+    return {"message": "Vote recorded", "new_votes": total_votes}
@@ -0,0 +1,46 @@
+# app/utils/cursors.py
+
+import base64
+import json
+from typing import Any, Dict, Optional
+
+from fastapi import HTTPException  # type: ignore
+from fastapi.responses import ORJSONResponse  # type: ignore
+
+
+def encode_cursor(**position: Any) -> str:
+    """Opaque, URL-safe page cursor carrying `position` (offsets, sort keys, ...)"""
+    raw = json.dumps(position, separators=(",", ":"), default=str)
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip("=")
+
+
+def _matches(value: Any, kind) -> bool:
+    if kind is None:
+        return value is None
+    if kind is int:
+        # Offsets and ids: never negative, and a JSON true is not 1
+        return isinstance(value, int) and not isinstance(value, bool) and value >= 0
+    return isinstance(value, kind)
+
+
+def decode_cursor(cursor: str, **fields) -> Dict[str, Any]:
+    """Inverse of encode_cursor; answers 400 when the cursor is malformed or a field is missing.
+
+    `fields` maps each required field to the type its value must have: int (non-negative),
+    str, None, or a tuple of those; a mismatch is a 400 too.
+    """
+    try:
+        position = json.loads(base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)))
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+    if not isinstance(position, dict) or any(field not in position for field in fields):
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+    for field, kinds in fields.items():
+        if not any(_matches(position[field], kind) for kind in (kinds if isinstance(kinds, tuple) else (kinds,))):
+            raise HTTPException(status_code=400, detail="Invalid cursor")
+    return position
+
+
+def paged_response(items, next_cursor: Optional[str]):
+    """List response with the cursor of the following page in X-Next-Cursor (absent on the last page)"""
+    return ORJSONResponse(items, headers={"X-Next-Cursor": next_cursor} if next_cursor else None)
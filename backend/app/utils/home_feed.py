@@ -0,0 +1,120 @@
+# app/utils/home_feed.py
+
+from datetime import datetime
+from typing import List, Optional, Tuple
+
+from sqlalchemy import text  # type: ignore
+from sqlalchemy.orm import Session  # type: ignore
+
+from ..config import settings
+
+# Drop everything past the newest FEED_MAX_ENTRIES posts of the given users, in one statement
+TRIM_SQL = """
+DELETE FROM feed_entries WHERE rowid IN (
+    SELECT rowid FROM (
+        SELECT rowid, ROW_NUMBER() OVER (PARTITION BY user_id ORDER BY post_id DESC) AS position
+        FROM feed_entries WHERE user_id IN ({users})
+    ) WHERE position > :cap
+)
+"""
+
+# Recipients of a new post: its author's followers, plus the community's subscribers unless
+# the community is too big to fan out to (those are merged in when the feed is read)
+FAN_OUT_SQL = """
+INSERT OR IGNORE INTO feed_entries (user_id, post_id, created_at)
+SELECT follower_id, :post_id, :now FROM follows WHERE followee_id = :author_id
+UNION
+SELECT subscriptions.user_id, :post_id, :now FROM subscriptions
+JOIN subreddits ON subreddits.id = subscriptions.subreddit_id
+WHERE subscriptions.subreddit_id = :subreddit_id AND subreddits.subscriber_count <= :fanout_max
+"""
+
+RECIPIENTS_SQL = """
+SELECT follower_id FROM follows WHERE followee_id = :author_id
+UNION
+SELECT subscriptions.user_id FROM subscriptions
+JOIN subreddits ON subreddits.id = subscriptions.subreddit_id
+WHERE subscriptions.subreddit_id = :subreddit_id AND subreddits.subscriber_count <= :fanout_max
+"""
+
+# Newest feed post ids before a keyset position: the stored entries, plus posts of subscribed
+# communities that are too big for fan-out on write (read straight off ix_posts_subreddit_id)
+PAGE_SQL = """
+SELECT post_id FROM (
+    SELECT post_id FROM feed_entries WHERE user_id = :user_id AND post_id < :before
+    ORDER BY post_id DESC LIMIT :limit
+)
+UNION
+SELECT id FROM (
+    SELECT posts.id FROM subscriptions
+    JOIN subreddits ON subreddits.id = subscriptions.subreddit_id
+    JOIN posts ON posts.subreddit_id = subscriptions.subreddit_id
+    WHERE subscriptions.user_id = :user_id AND subreddits.subscriber_count > :fanout_max AND posts.id < :before
+    ORDER BY posts.id DESC LIMIT :limit
+)
+ORDER BY post_id DESC
+LIMIT :limit
+"""
+
+
+def _trim(db: Session, users_sql: str, params: dict):
+    db.execute(text(TRIM_SQL.format(users=users_sql)), {**params, "cap": settings.feed_max_entries})
+
+
+def fan_out(db: Session, post_id: int, author_id: str, subreddit_id: Optional[int]):
+    """Push a new post into its recipients' feeds, in the caller's transaction"""
+    params = {
+        "post_id": post_id,
+        "author_id": author_id,
+        "subreddit_id": subreddit_id,
+        "fanout_max": settings.feed_fanout_max_subscribers,
+        "now": datetime.utcnow(),
+    }
+    if db.execute(text(FAN_OUT_SQL), params).rowcount:
+        _trim(db, RECIPIENTS_SQL, params)
+
+
+def backfill(db: Session, user_id: str, subreddit_id: int = None, author_id: str = None):
+    """Copy the recent posts of a newly subscribed community or followed user into a feed"""
+    column, value = ("subreddit_id", subreddit_id) if subreddit_id is not None else ("author_id", author_id)
+    db.execute(
+        text(
+            "INSERT OR IGNORE INTO feed_entries (user_id, post_id, created_at) "
+            f"SELECT :user_id, id, :now FROM posts WHERE {column} = :value ORDER BY id DESC LIMIT :cap"
+        ),
+        {"user_id": user_id, "value": value, "now": datetime.utcnow(), "cap": settings.feed_max_entries},
+    )
+    _trim(db, ":user_id", {"user_id": user_id})
+
+
+def remove(db: Session, user_id: str, subreddit_id: int = None, author_id: str = None):
+    """Take a community's or user's posts out of a feed, keeping those still reachable another way"""
+    if subreddit_id is not None:
+        source = (
+            "posts.subreddit_id = :subreddit_id AND NOT EXISTS (SELECT 1 FROM follows "
+            "WHERE follows.follower_id = :user_id AND follows.followee_id = posts.author_id)"
+        )
+    else:
+        source = (
+            "posts.author_id = :author_id AND NOT EXISTS (SELECT 1 FROM subscriptions "
+            "WHERE subscriptions.user_id = :user_id AND subscriptions.subreddit_id = posts.subreddit_id)"
+        )
+    db.execute(
+        text(f"DELETE FROM feed_entries WHERE user_id = :user_id AND post_id IN (SELECT id FROM posts WHERE {source})"),
+        {"user_id": user_id, "subreddit_id": subreddit_id, "author_id": author_id},
+    )
+
+
+def page(db: Session, user_id: str, before: Optional[int], limit: int) -> Tuple[List[int], Optional[int]]:
+    """Post ids of one feed page, newest first, and the keyset position of the next page"""
+    rows = db.execute(
+        text(PAGE_SQL),
+        {
+            "user_id": user_id,
+            "before": before if before is not None else 2 ** 63 - 1,
+            "fanout_max": settings.feed_fanout_max_subscribers,
+            "limit": limit + 1,
+        },
+    ).scalars().all()
+    next_before = rows[limit - 1] if len(rows) > limit else None
+    return rows[:limit], next_before
@@ -0,0 +1,100 @@
+# app/utils/log_retention.py
+
+import asyncio
+import time
+from typing import Any, Dict
+
+from sqlalchemy import text  # type: ignore
+from starlette.concurrency import run_in_threadpool  # type: ignore
+
+from ..config import settings
+from ..db.db import db, Database
+from ..db.writer import writer, Writer
+
+
+class LogRetention:
+    """Keeps the logs table bounded: TTL expiry, per-session drops and vacuuming.
+
+    Logs stay in the main database so DB_UPDATE entries can share a transaction with
+    the change they describe; everything here is set-based SQL on the indexed
+    `timestamp` / `session_id` columns instead of loading rows through the ORM.
+    Deletes are write units like any other; vacuuming holds the writer off instead.
+    """
+
+    def __init__(self, db: Database, writer: Writer):
+        self.db = db
+        self.writer = writer
+        self.last_run: Dict[str, Any] = {}
+
+    @property
+    def enabled(self) -> bool:
+        return settings.log_ttl_seconds > 0 or settings.log_vacuum_mode != "off"
+
+    def expire(self) -> int:
+        """Delete logs older than the configured TTL, in short batches"""
+        if settings.log_ttl_seconds <= 0:
+            return 0
+
+        statement = text(
+            "DELETE FROM logs WHERE id IN ("
+            "SELECT id FROM logs WHERE timestamp < datetime('now', :age) LIMIT :batch)"
+        )
+        params = {"age": f"-{settings.log_ttl_seconds} seconds", "batch": settings.log_retention_batch_size}
+        deleted = 0
+        while True:
+            # One unit per batch, so request writes interleave with a long expiry
+            rowcount = self.writer.run(lambda session: session.execute(statement, params).rowcount)
+            deleted += rowcount
+            if rowcount < settings.log_retention_batch_size:
+                return deleted
+
+    def drop_session(self, session_id: str = None) -> int:
+        """Delete every log of one session (or all logs) with a single statement"""
+        if session_id:
+            return self.writer.run(
+                lambda session: session.execute(
+                    text("DELETE FROM logs WHERE session_id = :session_id"), {"session_id": session_id}
+                ).rowcount
+            )
+        return self.writer.run(lambda session: session.execute(text("DELETE FROM logs")).rowcount)
+
+    def vacuum(self) -> str:
+        """Give free pages back to the filesystem according to LOG_VACUUM_MODE"""
+        mode = settings.log_vacuum_mode
+        if mode == "off":
+            return "off"
+
+        # VACUUM and incremental_vacuum write the whole file: no group may commit meanwhile
+        with self.writer.paused(), self.db.engine.connect().execution_options(isolation_level="AUTOCOMMIT") as conn:
+            auto_vacuum = conn.exec_driver_sql("PRAGMA auto_vacuum").scalar()
+            if mode == "incremental" and auto_vacuum == 2:
+                conn.exec_driver_sql(f"PRAGMA incremental_vacuum({int(settings.log_vacuum_pages)})")
+                return "incremental"
+            # Full VACUUM also switches a pre-existing file over to auto_vacuum=INCREMENTAL
+            if conn.exec_driver_sql("PRAGMA freelist_count").scalar():
+                conn.exec_driver_sql("VACUUM")
+                return "full"
+        return "skipped"
+
+    def run_once(self) -> Dict[str, Any]:
+        start = time.perf_counter()
+        expired = self.expire()
+        vacuum = self.vacuum()
+        self.last_run = {
+            "expired": expired,
+            "vacuum": vacuum,
+            "duration": time.perf_counter() - start,
+        }
+        return self.last_run
+
+    async def run_forever(self):
+        """Background loop started from the app lifespan"""
+        while True:
+            await asyncio.sleep(settings.log_retention_interval_seconds)
+            try:
+                await run_in_threadpool(self.run_once)
+            except Exception as e:
+                print(f"Log retention pass failed: {e}")
+
+
+log_retention = LogRetention(db, writer)
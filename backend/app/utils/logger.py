@@ -1,120 +1,297 @@
+import asyncio
 import json
+import threading
 import time
-from typing import Any, Dict, List
+from collections import deque
+from datetime import datetime
+from typing import Any, Dict, List, Optional, Tuple
+
+from sqlalchemy import insert  # type: ignore
+from starlette.concurrency import run_in_threadpool  # type: ignore
+from starlette.datastructures import URL, QueryParams  # type: ignore
+from starlette.requests import cookie_parser  # type: ignore
 
 from ..utils.session_manager import session_manager
+from ..utils.log_retention import log_retention
+from ..utils.metrics import metrics
+from ..config import settings
+from ..db.audit import audit_session_id
 from ..db.db import db, Database
+from ..db.shared_state import shared_state
+from ..db.log_codec import log_codec
+from ..db.log_text import with_text
 from ..db.synthetic_models import ActionType, Log, HttpRequestPayload, LogPayload
+from ..db.writer import writer
 
 class Logger:
     def __init__(self, db: Database):
         self.db = db
+        # HTTP_REQUEST records waiting for the writer, see log_request
+        self._requests: deque = deque()
+        # Held for a whole write so a reset never races an in-flight transaction
+        self._flush_lock = threading.Lock()
+        self._loop = None
+        self._wakeup = None
+        db.reset_listeners.append(self.discard)
+        db.reset_listeners.append(log_codec.discard)
 
     def log_action(self, session_id: str, action_type: ActionType, payload: LogPayload):
-        db_session = next(self.db.get_db())
-        try:
-            entry = Log(
-                session_id=session_id,
-                action_type=action_type,
-                payload=payload
-            )
-
-            db_session.add(entry)
-            db_session.commit()
-            db_session.refresh(entry)
-        finally:
-            db_session.close()  # ✅ Always close the session
+        writer.run(lambda session: session.add(Log(session_id=session_id, action_type=action_type, payload=payload)))
 
-    def get_logs(self, session_id: str = None) -> List[Dict[str, Any]]:
+    def get_logs(self, session_id: str = None, action_type: ActionType = None, method: str = None,
+                 path: str = None, path_prefix: str = None, status_range: Tuple[int, int] = None,
+                 table_name: str = None, update_type: str = None, since: datetime = None,
+                 until: datetime = None, after: int = None, limit: int = None) -> List[Dict[str, Any]]:
+        """Logs in id order; every filter is answered in SQL from the indexed generated columns of Log"""
+        self.flush()
         db_session = next(self.db.get_db())
         try:
-            query = db_session.query(Log)
+            # Generated columns are only computed when filtered on
+            query = db_session.query(Log.id, Log.timestamp, Log.session_id, Log.action_type, Log.payload, Log.payload_blob)
             if session_id:
                 query = query.filter(Log.session_id == session_id)
-            logs = query.all()
+            if action_type is not None:
+                query = query.filter(Log.action_type == action_type)
+            if method:
+                query = query.filter(Log.method == method.upper())
+            if path:
+                query = query.filter(Log.url_path == path)
+            if path_prefix:
+                # A range rather than LIKE, so ix_logs_url_path is used
+                query = query.filter(Log.url_path >= path_prefix, Log.url_path < path_prefix + "\uffff")
+            if status_range is not None:
+                query = query.filter(Log.status_code.between(*status_range))
+            if table_name:
+                query = query.filter(Log.table_name == table_name)
+            if update_type:
+                query = query.filter(Log.update_type == update_type)
+            if since is not None:
+                query = query.filter(Log.timestamp >= since)
+            if until is not None:
+                query = query.filter(Log.timestamp < until)
+            if after is not None:
+                query = query.filter(Log.id > after)
+            query = query.order_by(Log.id)
+            if limit is not None:
+                query = query.limit(limit)
             return [{
+                "id": log.id,
                 "timestamp": log.timestamp,
                 "session_id": log.session_id,
                 "action_type": log.action_type,
-                "payload": log.payload
-            } for log in logs]
+                "payload": with_text(
+                    log.action_type,
+                    log_codec.decode(log.payload_blob, db_session) if log.payload_blob is not None else log.payload,
+                )
+            } for log in query.all()]
         finally:
             db_session.close()  # ✅ Always close the session
 
-    def clear_logs(self):
-        db_session = next(self.db.get_db())
+    def clear_logs(self, session_id: str = None) -> int:
+        self.flush()
+        return log_retention.drop_session(session_id)
+
+    # --- REQUEST LOG WRITER ---
+
+    def log_request(self, record: Tuple):
+        """Queue a finished request for the writer; never touches the database on the request path"""
+        self._requests.append(record)
+        loop, wakeup = self._loop, self._wakeup
+        if loop is not None:
+            try:
+                loop.call_soon_threadsafe(wakeup.set)
+                return
+            except RuntimeError:
+                pass  # loop already closed
+        # No writer running (scripts, one-off tools): write it straight away
+        self.flush()
+
+    def flush(self) -> int:
+        """Write every queued request log in one transaction; returns the number written"""
+        with self._flush_lock:
+            batch = []
+            while self._requests:
+                batch.append(self._requests.popleft())
+            if not batch:
+                return 0
+            try:
+                rows = [request_log_row(*record) for record in batch]
+                writer.run(lambda session: session.execute(insert(Log.__table__), rows))
+            except Exception:
+                # Keep the records for the next attempt
+                self._requests.extendleft(reversed(batch))
+                raise
+            # Payload dictionaries are stored in their own transaction, never inside a request's
+            log_codec.train_pending(writer)
+            return len(batch)
+
+    def discard(self):
+        """Drop queued request logs (the database is being reset underneath us)"""
+        with self._flush_lock:
+            self._requests.clear()
+
+    async def run_forever(self):
+        """Background writer started from the app lifespan"""
+        self._wakeup = asyncio.Event()
+        self._loop = asyncio.get_running_loop()
         try:
-            db_session.query(Log).delete()
-            db_session.commit()
+            while True:
+                await self._wakeup.wait()
+                self._wakeup.clear()
+                # Let the logs of concurrent requests join the batch
+                await asyncio.sleep(settings.log_writer_interval_ms / 1000)
+                try:
+                    # Logs queued against a database another worker replaced are dropped, not written
+                    await run_in_threadpool(shared_state.sync)
+                    await run_in_threadpool(self.flush)
+                except Exception as e:
+                    print(f"Request log flush failed: {e}")
         finally:
-            db_session.close()  # ✅ Always close the session
+            self._loop = self._wakeup = None
 
 logger = Logger(db)
 
+# Request headers kept in HTTP_REQUEST logs so recorded sessions can be replayed faithfully
+REPLAY_HEADERS = ("x-session-id", "x-user-id")
+# Requests under these path prefixes are not logged nor measured
+EXCLUDED_PREFIXES = ("/_synthetic",)
+BODY_METHODS = ("POST", "PUT", "PATCH")
+
+
+def request_log_row(session_id: str, method: str, url: str, path: str, query_string: bytes, body: Optional[bytes],
+                    body_size: int, status_code: int, response_time: float, started_at: float,
+                    headers: Dict[str, str], finished_at: datetime) -> Dict[str, Any]:
+    """logs row for one request; parsing the body happens here, in the writer.
+
+    The text is left out and rendered from these fields when the logs are read.
+    """
+    request_body = {}
+    if body is None and body_size:
+        request_body = {"truncated": True, "size": body_size}
+    elif body:
+        try:
+            request_body = json.loads(body)
+        except ValueError as e:
+            print(f"Error reading request body: {e}")
+
+    payload = HttpRequestPayload(
+        method=method,
+        url=url,
+        path=path,
+        query_params=dict(QueryParams(query_string)),
+        request_body=request_body if isinstance(request_body, dict) else {"body": request_body},
+        status_code=status_code,
+        response_time=response_time,
+        started_at=started_at,
+        headers=headers,
+    )
+    return {
+        "timestamp": finished_at,
+        "session_id": session_id,
+        "action_type": ActionType.HTTP_REQUEST,
+        **log_codec.storage_columns(ActionType.HTTP_REQUEST, payload.model_dump(exclude={"text"})),
+    }
+
+
+def _sync_session() -> Optional[str]:
+    """Catch up with a reset, restore or fork made by another worker; returns the current session"""
+    shared_state.sync()
+    return session_manager.get_session()
+
+
 class LogMiddleware:
-    def __init__(self):
-        pass
+    """Pure ASGI request logger and metrics recorder.
 
-    async def __call__(self, request, call_next):
-        # Skip logging for synthetic endpoints
-        if "/_synthetic" in str(request.url):
-            return await call_next(request)
-        
-        start_time = time.time()
-        
-        # Store the request body if it's a JSON request
-        request_body = {}
-        if request.method in ["POST", "PUT", "PATCH"] and request.headers.get("content-type") == "application/json":
-            try:
-                body = await request.body()
-                request_body = json.loads(body)
-                
-                # Create a new request with the same body
-                async def receive():
-                    return {"type": "http.request", "body": body}
-                request._receive = receive
-            except Exception as e:
-                print(f"Error reading request body: {e}")
-                request_body = {}
-
-        response = await call_next(request)
-        process_time = time.time() - start_time
-        
-        session_id = (
-            request.cookies.get("session_id")
-            or request.query_params.get("session_id")
-            or session_manager.get_session()
+    `receive` and `send` are wrapped so the JSON body (up to LOG_BODY_MAX_BYTES) and
+    the status code are picked up as they stream through; nothing is buffered ahead of
+    the app. The finished record is queued for the batched writer in Logger.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+
+        # Both read the shared state file, so they run off the event loop
+        current_session = await run_in_threadpool(_sync_session)
+
+        headers = {key.decode("latin-1"): value.decode("latin-1") for key, value in scope["headers"]}
+        # DB_UPDATE logs written while handling the request are filed under this session
+        query_session_id = QueryParams(scope["query_string"]).get("session_id")
+        audit_session_id.set(
+            headers.get("x-session-id")
+            or query_session_id
+            or current_session
             or "no_session"
         )
 
-        # Define the natural language description of the request
-        text = f"{request.method} request sent to {str(request.url)}"
-        if request.query_params:
-            text += f" with query params {dict(request.query_params)}"
-        else:
-            text += " with no query params"
-        if request_body != {}:
-            text += f" with body {request_body}"
-        else:
-            text += " with no body"
-        text += f" with status code {response.status_code}"
-
-        # Log the request
-        payload = HttpRequestPayload(
-            text=text,
-            method=request.method,
-            url=str(request.url),
-            query_params=dict(request.query_params),
-            request_body=request_body,
-            status_code=response.status_code,
-            response_time=process_time
-        )
-        
-        logger.log_action(
-            session_id=session_id,
-            action_type=ActionType.HTTP_REQUEST,
-            payload=payload.model_dump()
-        )
+        # Skip logging for synthetic endpoints
+        if scope["path"].startswith(EXCLUDED_PREFIXES):
+            return await self.app(scope, receive, send)
+
+        timings, token = metrics.start_request()
+        started_at = time.time()
+        method = scope["method"]
+
+        # Tee the JSON body as the app reads it, up to the cap
+        content_type = headers.get("content-type", "").split(";")[0].strip()
+        capture = method in BODY_METHODS and content_type == "application/json"
+        body_chunks: List[bytes] = []
+        body_size = 0
+
+        async def logged_receive():
+            nonlocal body_size
+            message = await receive()
+            if capture and message["type"] == "http.request":
+                chunk = message.get("body", b"")
+                body_size += len(chunk)
+                if body_size <= settings.log_body_max_bytes:
+                    body_chunks.append(chunk)
+            return message
+
+        status_code = 500
+
+        async def logged_send(message):
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+                response_start_ns = time.perf_counter_ns()
+                if timings.handler_end_ns:
+                    timings.serialize_ns = response_start_ns - timings.handler_end_ns
+                if settings.metrics_server_timing:
+                    message = {
+                        **message,
+                        "headers": [
+                            *message.get("headers", []),
+                            (b"server-timing", timings.server_timing(response_start_ns - timings.start_ns).encode()),
+                        ],
+                    }
+            await send(message)
+
+        try:
+            await self.app(scope, logged_receive, logged_send)
+        finally:
+            metrics.stop_tracking(token)
+            process_time = (time.perf_counter_ns() - timings.start_ns) / 1e9
+
+            session_id = (
+                cookie_parser(headers.get("cookie", "")).get("session_id")
+                or query_session_id
+                or current_session
+                or "no_session"
+            )
+            body = None if body_size > settings.log_body_max_bytes else b"".join(body_chunks)
+
+            log_start_ns = time.perf_counter_ns()
+            logger.log_request((
+                session_id, method, str(URL(scope=scope)), scope["path"], scope["query_string"], body, body_size,
+                status_code, process_time, started_at,
+                {key: headers[key] for key in REPLAY_HEADERS if key in headers},
+                datetime.utcnow(),
+            ))
+            timings.log_ns = time.perf_counter_ns() - log_start_ns
 
-        return response
-    
\ No newline at end of file
+            route = scope.get("route")
+            metrics.observe(method, route.path if route else "unmatched", status_code, timings)
@@ -0,0 +1,256 @@
+# app/utils/metrics.py
+
+import asyncio
+import functools
+import threading
+import time
+from collections import deque
+from contextvars import ContextVar
+from typing import Any, Dict, Optional, Tuple
+
+from sqlalchemy import event  # type: ignore
+
+from ..config import settings
+
+# Upper bounds (seconds) of the Prometheus latency histogram buckets
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+QUANTILES = (0.5, 0.95, 0.99)
+PHASES = ("handler", "serialize", "db", "log")
+
+
+class RequestTimings:
+    """Per-request counters, shared through a ContextVar with the threadpool and engine events"""
+
+    __slots__ = ("start_ns", "handler_ns", "handler_end_ns", "serialize_ns", "db_ns", "db_statements", "log_ns")
+
+    def __init__(self):
+        self.start_ns = time.perf_counter_ns()
+        self.handler_ns = 0
+        self.handler_end_ns = 0
+        self.serialize_ns = 0
+        self.db_ns = 0
+        self.db_statements = 0
+        self.log_ns = 0
+
+    def server_timing(self, total_ns: int) -> str:
+        """Render the timings as a Server-Timing header value (durations in ms)"""
+        return ", ".join([
+            f"handler;dur={self.handler_ns / 1e6:.3f}",
+            f"serialize;dur={self.serialize_ns / 1e6:.3f}",
+            f'db;dur={self.db_ns / 1e6:.3f};desc="{self.db_statements} statements"',
+            f"log;dur={self.log_ns / 1e6:.3f}",
+            f"total;dur={total_ns / 1e6:.3f}",
+        ])
+
+
+current_timings: ContextVar[Optional[RequestTimings]] = ContextVar("current_timings", default=None)
+
+
+class RouteStats:
+    """Latency histogram, recent-sample window for percentiles and phase totals of one route"""
+
+    def __init__(self):
+        self.count = 0
+        self.total = 0.0
+        self.buckets = [0] * len(LATENCY_BUCKETS)
+        self.samples = deque(maxlen=settings.metrics_window)
+        self.statuses: Dict[int, int] = {}
+        self.phase_ns = dict.fromkeys(PHASES, 0)
+        self.db_statements = 0
+
+    def observe(self, status_code: int, seconds: float, timings: RequestTimings):
+        self.count += 1
+        self.total += seconds
+        for i, bound in enumerate(LATENCY_BUCKETS):
+            if seconds <= bound:
+                self.buckets[i] += 1
+                break
+        self.samples.append(seconds)
+        self.statuses[status_code] = self.statuses.get(status_code, 0) + 1
+        self.phase_ns["handler"] += timings.handler_ns
+        self.phase_ns["serialize"] += timings.serialize_ns
+        self.phase_ns["db"] += timings.db_ns
+        self.phase_ns["log"] += timings.log_ns
+        self.db_statements += timings.db_statements
+
+    def quantiles(self) -> Dict[float, float]:
+        ordered = sorted(self.samples)
+        if not ordered:
+            return {q: 0.0 for q in QUANTILES}
+        return {q: ordered[min(len(ordered) - 1, int(q * len(ordered)))] for q in QUANTILES}
+
+
+class Metrics:
+    """Process-wide request instrumentation: SQL statements, phase timings and per-route latency"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.routes: Dict[Tuple[str, str], RouteStats] = {}
+        self.db_statements = 0
+        self.db_ns = 0
+
+    # --- SQLALCHEMY ENGINE EVENTS ---
+    def attach_engine(self, engine):
+        if not event.contains(engine, "before_cursor_execute", self._before_cursor_execute):
+            event.listen(engine, "before_cursor_execute", self._before_cursor_execute)
+            event.listen(engine, "after_cursor_execute", self._after_cursor_execute)
+
+    @staticmethod
+    def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        conn.info.setdefault("query_start_ns", []).append(time.perf_counter_ns())
+
+    def _after_cursor_execute(self, conn, cursor, statement, parameters, context, executemany):
+        elapsed = time.perf_counter_ns() - conn.info["query_start_ns"].pop()
+        with self._lock:
+            self.db_statements += 1
+            self.db_ns += elapsed
+        timings = current_timings.get()
+        if timings is not None:
+            timings.db_statements += 1
+            timings.db_ns += elapsed
+
+    # --- ROUTE HANDLER TIMING ---
+    def instrument_routes(self, app):
+        """Wrap every endpoint so the handler phase is timed separately from serialization"""
+        for route in app.routes:
+            dependant = getattr(route, "dependant", None)
+            if dependant is not None and not getattr(dependant.call, "_timed", False):
+                dependant.call = _timed(dependant.call)
+
+    # --- REQUEST LIFECYCLE ---
+    def start_request(self):
+        timings = RequestTimings()
+        return timings, current_timings.set(timings)
+
+    def stop_tracking(self, token):
+        """Detach the request's timings so later statements (e.g. the log write) are not attributed to it"""
+        current_timings.reset(token)
+
+    def observe(self, method: str, route: str, status_code: int, timings: RequestTimings) -> int:
+        total_ns = time.perf_counter_ns() - timings.start_ns
+        with self._lock:
+            stats = self.routes.get((method, route))
+            if stats is None:
+                stats = self.routes[(method, route)] = RouteStats()
+            stats.observe(status_code, total_ns / 1e9, timings)
+        return total_ns
+
+    # --- EXPORT ---
+    def snapshot(self) -> Dict[str, Any]:
+        """JSON-friendly view of the per-route statistics"""
+        with self._lock:
+            routes = {}
+            for (method, route), stats in self.routes.items():
+                quantiles = stats.quantiles()
+                routes[f"{method} {route}"] = {
+                    "count": stats.count,
+                    "mean": stats.total / stats.count if stats.count else 0.0,
+                    "p50": quantiles[0.5],
+                    "p95": quantiles[0.95],
+                    "p99": quantiles[0.99],
+                    "db_statements": stats.db_statements,
+                    "phases": {phase: ns / 1e9 for phase, ns in stats.phase_ns.items()},
+                    "statuses": dict(stats.statuses),
+                }
+            return {"db_statements": self.db_statements, "db_seconds": self.db_ns / 1e9, "routes": routes}
+
+    def reset(self):
+        with self._lock:
+            self.routes.clear()
+            self.db_statements = 0
+            self.db_ns = 0
+
+    def render_prometheus(self) -> str:
+        """Prometheus text exposition format (version 0.0.4)"""
+        lines = [
+            "# HELP http_requests_total Requests handled, by route, method and status code.",
+            "# TYPE http_requests_total counter",
+        ]
+        with self._lock:
+            items = sorted(self.routes.items())
+            for (method, route), stats in items:
+                for status_code, count in sorted(stats.statuses.items()):
+                    lines.append(f'http_requests_total{{method="{method}",route="{route}",status="{status_code}"}} {count}')
+
+            lines += [
+                "# HELP http_request_duration_seconds Request latency, by route and method.",
+                "# TYPE http_request_duration_seconds histogram",
+            ]
+            for (method, route), stats in items:
+                labels = f'method="{method}",route="{route}"'
+                cumulative = 0
+                for bound, count in zip(LATENCY_BUCKETS, stats.buckets):
+                    cumulative += count
+                    lines.append(f'http_request_duration_seconds_bucket{{{labels},le="{bound}"}} {cumulative}')
+                lines.append(f'http_request_duration_seconds_bucket{{{labels},le="+Inf"}} {stats.count}')
+                lines.append(f"http_request_duration_seconds_sum{{{labels}}} {stats.total}")
+                lines.append(f"http_request_duration_seconds_count{{{labels}}} {stats.count}")
+
+            lines += [
+                "# HELP http_request_latency_seconds Latency percentiles over the most recent requests.",
+                "# TYPE http_request_latency_seconds summary",
+            ]
+            for (method, route), stats in items:
+                labels = f'method="{method}",route="{route}"'
+                for q, value in stats.quantiles().items():
+                    lines.append(f'http_request_latency_seconds{{{labels},quantile="{q}"}} {value}')
+                lines.append(f"http_request_latency_seconds_sum{{{labels}}} {stats.total}")
+                lines.append(f"http_request_latency_seconds_count{{{labels}}} {stats.count}")
+
+            lines += [
+                "# HELP http_request_phase_seconds_total Time spent per request phase (handler, serialize, db, log).",
+                "# TYPE http_request_phase_seconds_total counter",
+            ]
+            for (method, route), stats in items:
+                for phase, ns in stats.phase_ns.items():
+                    lines.append(
+                        f'http_request_phase_seconds_total{{method="{method}",route="{route}",phase="{phase}"}} {ns / 1e9}'
+                    )
+
+            lines += [
+                "# HELP http_request_db_statements_total SQL statements executed while serving requests.",
+                "# TYPE http_request_db_statements_total counter",
+            ]
+            for (method, route), stats in items:
+                lines.append(f'http_request_db_statements_total{{method="{method}",route="{route}"}} {stats.db_statements}')
+
+            lines += [
+                "# HELP db_statements_total SQL statements executed by the process.",
+                "# TYPE db_statements_total counter",
+                f"db_statements_total {self.db_statements}",
+                "# HELP db_statement_seconds_total Time spent executing SQL statements.",
+                "# TYPE db_statement_seconds_total counter",
+                f"db_statement_seconds_total {self.db_ns / 1e9}",
+            ]
+        return "\n".join(lines) + "\n"
+
+
+def _record_handler(start_ns: int):
+    timings = current_timings.get()
+    if timings is not None:
+        timings.handler_end_ns = time.perf_counter_ns()
+        timings.handler_ns += timings.handler_end_ns - start_ns
+
+
+def _timed(call):
+    if asyncio.iscoroutinefunction(call):
+        @functools.wraps(call)
+        async def wrapper(*args, **kwargs):
+            start = time.perf_counter_ns()
+            try:
+                return await call(*args, **kwargs)
+            finally:
+                _record_handler(start)
+    else:
+        @functools.wraps(call)
+        def wrapper(*args, **kwargs):
+            start = time.perf_counter_ns()
+            try:
+                return call(*args, **kwargs)
+            finally:
+                _record_handler(start)
+    wrapper._timed = True
+    return wrapper
+
+
+metrics = Metrics()
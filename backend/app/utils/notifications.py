@@ -0,0 +1,180 @@
+# app/utils/notifications.py
+
+import asyncio
+import re
+import threading
+from collections import deque
+from datetime import datetime
+from typing import Any, Dict, List, Tuple
+
+from sqlalchemy import insert, select  # type: ignore
+from sqlalchemy.orm import Session  # type: ignore
+from starlette.concurrency import run_in_threadpool  # type: ignore
+
+from ..config import settings
+from ..db.audit import audit_session_id
+from ..db.db import db, Database
+from ..db.models import Comment, Notification, Post, User
+from ..db.synthetic_models import ActionType, Log
+from ..db.shared_state import shared_state
+from ..db.writer import writer
+
+# Same u/username syntax frontend/src/utils/parseUserMentions.tsx renders
+MENTION_RE = re.compile(r"u/([a-zA-Z0-9_]+)")
+
+
+class NotificationService:
+    """Turns write-path events into notification rows, off the request path.
+
+    Routes only append a small event tuple after their commit, filed under the request's
+    audit session id. A background worker
+    wakes up, lets a batch gather for NOTIFICATIONS_BATCH_WINDOW_MS, resolves every
+    recipient of the batch with one query per kind (parent comment authors, post
+    authors, mentioned usernames) and inserts all the rows in one transaction.
+    """
+
+    def __init__(self, db: Database):
+        self.db = db
+        self._events: deque = deque()
+        # Held for a whole write so a reset never races an in-flight transaction
+        self._flush_lock = threading.Lock()
+        self._loop = None
+        self._wakeup = None
+        self.last_flush: Dict[str, Any] = {}
+        db.reset_listeners.append(self.discard)
+
+    # --- EVENTS ---
+
+    def comment_created(self, comment_id: int, post_id: int, parent_id, author_id: str, content: str):
+        self._emit((
+            "comment", audit_session_id.get(), datetime.utcnow(), author_id, post_id, comment_id, parent_id, content,
+        ))
+
+    def user_followed(self, follower_id: str, followee_id: str):
+        self._emit(("follow", audit_session_id.get(), datetime.utcnow(), follower_id, None, None, followee_id, None))
+
+    def _emit(self, event: Tuple):
+        self._events.append(event)
+        loop, wakeup = self._loop, self._wakeup
+        if loop is not None:
+            try:
+                loop.call_soon_threadsafe(wakeup.set)
+                return
+            except RuntimeError:
+                pass  # loop already closed
+        # No worker running (scripts, one-off tools): write it straight away
+        self.flush()
+
+    # --- WRITING ---
+
+    def flush(self) -> int:
+        """Write every pending event; returns the number of notifications inserted"""
+        written = 0
+        with self._flush_lock:
+            while self._events:
+                batch = []
+                while self._events and len(batch) < settings.notifications_batch_size:
+                    batch.append(self._events.popleft())
+                try:
+                    written += writer.run(lambda session: self._write(session, batch))
+                except Exception:
+                    # Keep the events for the next attempt
+                    self._events.extendleft(reversed(batch))
+                    raise
+                self.last_flush = {"events": len(batch), "notifications": written}
+        return written
+
+    def _write(self, session: Session, batch: List[Tuple]) -> int:
+        comments = [event for event in batch if event[0] == "comment"]
+        parent_ids = {event[6] for event in comments if event[6] is not None}
+        post_ids = {event[4] for event in comments if event[6] is None}
+        usernames = {name for event in comments for name in MENTION_RE.findall(event[7])}
+
+        parent_authors = dict(session.execute(
+            select(Comment.id, Comment.author_id).where(Comment.id.in_(parent_ids))
+        ).all()) if parent_ids else {}
+        post_authors = dict(session.execute(
+            select(Post.id, Post.author_id).where(Post.id.in_(post_ids))
+        ).all()) if post_ids else {}
+        mentioned = dict(session.execute(
+            select(User.username, User.id).where(User.username.in_(usernames))
+        ).all()) if usernames else {}
+
+        rows, logs = [], []
+        for kind, session_id, created_at, actor_id, post_id, comment_id, target, content in batch:
+            if kind == "comment":
+                # First reason wins: a reply to your comment that also mentions you is one reply
+                recipients: Dict[str, str] = {}
+                if target is not None:
+                    direct, reason = parent_authors.get(target), "comment_reply"
+                else:
+                    direct, reason = post_authors.get(post_id), "post_reply"
+                if direct:
+                    recipients[direct] = reason
+                for name in MENTION_RE.findall(content):
+                    if name in mentioned:
+                        recipients.setdefault(mentioned[name], "mention")
+                recipients.pop(actor_id, None)
+                text = f"Comment {comment_id} by User {actor_id} notified {len(recipients)} user(s)"
+            else:
+                recipients = {target: "follow"}
+                text = f"User {target} was notified that User {actor_id} followed them"
+            if not recipients:
+                continue
+
+            rows += [
+                {
+                    "user_id": user_id,
+                    "type": reason,
+                    "actor_id": actor_id,
+                    "post_id": post_id,
+                    "comment_id": comment_id,
+                    "created_at": created_at,
+                }
+                for user_id, reason in recipients.items()
+            ]
+            entry = Log(
+                session_id,
+                ActionType.DB_UPDATE,
+                {
+                    "table_name": "notifications",
+                    "update_type": "insert",
+                    "text": text,
+                    "values": {"recipients": recipients, "actor_id": actor_id, "comment_id": comment_id},
+                },
+            )
+            # Stamp the event time, not the batch time
+            entry.timestamp = created_at
+            logs.append(entry)
+
+        if rows:
+            session.execute(insert(Notification), rows)
+        session.add_all(logs)
+        return len(rows)
+
+    def discard(self):
+        """Drop pending events (the database is being reset underneath us)"""
+        with self._flush_lock:
+            self._events.clear()
+
+    async def run_forever(self):
+        """Background worker started from the app lifespan"""
+        self._wakeup = asyncio.Event()
+        self._loop = asyncio.get_running_loop()
+        try:
+            while True:
+                await self._wakeup.wait()
+                self._wakeup.clear()
+                # Let the events of concurrent requests join the batch
+                await asyncio.sleep(settings.notifications_batch_window_ms / 1000)
+                try:
+                    # Events queued against a database another worker replaced are dropped, not written
+                    await run_in_threadpool(shared_state.sync)
+                    await run_in_threadpool(self.flush)
+                except Exception as e:
+                    print(f"Notification flush failed: {e}")
+        finally:
+            self._loop = self._wakeup = None
+
+
+notifications = NotificationService(db)
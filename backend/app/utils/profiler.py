@@ -0,0 +1,107 @@
+# app/utils/profiler.py
+
+import marshal
+import os
+import sys
+import threading
+import time
+from collections import Counter
+from typing import Dict, List, Optional, Tuple
+
+from ..config import settings
+
+# Leaf frames that mean "this thread is parked", dropped unless idle stacks are requested
+IDLE_LEAVES = {
+    ("threading.py", "wait"),
+    ("queue.py", "get"),
+    ("selectors.py", "select"),
+    ("selectors.py", "poll"),
+}
+
+
+class ProfilerBusy(Exception):
+    pass
+
+
+class StackSampler:
+    """On-demand sampling profiler over every thread (event loop and threadpool workers).
+
+    Nothing runs between captures: a sampling thread only exists for the duration of
+    a capture, and it reads `sys._current_frames()` at a fixed interval.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.interval = settings.profiler_interval_ms / 1000
+
+    @property
+    def running(self) -> bool:
+        return self._lock.locked()
+
+    def sample(self, seconds: float, loop_thread_id: Optional[int] = None, include_idle: bool = False) -> Counter:
+        """Collect stacks for `seconds`; keys are tuples of code objects, root first, prefixed by the thread label"""
+        if not self._lock.acquire(blocking=False):
+            raise ProfilerBusy("A profile capture is already running")
+        try:
+            me = threading.get_ident()
+            stacks: Counter = Counter()
+            deadline = time.perf_counter() + seconds
+            while time.perf_counter() < deadline:
+                names = {t.ident: t.name for t in threading.enumerate()}
+                for thread_id, frame in sys._current_frames().items():
+                    if thread_id == me:
+                        continue
+                    codes = []
+                    while frame is not None:
+                        codes.append(frame.f_code)
+                        frame = frame.f_back
+                    if not codes or (not include_idle and _is_idle(codes[0])):
+                        continue
+                    label = "event-loop" if thread_id == loop_thread_id else names.get(thread_id, f"thread-{thread_id}")
+                    stacks[(label, *reversed(codes))] += 1
+                time.sleep(self.interval)
+            return stacks
+        finally:
+            self._lock.release()
+
+    @staticmethod
+    def collapsed(stacks: Counter) -> str:
+        """Brendan Gregg's collapsed-stack format, ready for flamegraph.pl / speedscope"""
+        lines = []
+        for (label, *codes), count in stacks.most_common():
+            lines.append(";".join([label.replace(";", ":")] + [_label(code) for code in codes]) + f" {count}")
+        return "\n".join(lines) + "\n"
+
+    def pstats(self, stacks: Counter) -> bytes:
+        """Marshalled stats dict loadable with `pstats.Stats(path)` (snakeviz, gprof2dot, ...)"""
+        stats: Dict[Tuple, List] = {}
+        for (_, *codes), count in stacks.items():
+            weight = count * self.interval
+            keys = [(code.co_filename, code.co_firstlineno, code.co_name) for code in codes]
+            for key in set(keys):
+                entry = stats.setdefault(key, [0, 0, 0.0, 0.0, {}])
+                entry[0] += count
+                entry[1] += count
+                entry[3] += weight
+            stats[keys[-1]][2] += weight
+            for caller, callee in set(zip(keys, keys[1:])):
+                callers = stats[callee][4]
+                nc, cc, tt, ct = callers.get(caller, (0, 0, 0.0, 0.0))
+                callers[caller] = (nc + count, cc + count, tt + (weight if callee == keys[-1] else 0.0), ct + weight)
+        return marshal.dumps({key: tuple(entry) for key, entry in stats.items()})
+
+
+def _is_idle(leaf) -> bool:
+    return (os.path.basename(leaf.co_filename), leaf.co_name) in IDLE_LEAVES
+
+
+def _label(code) -> str:
+    filename = code.co_filename
+    if "site-packages" in filename:
+        filename = filename.split("site-packages" + os.sep, 1)[1]
+    else:
+        filename = os.path.basename(filename)
+    return f"{code.co_name} ({filename}:{code.co_firstlineno})".replace(";", ":")
+
+
+profiler = StackSampler()
@@ -1,17 +1,19 @@
+from ..db.shared_state import shared_state
+
+
 class SessionManager:
-    def __init__(self):
-        self.session = None
+    """The current session, kept in the shared state so every worker sees the same one"""
 
     def create_session(self, session: str):
-        self.session = session
+        shared_state.set_session(session)
 
     def set_session(self, session: str):
-        self.session = session
+        shared_state.set_session(session)
 
     def get_session(self):
-        return self.session
+        return shared_state.session()
     
     def clear_session(self, session_id: str):
-        self.session = None
+        shared_state.set_session(None)
 
 session_manager = SessionManager()
\ No newline at end of file
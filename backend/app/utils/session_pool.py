@@ -0,0 +1,196 @@
+# app/utils/session_pool.py
+
+import asyncio
+import os
+import shutil
+import sqlite3
+import tempfile
+import threading
+import time
+from collections import OrderedDict, deque
+from typing import Any, Dict, Optional
+
+from starlette.concurrency import run_in_threadpool  # type: ignore
+
+from ..config import settings
+from ..db.checkpoints import checkpoints, snapshot, Checkpoints
+from ..db.db import Database
+from ..db.state import state_tracker
+
+
+class SessionPool:
+    """Seeded environments prepared in the background, so starting an episode is a page copy.
+
+    For every warm seed, a background task keeps SESSION_POOL_SIZE in-memory copies of a
+    freshly seeded database. It seeds a scratch database file, captures its seed state for
+    /_synthetic/state, and takes a backup. new_session and reset claim a copy and load it
+    like a checkpoint, then wake the task to refill. On a miss they build one on the spot,
+    and the seed starts being kept warm.
+    """
+
+    def __init__(self, checkpoints: Checkpoints):
+        self.checkpoints = checkpoints
+        self._lock = threading.Lock()
+        # seed -> deque of (monotonic seeding time, image); seeds in least recently claimed order
+        self._ready: "OrderedDict[Optional[str], deque]" = OrderedDict(
+            (seed, deque()) for seed in settings.session_pool_seeds
+        )
+        self.hits = 0
+        self.misses = 0
+        self.expired = 0
+        self.last_fill: Dict[str, Any] = {}
+        self._loop = None
+        self._wakeup = None
+
+    @property
+    def enabled(self) -> bool:
+        return settings.session_pool_size > 0
+
+    # --- CLAIMING ---
+
+    def claim(self, seed: Optional[str]) -> bool:
+        """Load a pre-seeded environment for `seed`; False when none is ready"""
+        if not self.enabled:
+            return False
+        image = self._take(seed)
+        self._wake()
+        if image is None:
+            return False
+        try:
+            self.checkpoints.load(image)
+        finally:
+            image.close()
+        return True
+
+    def load_fresh(self, seed: Optional[str], **scale):
+        """Seed an environment on the spot and load it, bypassing the pool (`scale` as in populate_database)"""
+        # Seeded aside and copied in whole: other workers never read a half-seeded database
+        image = self.build(seed, **scale)
+        try:
+            self.checkpoints.load(image)
+        finally:
+            image.close()
+
+    def _take(self, seed: Optional[str]) -> Optional[sqlite3.Connection]:
+        with self._lock:
+            ready = self._ready.setdefault(seed, deque())
+            self._ready.move_to_end(seed)
+            while len(self._ready) > settings.session_pool_max_seeds:
+                _, dropped = self._ready.popitem(last=False)
+                for _, image in dropped:
+                    image.close()
+
+            while ready:
+                seeded_at, image = ready.popleft()
+                if time.monotonic() - seeded_at <= settings.session_pool_max_age_seconds:
+                    self.hits += 1
+                    return image
+                self.expired += 1
+                image.close()
+            self.misses += 1
+            return None
+
+    # --- FILLING ---
+
+    def fill(self) -> int:
+        """Seed environments until every warm seed has SESSION_POOL_SIZE ready; returns the number built"""
+        built = 0
+        start = time.perf_counter()
+        while True:
+            with self._lock:
+                missing = [seed for seed, ready in self._ready.items() if len(ready) < settings.session_pool_size]
+            if not missing:
+                break
+            seed = missing[-1]  # most recently claimed first
+            image = self.build(seed)
+            with self._lock:
+                ready = self._ready.get(seed)
+                if ready is None or len(ready) >= settings.session_pool_size:
+                    image.close()  # the seed was dropped meanwhile
+                    continue
+                ready.append((time.monotonic(), image))
+            built += 1
+        if built:
+            self.last_fill = {"environments": built, "duration": time.perf_counter() - start}
+        return built
+
+    @staticmethod
+    def build(seed: Optional[str], **scale) -> sqlite3.Connection:
+        """Seed a scratch database and return an in-memory copy of it, ready to load"""
+        directory = tempfile.mkdtemp(prefix="deddit-pool-")
+        scratch = Database(os.path.join(directory, "seed.sqlite"))
+        try:
+            scratch.create_database()
+            scratch.populate_database(seed, **scale)
+            state_tracker.capture_seed(scratch.engine)
+            return snapshot(scratch.engine)
+        finally:
+            scratch.dispose()
+            shutil.rmtree(directory, ignore_errors=True)
+
+    def _wake(self):
+        loop, wakeup = self._loop, self._wakeup
+        if loop is not None:
+            try:
+                loop.call_soon_threadsafe(wakeup.set)
+            except RuntimeError:
+                pass  # loop already closed
+
+    def discard(self):
+        """Drop every ready environment (on shutdown)"""
+        with self._lock:
+            for ready in self._ready.values():
+                while ready:
+                    ready.popleft()[1].close()
+
+    # --- REPORTING ---
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            ready = {str(seed): len(images) for seed, images in self._ready.items()}
+        claims = self.hits + self.misses
+        return {
+            "size": settings.session_pool_size,
+            "hits": self.hits,
+            "misses": self.misses,
+            "expired": self.expired,
+            "hit_rate": self.hits / claims if claims else None,
+            "ready": ready,
+            "last_fill": self.last_fill,
+        }
+
+    def render_prometheus(self) -> str:
+        stats = self.stats()
+        lines = [
+            "# HELP session_pool_claims_total Environment claims by new_session and reset, by result.",
+            "# TYPE session_pool_claims_total counter",
+            f'session_pool_claims_total{{result="hit"}} {stats["hits"]}',
+            f'session_pool_claims_total{{result="miss"}} {stats["misses"]}',
+            "# HELP session_pool_expired_total Pre-seeded environments thrown away for age.",
+            "# TYPE session_pool_expired_total counter",
+            f"session_pool_expired_total {stats['expired']}",
+            "# HELP session_pool_ready Pre-seeded environments ready, by seed.",
+            "# TYPE session_pool_ready gauge",
+        ]
+        lines += [f'session_pool_ready{{seed="{seed}"}} {count}' for seed, count in sorted(stats["ready"].items())]
+        return "\n".join(lines) + "\n"
+
+    async def run_forever(self):
+        """Background refill started from the app lifespan"""
+        self._wakeup = asyncio.Event()
+        self._loop = asyncio.get_running_loop()
+        # Warm the configured seeds right away
+        self._wakeup.set()
+        try:
+            while True:
+                await self._wakeup.wait()
+                self._wakeup.clear()
+                try:
+                    await run_in_threadpool(self.fill)
+                except Exception as e:
+                    print(f"Session pool refill failed: {e}")
+        finally:
+            self._loop = self._wakeup = None
+
+
+session_pool = SessionPool(checkpoints)
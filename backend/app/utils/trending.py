@@ -0,0 +1,110 @@
+# app/utils/trending.py
+
+import asyncio
+import math
+import threading
+import time
+from datetime import datetime, timedelta
+from typing import Any, Dict, List
+
+from sqlalchemy import func, select  # type: ignore
+from starlette.concurrency import run_in_threadpool  # type: ignore
+
+from ..config import settings
+from ..db.db import db, Database
+from ..db.models import Comment, Post, Subreddit
+
+
+class TrendingCommunities:
+    """Trending subreddits, recomputed by a background job and served from memory.
+
+    Activity (new posts + new comments) is counted over a short and a long sliding
+    window. A community trends when its short-window activity beats what its long-window
+    rate predicts; log-damping the raw activity keeps tiny communities from jumping
+    to the top on a single post.
+    """
+
+    def __init__(self, db: Database):
+        self.db = db
+        self._lock = threading.Lock()
+        self.results: List[Dict[str, Any]] = []
+        self.computed_at: float = 0.0
+        db.reset_listeners.append(self.clear)
+
+    def _activity(self, conn, since: datetime) -> Dict[int, Dict[str, int]]:
+        posts = conn.execute(
+            select(Post.subreddit_id, func.count())
+            .where(Post.created_at >= since, Post.subreddit_id.isnot(None))
+            .group_by(Post.subreddit_id)
+        ).all()
+        comments = conn.execute(
+            select(Post.subreddit_id, func.count())
+            .select_from(Comment)
+            .join(Post, Comment.post_id == Post.id)
+            .where(Comment.created_at >= since, Post.subreddit_id.isnot(None))
+            .group_by(Post.subreddit_id)
+        ).all()
+        activity: Dict[int, Dict[str, int]] = {}
+        for subreddit_id, count in posts:
+            activity.setdefault(subreddit_id, {"posts": 0, "comments": 0})["posts"] = count
+        for subreddit_id, count in comments:
+            activity.setdefault(subreddit_id, {"posts": 0, "comments": 0})["comments"] = count
+        return activity
+
+    def compute(self) -> List[Dict[str, Any]]:
+        short_window = settings.trending_short_window_seconds
+        long_window = max(settings.trending_long_window_seconds, short_window + 1)
+        now = datetime.utcnow()
+
+        with self.db.engine.connect() as conn:
+            recent = self._activity(conn, now - timedelta(seconds=short_window))
+            baseline = self._activity(conn, now - timedelta(seconds=long_window))
+            names = dict(conn.execute(select(Subreddit.id, Subreddit.name)).all())
+
+        results = []
+        for subreddit_id, counts in recent.items():
+            if subreddit_id not in names:
+                continue
+            activity = counts["posts"] + counts["comments"]
+            long_counts = baseline.get(subreddit_id, counts)
+            earlier = long_counts["posts"] + long_counts["comments"] - activity
+            # Activity the short window would see at the community's usual pace
+            expected = earlier * short_window / (long_window - short_window)
+            results.append({
+                "id": subreddit_id,
+                "name": names[subreddit_id],
+                "score": round((activity / (expected + 1)) * math.log1p(activity), 4),
+                "recent_posts": counts["posts"],
+                "recent_comments": counts["comments"],
+            })
+        results.sort(key=lambda r: (-r["score"], r["name"]))
+
+        with self._lock:
+            self.results = results[:settings.trending_size]
+            self.computed_at = time.time()
+        return self.results
+
+    def get(self, limit: int) -> List[Dict[str, Any]]:
+        with self._lock:
+            computed = self.computed_at > 0
+            results = self.results
+        if not computed:
+            results = self.compute()
+        return results[:limit]
+
+    def clear(self):
+        with self._lock:
+            self.results = []
+            self.computed_at = 0.0
+
+    async def run_forever(self):
+        """Background loop started from the app lifespan"""
+        while True:
+            try:
+                await run_in_threadpool(self.compute)
+            except Exception as e:
+                print(f"Trending computation failed: {e}")
+            await asyncio.sleep(settings.trending_interval_seconds)
+
+
+trending = TrendingCommunities(db)
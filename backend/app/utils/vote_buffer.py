@@ -0,0 +1,327 @@
+# app/utils/vote_buffer.py
+
+import asyncio
+import threading
+import time
+import uuid
+from collections import Counter
+from datetime import datetime
+from typing import Any, Dict, List, Optional, Tuple
+
+from sqlalchemy import bindparam, select  # type: ignore
+from sqlalchemy.dialects.sqlite import insert  # type: ignore
+from sqlalchemy.orm import Session  # type: ignore
+from starlette.concurrency import run_in_threadpool  # type: ignore
+
+from ..config import settings
+from ..db.db import db, Database
+from ..db.models import Comment, CommentVote, Post, Vote
+from ..db.ranking import vote_count_deltas
+from ..db.synthetic_models import ActionType, Log
+from ..db.shared_state import shared_state
+from ..db.writer import writer
+
+
+class VoteTarget:
+    """How votes on one kind of object are stored: vote table, target column, score query, counters"""
+
+    def __init__(self, vote_table, column: str, score_query, counter, counter_deltas):
+        self.vote_table = vote_table
+        self.column = column
+        # target id -> score, or None when the target does not exist
+        self.score_query = score_query
+        # Table holding the target's denormalized vote counters
+        self.counter = counter
+        # (old value, new value) -> {counter column: delta}
+        self.counter_deltas = counter_deltas
+
+
+TARGETS = {
+    "votes": VoteTarget(
+        Vote.__table__, "post_id",
+        lambda target_id: select(Post.votes).where(Post.id == target_id),
+        Post.__table__,
+        lambda old_value, new_value: {"votes": new_value - old_value},
+    ),
+    "comment_votes": VoteTarget(
+        CommentVote.__table__, "comment_id",
+        lambda target_id: select(Comment.upvotes - Comment.downvotes).where(Comment.id == target_id),
+        Comment.__table__,
+        vote_count_deltas,
+    ),
+}
+
+
+class BufferedTarget:
+    """Buffered state of one post or comment: projected score and each touched user's vote"""
+
+    __slots__ = ("score", "votes", "dirty", "idle_flushes")
+
+    def __init__(self, score: int):
+        self.score = score
+        # user_id -> [persisted value, desired value]; 0 means "no vote row"
+        self.votes: Dict[str, List[int]] = {}
+        self.dirty = set()
+        self.idle_flushes = 0
+
+
+class VoteBuffer:
+    """Write-behind vote aggregator for hot posts and comments.
+
+    Votes are recorded idempotently in memory and answered with the projected score
+    straight away; a background task flushes the coalesced changes (vote rows, post
+    counters and their DB_UPDATE logs) in one transaction every VOTE_BUFFER_INTERVAL_MS.
+    A user flipping a vote ten times between flushes costs one row write.
+    """
+
+    def __init__(self, db: Database):
+        self.db = db
+        self._lock = threading.Lock()
+        # Held for a whole flush so a reset never races an in-flight transaction
+        self._flush_lock = threading.Lock()
+        self._targets: Dict[Tuple[str, int], BufferedTarget] = {}
+        self._logs: List[Log] = []
+        # Bumped whenever targets are dropped, so reads taken before that are not cached
+        self._generation = 0
+        self.last_flush: Dict[str, Any] = {}
+        db.reset_listeners.append(self.discard)
+
+    @property
+    def enabled(self) -> bool:
+        return settings.vote_buffer_enabled
+
+    # --- RECORDING ---
+
+    def record(self, table: str, target_id: int, user_id: str, value: int, session_id: str) -> Optional[Tuple[Optional[str], int]]:
+        """Buffer a vote (1, -1 or 0 to remove it).
+
+        Returns (update_type, projected score) with update_type None when the vote is
+        unchanged, or None when the post/comment does not exist.
+        """
+        key = (table, target_id)
+        while True:
+            target = self._load_target(key)
+            if target is None:
+                return None
+            persisted = self._load_persisted(table, target_id, target, user_id)
+
+            with self._lock:
+                if self._targets.get(key) is not target:
+                    continue  # evicted while we were reading, start over
+                entry = target.votes.setdefault(user_id, [persisted, persisted])
+                current = entry[1]
+                if current == value:
+                    return None, target.score
+                entry[1] = value
+                target.score += value - current
+                target.dirty.add(user_id)
+                target.idle_flushes = 0
+                update_type = "delete" if value == 0 else "update" if current else "insert"
+                self._logs.append(
+                    vote_log(table, target_id, user_id, update_type, current, value, target.score, session_id)
+                )
+                return update_type, target.score
+
+    def _load_target(self, key: Tuple[str, int]) -> Optional[BufferedTarget]:
+        table, target_id = key
+        while True:
+            with self._lock:
+                target = self._targets.get(key)
+                generation = self._generation
+            if target is not None:
+                return target
+
+            with self.db.engine.connect() as conn:
+                score = conn.execute(TARGETS[table].score_query(target_id)).scalar()
+            if score is None:
+                return None
+
+            with self._lock:
+                # A reset or eviction since the read may have made it stale: read again
+                if generation == self._generation:
+                    return self._targets.setdefault(key, BufferedTarget(score))
+
+    def _load_persisted(self, table: str, target_id: int, target: BufferedTarget, user_id: str) -> int:
+        with self._lock:
+            entry = target.votes.get(user_id)
+        if entry is not None:
+            return entry[0]
+        # Users absent from the map have nothing buffered, so the stored row is current
+        spec = TARGETS[table]
+        with self.db.engine.connect() as conn:
+            value = conn.execute(
+                select(spec.vote_table.c.value).where(
+                    spec.vote_table.c[spec.column] == target_id, spec.vote_table.c.user_id == user_id
+                )
+            ).scalar()
+        return value or 0
+
+    # --- FLUSHING ---
+
+    def flush(self) -> int:
+        """Write every buffered change in one transaction; returns the number of vote rows written"""
+        with self._flush_lock:
+            start = time.perf_counter()
+            with self._lock:
+                batch = []
+                for key, target in self._targets.items():
+                    for user_id in target.dirty:
+                        persisted, desired = target.votes[user_id]
+                        batch.append((key, user_id, persisted, desired))
+                    target.dirty = set()
+                logs, self._logs = self._logs, []
+
+            try:
+                written = writer.run(lambda session: self._write(session, batch, logs)) if batch or logs else 0
+            except Exception:
+                # Keep the changes buffered for the next attempt
+                with self._lock:
+                    for key, user_id, _, _ in batch:
+                        target = self._targets.get(key)
+                        if target is not None:
+                            target.dirty.add(user_id)
+                    self._logs[:0] = logs
+                raise
+
+            with self._lock:
+                for key, user_id, _, desired in batch:
+                    target = self._targets.get(key)
+                    if target is not None:
+                        target.votes[user_id][0] = desired
+                self._evict_idle()
+
+            self.last_flush = {
+                "votes": written,
+                "logs": len(logs),
+                "duration": time.perf_counter() - start,
+            }
+            return written
+
+    def _write(self, session: Session, batch, logs: List[Log]) -> int:
+        written = 0
+        for table, spec in TARGETS.items():
+            changes = [
+                (target_id, user_id, persisted, desired)
+                for (batch_table, target_id), user_id, persisted, desired in batch
+                if batch_table == table and persisted != desired
+            ]
+            if not changes:
+                continue
+            written += len(changes)
+
+            upserts = [
+                {"id": str(uuid.uuid4()), "user_id": user_id, spec.column: target_id, "value": desired}
+                for target_id, user_id, _, desired in changes if desired != 0
+            ]
+            if upserts:
+                statement = insert(spec.vote_table)
+                session.execute(
+                    statement.on_conflict_do_update(
+                        index_elements=["user_id", spec.column], set_={"value": statement.excluded.value}
+                    ),
+                    upserts,
+                )
+
+            deletes = [
+                {"b_target": target_id, "b_user": user_id}
+                for target_id, user_id, _, desired in changes if desired == 0
+            ]
+            if deletes:
+                session.execute(
+                    spec.vote_table.delete().where(
+                        spec.vote_table.c[spec.column] == bindparam("b_target"),
+                        spec.vote_table.c.user_id == bindparam("b_user"),
+                    ),
+                    deletes,
+                )
+
+            deltas: Dict[int, Counter] = {}
+            for target_id, _, persisted, desired in changes:
+                deltas.setdefault(target_id, Counter()).update(spec.counter_deltas(persisted, desired))
+            columns = sorted({column for target_deltas in deltas.values() for column in target_deltas})
+            counter_updates = [
+                {"b_id": target_id, **{f"b_{column}": target_deltas[column] for column in columns}}
+                for target_id, target_deltas in deltas.items() if any(target_deltas.values())
+            ]
+            if counter_updates:
+                session.execute(
+                    spec.counter.update()
+                    .where(spec.counter.c.id == bindparam("b_id"))
+                    .values({column: spec.counter.c[column] + bindparam(f"b_{column}") for column in columns}),
+                    counter_updates,
+                )
+
+        session.add_all(logs)
+        return written
+
+    def _evict_idle(self):
+        """Forget targets that stayed clean for a while so the next vote re-reads the database"""
+        idle = []
+        for key, target in self._targets.items():
+            if target.dirty:
+                continue
+            target.idle_flushes += 1
+            if target.idle_flushes >= settings.vote_buffer_idle_flushes:
+                idle.append(key)
+        for key in idle:
+            del self._targets[key]
+        if idle:
+            self._generation += 1
+
+    def discard(self):
+        """Drop everything buffered (the database is being reset underneath us)"""
+        with self._flush_lock, self._lock:
+            self._targets.clear()
+            self._logs = []
+            self._generation += 1
+
+    async def run_forever(self):
+        """Background loop started from the app lifespan"""
+        while True:
+            await asyncio.sleep(settings.vote_buffer_interval_ms / 1000)
+            try:
+                # Votes buffered against a database another worker replaced are dropped, not written
+                await run_in_threadpool(shared_state.sync)
+                await run_in_threadpool(self.flush)
+            except Exception as e:
+                print(f"Vote buffer flush failed: {e}")
+
+
+def vote_log(table: str, target_id: int, user_id: str, update_type: str, old_value: int, new_value: int,
+             score: int, session_id: str) -> Log:
+    """DB_UPDATE log for a post or comment vote; /vote adds the same entry to its own transaction"""
+    if table == "votes":
+        subject = f"Post {target_id}"
+        values = {"post_id": target_id, "user_id": user_id}
+        if update_type == "delete":
+            text = f"User {user_id} removed their vote on {subject}"
+            values["removed_value"] = old_value
+        elif update_type == "update":
+            text = f"User {user_id} changed vote on {subject}"
+            values.update(old_value=old_value, new_value=new_value)
+        else:
+            text = f"User {user_id} cast a new vote on {subject}"
+            values["value"] = new_value
+        values["new_total_votes"] = score
+    else:
+        values = {"comment_id": target_id, "user_id": user_id, "old_value": old_value or None}
+        if update_type == "delete":
+            text = f"User {user_id} removed vote from Comment {target_id}"
+        else:
+            text = (
+                f"User {user_id} {'updated' if update_type == 'update' else 'cast'} vote "
+                f"on Comment {target_id} with value {new_value}"
+            )
+            values["new_value"] = new_value
+
+    entry = Log(
+        session_id,
+        ActionType.DB_UPDATE,
+        {"table_name": table, "update_type": update_type, "text": text, "values": values},
+    )
+    # Stamp the vote time, not the flush time
+    entry.timestamp = datetime.utcnow()
+    return entry
+
+
+vote_buffer = VoteBuffer(db)
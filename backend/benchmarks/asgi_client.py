@@ -0,0 +1,83 @@
+# benchmarks/asgi_client.py
+
+import asyncio
+import json
+from typing import Any, Dict, Optional, Tuple
+from urllib.parse import urlsplit
+
+
+class ASGIClient:
+    """Minimal in-process HTTP client that calls an ASGI app directly (no sockets, no httpx)"""
+
+    def __init__(self, app, host: str = "localhost:8000"):
+        self.app = app
+        self.host = host
+
+    async def request(
+        self,
+        method: str,
+        url: str,
+        json_body: Any = None,
+        headers: Optional[Dict[str, str]] = None,
+    ) -> Tuple[int, bytes]:
+        parts = urlsplit(url)
+        body = json.dumps(json_body).encode() if json_body is not None else b""
+
+        raw_headers = [(b"host", self.host.encode())]
+        if json_body is not None:
+            raw_headers += [(b"content-type", b"application/json"), (b"content-length", str(len(body)).encode())]
+        for key, value in (headers or {}).items():
+            raw_headers.append((key.lower().encode(), str(value).encode()))
+
+        scope = {
+            "type": "http",
+            "asgi": {"version": "3.0"},
+            "http_version": "1.1",
+            "method": method.upper(),
+            "scheme": "http",
+            "path": parts.path or "/",
+            "raw_path": (parts.path or "/").encode(),
+            "query_string": parts.query.encode(),
+            "root_path": "",
+            "headers": raw_headers,
+            "client": ("127.0.0.1", 50000),
+            "server": (self.host.split(":")[0], int(self.host.split(":")[1]) if ":" in self.host else 80),
+        }
+
+        done = asyncio.Event()
+        request_sent = False
+        status = 0
+        chunks = []
+
+        async def receive():
+            nonlocal request_sent
+            if not request_sent:
+                request_sent = True
+                return {"type": "http.request", "body": body, "more_body": False}
+            await done.wait()
+            return {"type": "http.disconnect"}
+
+        async def send(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            elif message["type"] == "http.response.body":
+                chunks.append(message.get("body", b""))
+                if not message.get("more_body", False):
+                    done.set()
+
+        try:
+            await self.app(scope, receive, send)
+        except Exception:
+            # A real server answers 500 once the error middleware re-raises
+            if not status:
+                status = 500
+        finally:
+            done.set()
+        return status, b"".join(chunks)
+
+    async def get_json(self, url: str, **kwargs) -> Any:
+        status, body = await self.request("GET", url, **kwargs)
+        if status != 200:
+            raise RuntimeError(f"GET {url} answered {status}: {body[:200]!r}")
+        return json.loads(body)
@@ -0,0 +1,164 @@
+# benchmarks/log_encoding.py
+"""Compare log payload storage encodings: bytes per event and encode/decode throughput.
+
+    # logs recorded by a benchmark run at the small scale (default)
+    python -m benchmarks.log_encoding --requests 100
+    # logs of a saved database file, or of a running backend
+    python -m benchmarks.log_encoding --db app/db/app.sqlite
+    python -m benchmarks.log_encoding --logs-url http://localhost:8000
+
+Encodings: the JSON text stored today, msgpack, msgpack + zstd, and msgpack + zstd with a
+dictionary per action type (LOG_PAYLOAD_ENCODING=msgpack-zstd). Dictionaries are trained on
+the first LOG_DICT_TRAIN_SAMPLES payloads of each type and every encoding is measured on the
+remaining ones. Byte counts of the msgpack modes include the indexed fields that stay in
+the JSON `payload` column.
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import sys
+import tempfile
+import time
+from collections import defaultdict
+from typing import Any, Callable, Dict, List, Tuple
+
+# The benchmark never touches the app's own database file
+os.environ.setdefault("DATABASE_PATH", os.path.join(tempfile.mkdtemp(prefix="deddit-logenc-"), "logenc.sqlite"))
+
+import msgpack  # type: ignore  # noqa: E402
+import zstandard  # type: ignore  # noqa: E402
+
+from app.config import settings  # noqa: E402
+from app.db.log_codec import INDEXED_FIELDS  # noqa: E402
+
+# Header bytes LogCodec puts in front of every blob
+HEADER_BYTES = 5
+
+
+def recorded_logs(requests: int) -> List[Tuple[str, Dict[str, Any]]]:
+    """(action type, stored payload) of every log written by a small benchmark run"""
+    from app.db.db import db
+
+    from .run import run
+
+    asyncio.run(run(["small"], requests, 4, None))
+    with db.engine.connect() as conn:
+        rows = conn.exec_driver_sql("SELECT action_type, payload FROM logs ORDER BY id").all()
+    return [(action_type.lower(), json.loads(payload)) for action_type, payload in rows if payload]
+
+
+def loaded_logs(args) -> List[Tuple[str, Dict[str, Any]]]:
+    from .replay import _action_type, load_logs
+
+    return [(_action_type(log), log["payload"]) for log in load_logs(args) if log["payload"]]
+
+
+def index_bytes(payload: Dict[str, Any]) -> int:
+    return len(json.dumps({field: payload[field] for field in INDEXED_FIELDS if field in payload}).encode())
+
+
+def encodings(training: Dict[str, List[bytes]]) -> Dict[str, Tuple[Callable, Callable]]:
+    """name -> (encode(action type, payload) -> bytes, decode(action type, bytes) -> payload)"""
+    plain = zstandard.ZstdCompressor(level=settings.log_zstd_level)
+    plain_decompressor = zstandard.ZstdDecompressor()
+    compressors, decompressors = {}, {}
+    for action_type, samples in training.items():
+        try:
+            dictionary = zstandard.train_dictionary(settings.log_dict_size, samples)
+        except zstandard.ZstdError:
+            continue
+        compressors[action_type] = zstandard.ZstdCompressor(level=settings.log_zstd_level, dict_data=dictionary)
+        decompressors[action_type] = zstandard.ZstdDecompressor(dict_data=dictionary)
+
+    def with_dictionary(action_type, payload):
+        return compressors.get(action_type, plain).compress(msgpack.packb(payload, default=str))
+
+    def without_dictionary(action_type, blob):
+        return msgpack.unpackb(decompressors.get(action_type, plain_decompressor).decompress(blob))
+
+    return {
+        "json": (lambda _, payload: json.dumps(payload).encode(), lambda _, data: json.loads(data)),
+        "msgpack": (lambda _, payload: msgpack.packb(payload, default=str), lambda _, data: msgpack.unpackb(data)),
+        "msgpack+zstd": (
+            lambda _, payload: plain.compress(msgpack.packb(payload, default=str)),
+            lambda _, blob: msgpack.unpackb(plain_decompressor.decompress(blob)),
+        ),
+        "msgpack+zstd+dict": (with_dictionary, without_dictionary),
+    }
+
+
+def measure(logs: List[Tuple[str, Dict[str, Any]]], repeat: int) -> Dict[str, Any]:
+    training: Dict[str, List[bytes]] = defaultdict(list)
+    measured = []
+    for action_type, payload in logs:
+        if len(training[action_type]) < settings.log_dict_train_samples:
+            training[action_type].append(msgpack.packb(payload, default=str))
+        else:
+            measured.append((action_type, payload))
+    if not measured:
+        # Too few logs to hold any back: measure on the training set itself
+        measured = logs
+
+    results = {}
+    for name, (encode, decode) in encodings(training).items():
+        start = time.perf_counter()
+        for _ in range(repeat):
+            blobs = [encode(action_type, payload) for action_type, payload in measured]
+        encode_seconds = (time.perf_counter() - start) / repeat
+        start = time.perf_counter()
+        for _ in range(repeat):
+            for (action_type, _), blob in zip(measured, blobs):
+                decode(action_type, blob)
+        decode_seconds = (time.perf_counter() - start) / repeat
+
+        stored = [len(blob) for blob in blobs]
+        if name != "json":
+            stored = [size + HEADER_BYTES + index_bytes(payload) for size, (_, payload) in zip(stored, measured)]
+        per_type: Dict[str, List[int]] = defaultdict(list)
+        for size, (action_type, _) in zip(stored, measured):
+            per_type[action_type].append(size)
+        results[name] = {
+            "bytes_per_event": sum(stored) / len(stored),
+            "encode_events_per_second": len(measured) / encode_seconds if encode_seconds else 0.0,
+            "decode_events_per_second": len(measured) / decode_seconds if decode_seconds else 0.0,
+            "bytes_per_event_by_type": {t: sum(sizes) / len(sizes) for t, sizes in sorted(per_type.items())},
+        }
+    return {"events": len(logs), "measured_events": len(measured), "encodings": results}
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    source = parser.add_mutually_exclusive_group()
+    source.add_argument("--db", default=None, help="SQLite database file to read logs from")
+    source.add_argument("--logs-url", default=None, help="base URL of a backend serving /_synthetic/logs")
+    source.add_argument("--logs-file", default=None, help="JSON export of /_synthetic/logs")
+    parser.add_argument("--requests", type=int, default=100, help="requests per scenario when recording logs")
+    parser.add_argument("--repeat", type=int, default=5, help="passes over the logs per timing")
+    parser.add_argument("--output", default=None, help="write the results as JSON")
+    args = parser.parse_args(argv)
+
+    logs = loaded_logs(args) if args.db or args.logs_url or args.logs_file else recorded_logs(args.requests)
+    if not logs:
+        print("No logs to measure")
+        return 1
+    report = measure(logs, args.repeat)
+
+    print(f"\n{report['measured_events']} of {report['events']} events measured")
+    baseline = report["encodings"]["json"]["bytes_per_event"]
+    for name, result in report["encodings"].items():
+        print(
+            f"{name:<18} {result['bytes_per_event']:8.1f} B/event ({result['bytes_per_event'] / baseline:6.1%})  "
+            f"encode {result['encode_events_per_second']:10.0f} ev/s  "
+            f"decode {result['decode_events_per_second']:10.0f} ev/s"
+        )
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2)
+        print(f"Results written to {args.output}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,240 @@
+# benchmarks/replay.py
+"""Replay recorded agent sessions from the logs table, checking status codes or as load.
+
+    # sessions recorded by a running backend, replayed in-process 10x faster, one at a time
+    python -m benchmarks.replay --logs-url http://localhost:8000 --speed 10 --strict
+    # sessions from a saved database file, replayed concurrently against a live server (load only)
+    python -m benchmarks.replay --db app/db/app.sqlite --target http://localhost:8000 --speed 0 --concurrency 32
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import sys
+import tempfile
+import time
+import urllib.error
+import urllib.request
+from collections import defaultdict
+from typing import Any, Dict, List, Optional
+from urllib.parse import urlsplit
+
+# An in-process target never touches the app's own database file
+os.environ.setdefault("DATABASE_PATH", os.path.join(tempfile.mkdtemp(prefix="deddit-replay-"), "replay.sqlite"))
+
+from .asgi_client import ASGIClient  # noqa: E402
+from .run import percentile  # noqa: E402
+
+SEED_ACTIONS = ("session_start", "environment_reset")
+
+
+class Session:
+    def __init__(self, session_id: str):
+        self.session_id = session_id
+        self.seed: Optional[str] = None
+        self.requests: List[Dict[str, Any]] = []
+
+
+def _action_type(log: Dict[str, Any]) -> str:
+    action_type = log["action_type"]
+    return getattr(action_type, "value", action_type)
+
+
+def load_logs(args) -> List[Dict[str, Any]]:
+    if args.logs_file:
+        with open(args.logs_file) as f:
+            return json.load(f)
+    if args.logs_url:
+        with urllib.request.urlopen(f"{args.logs_url.rstrip('/')}/_synthetic/logs") as response:
+            return json.load(response)
+
+    # Read through the app's own Logger so payload decoding stays in one place
+    from app.db.db import Database
+    from app.utils.logger import Logger
+
+    return Logger(Database(args.db)).get_logs()
+
+
+def build_sessions(logs: List[Dict[str, Any]], only: Optional[List[str]]) -> List[Session]:
+    sessions: Dict[str, Session] = {}
+    for log in logs:
+        session_id = log["session_id"]
+        if only and session_id not in only:
+            continue
+        session = sessions.setdefault(session_id, Session(session_id))
+        payload = log["payload"] or {}
+        action_type = _action_type(log)
+        if action_type == "custom" and payload.get("custom_action") in SEED_ACTIONS and session.seed is None:
+            session.seed = (payload.get("data") or {}).get("seed")
+        elif action_type == "http_request" and "method" in payload:
+            session.requests.append(payload)
+    return [s for s in sessions.values() if s.requests]
+
+
+class Target:
+    """Where requests are replayed: the app in-process, or a live server over HTTP"""
+
+    def __init__(self, base_url: Optional[str]):
+        self.base_url = base_url.rstrip("/") if base_url else None
+        self.client = None
+
+    async def __aenter__(self):
+        if self.base_url is None:
+            from app.main import app
+
+            self._lifespan = app.router.lifespan_context(app)
+            await self._lifespan.__aenter__()
+            self.client = ASGIClient(app)
+        return self
+
+    async def __aexit__(self, *exc):
+        if self.base_url is None:
+            await self._lifespan.__aexit__(*exc)
+
+    async def request(self, method: str, url: str, body: Any = None, headers: Dict[str, str] = None) -> int:
+        if self.client is not None:
+            status, _ = await self.client.request(method, url, json_body=body, headers=headers)
+            return status
+        return await asyncio.to_thread(self._http_request, method, url, body, headers or {})
+
+    def _http_request(self, method: str, url: str, body: Any, headers: Dict[str, str]) -> int:
+        data = json.dumps(body).encode() if body is not None else None
+        request = urllib.request.Request(f"{self.base_url}{url}", data=data, method=method, headers=dict(headers))
+        if data is not None:
+            request.add_header("Content-Type", "application/json")
+        try:
+            with urllib.request.urlopen(request) as response:
+                return response.status
+        except urllib.error.HTTPError as e:
+            return e.code
+
+
+def _relative_url(url: str) -> str:
+    parts = urlsplit(url)
+    return f"{parts.path}?{parts.query}" if parts.query else parts.path
+
+
+async def replay_session(target: Target, session: Session, speed: float, report: Dict[str, Any], verify: bool):
+    previous_start = None
+    for payload in session.requests:
+        started_at = payload.get("started_at")
+        if speed > 0 and started_at is not None and previous_start is not None:
+            await asyncio.sleep(max(0.0, (started_at - previous_start) / speed))
+        previous_start = started_at
+
+        method = payload["method"]
+        url = _relative_url(payload["url"])
+        body = payload.get("request_body") or None
+        headers = dict(payload.get("headers") or {})
+        # Attribute replayed traffic to the original session id
+        headers.setdefault("cookie", f"session_id={session.session_id}")
+
+        start = time.perf_counter()
+        status = await target.request(method, url, body, headers)
+        report["latencies"].append(time.perf_counter() - start)
+        report["requests"] += 1
+        if verify and status != payload["status_code"]:
+            report["mismatches"].append({
+                "session_id": session.session_id,
+                "method": method,
+                "url": url,
+                "expected": payload["status_code"],
+                "actual": status,
+            })
+
+
+async def replay(sessions: List[Session], target: Target, speed: float, concurrency: int, default_seed: Optional[str]):
+    by_seed: Dict[Optional[str], List[Session]] = defaultdict(list)
+    for session in sessions:
+        by_seed[session.seed or default_seed].append(session)
+
+    # Sessions were recorded in isolation: status codes only mean something when replayed that way
+    verify = concurrency == 1
+    report: Dict[str, Any] = {
+        "requests": 0, "latencies": [], "mismatches": [], "unseeded_sessions": [], "verified": verify,
+    }
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def bounded(session: Session):
+        async with semaphore:
+            await replay_session(target, session, speed, report, verify)
+
+    async def reset(seed: Optional[str]):
+        await target.request("POST", f"/_synthetic/reset?session_id=replay&seed={seed or ''}")
+
+    start = time.perf_counter()
+    async with target:
+        for seed, group in by_seed.items():
+            if seed is None:
+                report["unseeded_sessions"] += [s.session_id for s in group]
+            if verify:
+                # Every session starts from its own fresh environment, as when it was recorded
+                for session in group:
+                    await reset(seed)
+                    await replay_session(target, session, speed, report, verify)
+            else:
+                # Load only: the sessions of a seed share one reset and change each other's state
+                await reset(seed)
+                await asyncio.gather(*(bounded(session) for session in group))
+    wall = time.perf_counter() - start
+
+    ordered = sorted(report.pop("latencies"))
+    report.update({
+        "sessions": len(sessions),
+        "seeds": len(by_seed),
+        "wall_seconds": wall,
+        "throughput_rps": report["requests"] / wall if wall else 0.0,
+        "p50": percentile(ordered, 0.5),
+        "p95": percentile(ordered, 0.95),
+        "p99": percentile(ordered, 0.99),
+        "status_match_rate": (
+            1 - len(report["mismatches"]) / report["requests"] if report["requests"] else 1.0
+        ) if verify else None,
+    })
+    return report
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    source = parser.add_mutually_exclusive_group(required=True)
+    source.add_argument("--db", help="SQLite file holding the recorded logs table")
+    source.add_argument("--logs-url", help="backend base URL to export /_synthetic/logs from")
+    source.add_argument("--logs-file", help="JSON export of /_synthetic/logs")
+    parser.add_argument("--target", default=None, help="base URL to replay against (default: the app in-process)")
+    parser.add_argument("--sessions", default=None, help="comma separated session ids (default: all)")
+    parser.add_argument("--speed", type=float, default=1.0, help="speed-up over recorded pacing, 0 = as fast as possible")
+    parser.add_argument("--concurrency", type=int, default=1,
+                        help="sessions replayed at the same time; above 1 is load only, status codes are not checked")
+    parser.add_argument("--seed", default=None, help="seed for sessions whose start was not recorded")
+    parser.add_argument("--output", default=None, help="write the JSON report here")
+    parser.add_argument("--strict", action="store_true", help="exit non-zero on any status code mismatch")
+    args = parser.parse_args(argv)
+    if args.strict and args.concurrency != 1:
+        parser.error("--strict checks status codes, which needs --concurrency 1")
+
+    only = [s.strip() for s in args.sessions.split(",")] if args.sessions else None
+    sessions = build_sessions(load_logs(args), only)
+    if not sessions:
+        print("No recorded HTTP requests found")
+        return 1
+
+    report = asyncio.run(replay(sessions, Target(args.target), args.speed, args.concurrency, args.seed))
+    checked = f"{len(report['mismatches'])} status mismatches" if report["verified"] else "status codes not checked"
+    print(
+        f"{report['sessions']} sessions, {report['requests']} requests in {report['wall_seconds']:.2f}s "
+        f"({report['throughput_rps']:.1f} req/s), p95 {report['p95'] * 1000:.2f} ms, {checked}"
+    )
+    for mismatch in report["mismatches"][:20]:
+        print(f"  {mismatch['session_id']} {mismatch['method']} {mismatch['url']}: "
+              f"expected {mismatch['expected']}, got {mismatch['actual']}")
+    if report["unseeded_sessions"]:
+        print(f"  {len(report['unseeded_sessions'])} session(s) had no recorded seed; pass --seed to pin one")
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2)
+    return 1 if args.strict and report["mismatches"] else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
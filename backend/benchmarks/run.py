@@ -0,0 +1,320 @@
+# benchmarks/run.py
+"""Benchmark every router in-process at several database scales.
+
+    python -m benchmarks.run --scales small,medium --requests 300 --concurrency 8 --output bench.json
+    python -m benchmarks.run --compare base.json bench.json --fail-threshold 10
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import platform
+import random
+import subprocess
+import sys
+import tempfile
+import time
+from collections import Counter
+from typing import Any, Callable, Dict, List, NamedTuple, Optional
+
+# The benchmark never touches the app's own database file
+os.environ.setdefault("DATABASE_PATH", os.path.join(tempfile.mkdtemp(prefix="deddit-bench-"), "bench.sqlite"))
+
+from app.main import app  # noqa: E402
+from app.db.base import Base  # noqa: E402
+from app.db.db import db  # noqa: E402
+from app.utils.metrics import metrics  # noqa: E402
+from app.utils.session_pool import session_pool  # noqa: E402
+
+from .asgi_client import ASGIClient  # noqa: E402
+
+SEED = "123"
+
+# Arguments forwarded to Database.populate_database
+SCALES = {
+    "small": {"num_users": 5, "notes_per_user": 3, "posts_per_user": 5},
+    "medium": {"num_users": 50, "notes_per_user": 3, "posts_per_user": 5},
+    "large": {"num_users": 200, "notes_per_user": 3, "posts_per_user": 10},
+}
+
+
+class Scenario(NamedTuple):
+    router: str
+    name: str
+    # (rnd, fixtures) -> (method, url, json_body, headers)
+    build: Callable[[random.Random, Dict[str, List]], tuple]
+
+
+SCENARIOS = [
+    Scenario("posts", "list_hot", lambda r, f: ("GET", "/posts?sort=hot", None, None)),
+    Scenario("posts", "list_top", lambda r, f: ("GET", "/posts?sort=top", None, None)),
+    Scenario("posts", "get_post", lambda r, f: ("GET", f"/posts/{r.choice(f['post_ids'])}", None, None)),
+    Scenario("posts", "create_post", lambda r, f: (
+        "POST", "/posts/create",
+        {"title": f"bench {r.random()}", "content": "benchmark post", "subreddit": "tech", "user_id": r.choice(f["user_ids"])},
+        None,
+    )),
+    Scenario("posts", "update_post", lambda r, f: (
+        "PUT", f"/posts/{r.choice(f['post_ids'])}", {"title": "updated", "content": f"updated {r.random()}"}, None,
+    )),
+    Scenario("comments", "comment_tree", lambda r, f: ("GET", f"/posts/{r.choice(f['post_ids'])}/comments", None, None)),
+    Scenario("comments", "comment_tree_paged", lambda r, f: (
+        "GET", f"/posts/{r.choice(f['post_ids'])}/comments?limit=10&children_limit=3&depth=2", None, None,
+    )),
+    Scenario("comments", "get_comment", lambda r, f: ("GET", f"/comments/{r.choice(f['comment_ids'])}", None, None)),
+    Scenario("comments", "create_comment", lambda r, f: (
+        "POST", "/comments/",
+        {"content": "benchmark reply", "post_id": r.choice(f["post_ids"]), "author_id": r.choice(f["user_ids"])},
+        None,
+    )),
+    Scenario("comments", "vote_comment", lambda r, f: (
+        "POST", f"/comments/{r.choice(f['comment_ids'])}/vote",
+        {"user_id": r.choice(f["user_ids"]), "value": r.choice([1, -1, 0])},
+        None,
+    )),
+    Scenario("vote", "vote_post", lambda r, f: (
+        "POST", "/vote",
+        {"post_id": r.choice(f["post_ids"]), "user_id": r.choice(f["user_ids"]), "vote": r.choice(["up", "down", "neutral"])},
+        None,
+    )),
+    Scenario("subreddits", "feed", lambda r, f: (
+        "GET", f"/r/{r.choice(['general', 'memes', 'news', 'tech'])}?sort={r.choice(['hot', 'new', 'active'])}", None, None,
+    )),
+    Scenario("subreddits", "trending", lambda r, f: ("GET", "/subreddits/trending", None, None)),
+    Scenario("feed", "home", lambda r, f: ("GET", f"/feed?user_id={r.choice(f['feed_user_ids'])}&limit=25", None, None)),
+    Scenario("notifications", "inbox", lambda r, f: (
+        "GET", f"/notifications?user_id={r.choice(f['user_ids'])}&limit=25", None, None,
+    )),
+    Scenario("notifications", "unread_count", lambda r, f: (
+        "GET", f"/notifications/unread_count?user_id={r.choice(f['user_ids'])}", None, None,
+    )),
+    Scenario("search", "search", lambda r, f: ("GET", f"/search?q={r.choice(['a', 'the', 'e', 'zz'])}", None, None)),
+    Scenario("messages", "send_message", lambda r, f: (
+        "POST", "/messages",
+        {"sender_id": r.choice(f["user_ids"]), "receiver_id": r.choice(f["user_ids"]), "content": "benchmark"},
+        None,
+    )),
+    Scenario("messages", "thread", lambda r, f: (
+        "GET", f"/messages?user1={f['user_ids'][0]}&user2={r.choice(f['user_ids'])}", None, None,
+    )),
+    Scenario("messages", "all_messages", lambda r, f: ("GET", "/messages/all", None, None)),
+    Scenario("users", "list_users", lambda r, f: ("GET", "/users/", None, None)),
+    Scenario("users", "get_user", lambda r, f: ("GET", f"/users/{r.choice(f['user_ids'])}", None, None)),
+    Scenario("users", "user_comments", lambda r, f: ("GET", f"/users/{r.choice(f['user_ids'])}/comments", None, None)),
+    Scenario("users", "saved_posts", lambda r, f: ("GET", f"/users/{r.choice(f['user_ids'])}/saved_posts", None, None)),
+    Scenario("notes", "list_notes", lambda r, f: ("GET", "/api/notes", None, None)),
+    Scenario("notes", "create_note", lambda r, f: (
+        "POST", "/api/notes", {"title": "bench", "content": "benchmark note"}, {"x-user-id": r.choice(f["user_ids"])},
+    )),
+    Scenario("notes", "save_post", lambda r, f: (
+        "POST", f"/api/save_post/{r.choice(f['post_ids'])}", {"user_id": r.choice(f["user_ids"])}, None,
+    )),
+    Scenario("synthetic", "log_event", lambda r, f: (
+        "POST", "/_synthetic/log_event?session_id=bench",
+        {"actionType": "click", "payload": {"text": "bench click", "page_url": "/", "element_identifier": "x", "coordinates": {"x": 1, "y": 2}}},
+        None,
+    )),
+    Scenario("synthetic", "get_logs", lambda r, f: ("GET", "/_synthetic/logs?session_id=bench", None, None)),
+]
+
+
+def percentile(ordered: List[float], q: float) -> float:
+    if not ordered:
+        return 0.0
+    return ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+
+
+async def load_fixtures(client: ASGIClient) -> Dict[str, List]:
+    users = await client.get_json("/users/")
+    posts = await client.get_json("/posts")
+    comment_ids = []
+    for post in posts[:20]:
+        stack = list(await client.get_json(f"/posts/{post['id']}/comments"))
+        while stack:
+            comment = stack.pop()
+            comment_ids.append(comment["id"])
+            stack.extend(comment.get("children", []))
+    # A few readers with a populated home feed
+    feed_user_ids = [u["id"] for u in users[:10]]
+    for user_id in feed_user_ids:
+        for subreddit in ("news", "tech"):
+            await client.request("POST", f"/subreddits/{subreddit}/subscribe", json_body={"user_id": user_id})
+    return {
+        "user_ids": [u["id"] for u in users],
+        "feed_user_ids": feed_user_ids,
+        "post_ids": [p["id"] for p in posts],
+        "comment_ids": comment_ids,
+    }
+
+
+async def run_scenario(client: ASGIClient, scenario: Scenario, fixtures, requests: int, concurrency: int) -> Dict[str, Any]:
+    rnd = random.Random(f"{SEED}:{scenario.router}:{scenario.name}")
+    calls = iter([scenario.build(rnd, fixtures) for _ in range(requests)])
+    latencies: List[float] = []
+    statuses: Counter = Counter()
+
+    async def worker():
+        for method, url, body, headers in calls:
+            start = time.perf_counter_ns()
+            status, _ = await client.request(method, url, json_body=body, headers=headers)
+            latencies.append((time.perf_counter_ns() - start) / 1e9)
+            statuses[status] += 1
+
+    statements_before = metrics.db_statements
+    phases_before = phase_totals()
+    start = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    wall = time.perf_counter() - start
+    statements = metrics.db_statements - statements_before
+    phases = {phase: seconds - phases_before[phase] for phase, seconds in phase_totals().items()}
+
+    ordered = sorted(latencies)
+    return {
+        "router": scenario.router,
+        "requests": len(latencies),
+        "concurrency": concurrency,
+        "wall_seconds": wall,
+        "throughput_rps": len(latencies) / wall if wall else 0.0,
+        "mean": sum(ordered) / len(ordered) if ordered else 0.0,
+        "p50": percentile(ordered, 0.5),
+        "p95": percentile(ordered, 0.95),
+        "p99": percentile(ordered, 0.99),
+        "max": ordered[-1] if ordered else 0.0,
+        "sql_statements": statements,
+        "sql_statements_per_request": statements / len(latencies) if latencies else 0.0,
+        "phase_ms_per_request": {
+            phase: seconds * 1000 / len(latencies) if latencies else 0.0 for phase, seconds in phases.items()
+        },
+        "statuses": {str(k): v for k, v in sorted(statuses.items())},
+    }
+
+
+def phase_totals() -> Dict[str, float]:
+    """Handler/serialize/db/log seconds summed over every route, from the app's instrumentation"""
+    totals: Dict[str, float] = {}
+    for route in metrics.snapshot()["routes"].values():
+        for phase, seconds in route["phases"].items():
+            totals[phase] = totals.get(phase, 0.0) + seconds
+    return totals
+
+
+def table_counts() -> Dict[str, int]:
+    with db.engine.connect() as conn:
+        return {
+            table.name: conn.exec_driver_sql(f"SELECT COUNT(*) FROM {table.name}").scalar()
+            for table in Base.metadata.sorted_tables
+        }
+
+
+async def run(scales: List[str], requests: int, concurrency: int, only: Optional[List[str]]) -> Dict[str, Any]:
+    client = ASGIClient(app)
+    results: Dict[str, Any] = {}
+    async with app.router.lifespan_context(app):
+        for scale in scales:
+            seed_start = time.perf_counter()
+            # Loaded like a new session: the writer and the flushers never see a half-seeded database
+            await asyncio.to_thread(session_pool.load_fresh, SEED, **SCALES[scale])
+            seed_seconds = time.perf_counter() - seed_start
+            fixtures = await load_fixtures(client)
+            scale_result = {"seed_seconds": seed_seconds, "rows": table_counts(), "scenarios": {}}
+            for scenario in SCENARIOS:
+                if only and scenario.router not in only:
+                    continue
+                # Warm up caches and connection pool before measuring
+                await run_scenario(client, scenario, fixtures, min(10, requests), 1)
+                outcome = await run_scenario(client, scenario, fixtures, requests, concurrency)
+                scale_result["scenarios"][f"{scenario.router}.{scenario.name}"] = outcome
+                print(
+                    f"[{scale}] {scenario.router + '.' + scenario.name:<28} "
+                    f"{outcome['throughput_rps']:8.1f} req/s  p50 {outcome['p50'] * 1000:7.2f} ms  "
+                    f"p95 {outcome['p95'] * 1000:7.2f} ms  p99 {outcome['p99'] * 1000:7.2f} ms  "
+                    f"sql/req {outcome['sql_statements_per_request']:6.1f}  "
+                    f"serialize {outcome['phase_ms_per_request'].get('serialize', 0.0):6.2f} ms"
+                )
+            results[scale] = scale_result
+    return results
+
+
+def git_revision() -> Optional[str]:
+    try:
+        return subprocess.check_output(["git", "rev-parse", "HEAD"], text=True, stderr=subprocess.DEVNULL).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def compare(base_path: str, new_path: str, threshold: float) -> int:
+    """Print per-scenario deltas; returns 1 when any p95 regressed by more than `threshold` percent"""
+    with open(base_path) as f:
+        base = json.load(f)
+    with open(new_path) as f:
+        new = json.load(f)
+
+    regressions = 0
+    for scale, scale_result in new["scales"].items():
+        for name, outcome in scale_result["scenarios"].items():
+            before = base["scales"].get(scale, {}).get("scenarios", {}).get(name)
+            if not before:
+                continue
+            p95_delta = (outcome["p95"] - before["p95"]) / before["p95"] * 100 if before["p95"] else 0.0
+            rps_delta = (
+                (outcome["throughput_rps"] - before["throughput_rps"]) / before["throughput_rps"] * 100
+                if before["throughput_rps"] else 0.0
+            )
+            sql_delta = outcome["sql_statements_per_request"] - before["sql_statements_per_request"]
+            serialize_delta = (
+                outcome.get("phase_ms_per_request", {}).get("serialize", 0.0)
+                - before.get("phase_ms_per_request", {}).get("serialize", 0.0)
+            )
+            flag = ""
+            if p95_delta > threshold:
+                flag = "  REGRESSION"
+                regressions += 1
+            print(
+                f"[{scale}] {name:<28} p95 {p95_delta:+7.1f}%  throughput {rps_delta:+7.1f}%  "
+                f"sql/req {sql_delta:+6.1f}  serialize {serialize_delta:+7.2f} ms{flag}"
+            )
+    return 1 if regressions else 0
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--scales", default="small,medium", help=f"comma separated, from {', '.join(SCALES)}")
+    parser.add_argument("--requests", type=int, default=200, help="measured requests per scenario")
+    parser.add_argument("--concurrency", type=int, default=8, help="in-flight requests per scenario")
+    parser.add_argument("--routers", default=None, help="comma separated routers to run (default: all)")
+    parser.add_argument("--output", default="bench_results.json")
+    parser.add_argument("--compare", nargs=2, metavar=("BASE", "NEW"), help="compare two result files")
+    parser.add_argument("--fail-threshold", type=float, default=10.0, help="p95 regression (%%) that fails --compare")
+    args = parser.parse_args(argv)
+
+    if args.compare:
+        return compare(args.compare[0], args.compare[1], args.fail_threshold)
+
+    scales = [s.strip() for s in args.scales.split(",") if s.strip()]
+    unknown = [s for s in scales if s not in SCALES]
+    if unknown:
+        parser.error(f"unknown scale(s): {', '.join(unknown)}")
+    only = [r.strip() for r in args.routers.split(",")] if args.routers else None
+
+    results = asyncio.run(run(scales, args.requests, args.concurrency, only))
+    report = {
+        "meta": {
+            "git_revision": git_revision(),
+            "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+            "python": sys.version.split()[0],
+            "platform": platform.platform(),
+            "requests": args.requests,
+            "concurrency": args.concurrency,
+            "seed": SEED,
+        },
+        "scales": results,
+    }
+    with open(args.output, "w") as f:
+        json.dump(report, f, indent=2)
+    print(f"Results written to {args.output}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,99 @@
+# benchmarks/vote_stress.py
+"""Hammer /vote concurrently and check every post counter against its vote rows.
+
+    python -m benchmarks.vote_stress --votes 2000 --voters 50 --posts 3 --concurrency 32
+
+Each post's `votes` column must move by exactly SUM(votes.value) for that post;
+any lost update is reported and the script exits non-zero. Run it with
+VOTE_BUFFER_ENABLED=1 to check the write-behind buffer and its shutdown drain.
+"""
+
+import argparse
+import asyncio
+import os
+import random
+import sys
+import tempfile
+import time
+from collections import Counter
+
+# The stress run never touches the app's own database file
+os.environ.setdefault("DATABASE_PATH", os.path.join(tempfile.mkdtemp(prefix="deddit-votes-"), "votes.sqlite"))
+
+from app.main import app  # noqa: E402
+from app.db.db import db  # noqa: E402
+from app.utils.session_pool import session_pool  # noqa: E402
+
+from .asgi_client import ASGIClient  # noqa: E402
+
+SEED = "123"
+
+
+def counters(post_ids):
+    """post id -> (posts.votes, SUM(votes.value)) read in one snapshot"""
+    with db.engine.connect() as conn:
+        rows = conn.exec_driver_sql(
+            "SELECT p.id, p.votes, COALESCE(SUM(v.value), 0) FROM posts p "
+            "LEFT JOIN votes v ON v.post_id = p.id GROUP BY p.id"
+        ).all()
+    return {row[0]: (row[1], row[2]) for row in rows if row[0] in post_ids}
+
+
+async def stress(votes: int, voters: int, posts: int, concurrency: int, seed: str):
+    client = ASGIClient(app)
+    async with app.router.lifespan_context(app):
+        await asyncio.to_thread(session_pool.load_fresh, SEED)
+        all_posts = await client.get_json("/posts")
+        post_ids = [p["id"] for p in all_posts[:posts]]
+        baseline = {post_id: counter for post_id, (counter, _) in counters(post_ids).items()}
+
+        rnd = random.Random(seed)
+        user_ids = [f"stress-user-{i}" for i in range(voters)]
+        calls = iter([
+            {"post_id": rnd.choice(post_ids), "user_id": rnd.choice(user_ids), "vote": rnd.choice(["up", "down", "neutral"])}
+            for _ in range(votes)
+        ])
+        statuses: Counter = Counter()
+
+        async def worker():
+            for body in calls:
+                status, _ = await client.request("POST", "/vote", json_body=body)
+                statuses[status] += 1
+
+        start = time.perf_counter()
+        await asyncio.gather(*(worker() for _ in range(concurrency)))
+        wall = time.perf_counter() - start
+
+    # Checked after shutdown, so votes still buffered (VOTE_BUFFER_ENABLED=1) must have been drained
+    drift = {}
+    for post_id, (counter, vote_sum) in counters(post_ids).items():
+        if counter - baseline[post_id] != vote_sum:
+            drift[post_id] = {"counter_delta": counter - baseline[post_id], "sum_votes": vote_sum}
+    return wall, statuses, drift
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--votes", type=int, default=2000, help="vote requests to send")
+    parser.add_argument("--voters", type=int, default=50, help="distinct user ids voting")
+    parser.add_argument("--posts", type=int, default=3, help="posts receiving the votes (fewer = more contention)")
+    parser.add_argument("--concurrency", type=int, default=32, help="in-flight vote requests")
+    parser.add_argument("--seed", default="votes", help="seed for the vote sequence")
+    args = parser.parse_args(argv)
+
+    wall, statuses, drift = asyncio.run(stress(args.votes, args.voters, args.posts, args.concurrency, args.seed))
+    print(
+        f"{args.votes} votes on {args.posts} post(s) in {wall:.2f}s ({args.votes / wall:.1f} votes/s), "
+        f"statuses {dict(sorted(statuses.items()))}"
+    )
+    for post_id, detail in drift.items():
+        print(f"  post {post_id}: counter moved {detail['counter_delta']:+d}, votes sum to {detail['sum_votes']:+d}")
+    if drift or set(statuses) != {200}:
+        print("FAILED")
+        return 1
+    print("OK: every counter equals SUM(votes.value)")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
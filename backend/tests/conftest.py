@@ -0,0 +1,22 @@
+# tests/conftest.py
+
+import os
+import sys
+import tempfile
+
+import pytest  # type: ignore
+
+# Settings are read at import time: point the app at a scratch database before importing it
+os.environ["DATABASE_PATH"] = os.path.join(tempfile.mkdtemp(prefix="deddit-tests-"), "app.sqlite")
+os.environ.setdefault("SESSION_POOL_SIZE", "0")
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from fastapi.testclient import TestClient  # type: ignore  # noqa: E402
+
+from app.main import app  # noqa: E402
+
+
+@pytest.fixture(scope="session")
+def client():
+    with TestClient(app) as client:
+        yield client
@@ -0,0 +1,50 @@
+# tests/test_checkpoints.py
+
+import uuid
+
+
+def session_logs(client, session_id):
+    return client.get("/_synthetic/logs", params={"session_id": session_id}).json()
+
+
+def checkpoint_then_act(client):
+    """A checkpoint, then a post created after it under a fresh session; returns both ids"""
+    session_id = str(uuid.uuid4())
+    checkpoint_id = client.post("/_synthetic/checkpoint", params={"session_id": session_id}).json()["checkpoint_id"]
+    author_id = client.get("/posts").json()[0]["author"]["id"]
+    response = client.post(
+        "/posts/create",
+        params={"session_id": session_id},
+        json={"title": "after the checkpoint", "content": "c", "user_id": author_id, "subreddit": "general"},
+    )
+    assert response.status_code == 200
+    assert any(log["action_type"] == "db_update" for log in session_logs(client, session_id))
+    return checkpoint_id, session_id
+
+
+def test_restore_keeps_logs(client):
+    checkpoint_id, session_id = checkpoint_then_act(client)
+    before = session_logs(client, session_id)
+    response = client.post("/_synthetic/restore", params={"checkpoint_id": checkpoint_id, "session_id": session_id})
+    assert response.status_code == 200
+    after = session_logs(client, session_id)
+    # Everything logged before the restore is still there and still decodes
+    assert [log["id"] for log in before] == [log["id"] for log in after[: len(before)]]
+    assert [log["payload"] for log in before] == [log["payload"] for log in after[: len(before)]]
+    assert after[-1]["payload"]["custom_action"] == "environment_restore"
+
+
+def test_fork_keeps_logs(client):
+    checkpoint_id, session_id = checkpoint_then_act(client)
+    before = session_logs(client, session_id)
+    assert client.post("/_synthetic/fork", params={"checkpoint_id": checkpoint_id}).status_code == 200
+    assert session_logs(client, session_id) == before
+
+
+def test_restore_can_erase_logs(client):
+    checkpoint_id, session_id = checkpoint_then_act(client)
+    response = client.post(
+        "/_synthetic/restore", params={"checkpoint_id": checkpoint_id, "session_id": session_id, "erase_logs": True}
+    )
+    assert response.status_code == 200
+    assert [log["payload"].get("custom_action") for log in session_logs(client, session_id)] == ["environment_restore"]
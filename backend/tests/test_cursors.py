@@ -0,0 +1,73 @@
+# tests/test_cursors.py
+
+import pytest  # type: ignore
+
+from app.utils.cursors import encode_cursor
+
+# Well-formed JSON, wrong field types: every paged route answers 400, never 500 or a silent page
+BAD_OFFSETS = ["x", None, -1, True, 1.5, [1]]
+
+
+def first_post_and_comment(client):
+    post_id = client.get("/posts").json()[0]["id"]
+    comment = next(c for p in client.get("/posts").json() for c in client.get(f"/posts/{p['id']}/comments").json())
+    return post_id, comment
+
+
+@pytest.mark.parametrize("offset", BAD_OFFSETS)
+def test_posts_cursor(client, offset):
+    response = client.get("/posts", params={"limit": 5, "cursor": encode_cursor(offset=offset, sort="hot")})
+    assert response.status_code == 400
+
+
+def test_posts_cursor_sort_type(client):
+    response = client.get("/posts", params={"limit": 5, "cursor": encode_cursor(offset=0, sort=["hot"])})
+    assert response.status_code == 400
+
+
+@pytest.mark.parametrize("offset", BAD_OFFSETS)
+def test_community_cursor(client, offset):
+    response = client.get("/r/general", params={"limit": 5, "cursor": encode_cursor(offset=offset, sort="hot")})
+    assert response.status_code == 400
+
+
+@pytest.mark.parametrize("offset", BAD_OFFSETS)
+def test_comments_cursor(client, offset):
+    post_id, _ = first_post_and_comment(client)
+    cursor = encode_cursor(post=post_id, parent=None, offset=offset, sort="best")
+    response = client.get(f"/posts/{post_id}/comments", params={"limit": 5, "cursor": cursor})
+    assert response.status_code == 400
+
+
+@pytest.mark.parametrize("offset", BAD_OFFSETS)
+def test_comment_children_cursor(client, offset):
+    _, comment = first_post_and_comment(client)
+    cursor = encode_cursor(post=comment["post_id"], parent=comment["id"], offset=offset, sort="best")
+    response = client.get(f"/comments/{comment['id']}/children", params={"limit": 5, "cursor": cursor})
+    assert response.status_code == 400
+
+
+@pytest.mark.parametrize("before", BAD_OFFSETS)
+def test_feed_cursor(client, before):
+    response = client.get("/feed", params={"user_id": "u1", "cursor": encode_cursor(before=before)})
+    assert response.status_code == 400
+
+
+@pytest.mark.parametrize("before", BAD_OFFSETS)
+def test_notifications_cursor(client, before):
+    response = client.get("/notifications", params={"user_id": "u1", "cursor": encode_cursor(before=before)})
+    assert response.status_code == 400
+
+
+@pytest.mark.parametrize("after", BAD_OFFSETS)
+def test_logs_cursor(client, after):
+    response = client.get("/_synthetic/logs", params={"limit": 5, "cursor": encode_cursor(after=after)})
+    assert response.status_code == 400
+
+
+def test_valid_cursors_still_page(client):
+    first = client.get("/posts", params={"limit": 2})
+    assert first.status_code == 200
+    second = client.get("/posts", params={"limit": 2, "cursor": first.headers["x-next-cursor"]})
+    assert second.status_code == 200
+    assert {p["id"] for p in first.json()}.isdisjoint(p["id"] for p in second.json())